@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ ARP CACHE : un service qui retient les correspondances IP -> MAC vues passer
+------------------------------------------------------------------------------------------------
+ ip-arp.py tient sa table dans un dict rempli à la main, 02_arp_forge.py oublie tout en
+ quittant : chaque outil qui a besoin d'une MAC crie un ARP Request et attend. Ce service
+ tourne en continu, écoute le lien et répond aux autres outils par une socket UNIX.
+
+ Apprentissage passif (aucune trame envoyée) :
+   - ARP (Request ou Reply) : l'émetteur annonce lui-même son couple (IP, MAC) ;
+   - IPv4 : IP source -> MAC source, SEULEMENT si l'IP est dans un réseau local
+     (--network, ou celui de l'interface) : un paquet venu d'Internet porte la MAC
+     du routeur, pas celle de son émetteur.
+   Le filtre BPF ne laisse monter que l'ARP et l'IPv4, tronqués à 42 octets.
+
+ Vieillissement par roue temporelle (timer wheel) :
+   une case par seconde, ttl + 1 cases. Une entrée rafraîchie est (re)notée dans la case
+   de son échéance — au plus une fois par seconde. Chaque seconde, on ne vide QUE la case
+   courante : le coût ne dépend pas du nombre d'entrées. Les inscriptions périmées
+   (entrée rafraîchie depuis) sont ignorées au passage.
+
+ Mémoire plafonnée : au-delà de --max-entries, l'entrée la plus proche de l'expiration
+ est évincée (les cases suivantes de la roue, dans l'ordre).
+
+ Protocole (socket UNIX, une ligne par requête, une ligne par réponse) :
+   GET 10.0.0.1 10.0.0.2 ...   -> 10.0.0.1=AA:BB:CC:DD:EE:FF 10.0.0.2=?
+   STATS                       -> entries=12 learned=340 expired=3 evicted=0 changed=1
+   DUMP                        -> 10.0.0.1=AA:BB:CC:DD:EE:FF ... (toute la table)
+
+   sudo python3 arp_cache.py -i eth0                    # le service
+   python3 arp_cache.py --query 192.168.1.1 192.168.1.20 # un client
+   printf 'GET 192.168.1.1\n' | socat - UNIX-CONNECT:/tmp/arp_cache.sock
+------------------------------------------------------------------------------------------------
+"""
+
+import argparse
+import fcntl
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+from bpf_filter import attach_filter, compile_filter
+from capture import open_capture, open_socket
+
+SOCKET_PATH = '/tmp/arp_cache.sock'
+UNKNOWN = '?'
+
+SIOCGIFADDR = 0x8915
+SIOCGIFNETMASK = 0x891B
+
+# Ethernet (14) + ARP (28) : tout ce qu'il faut lire, pour l'un comme pour l'autre
+SNAPLEN = 42
+ETH_TYPE = struct.Struct('!12xH')
+ARP_SENDER = struct.Struct('!20xH6sI')          # opcode, MAC émetteur, IP émetteur
+IPV4_SOURCE = struct.Struct('!6x6s14xI')        # MAC source, IP source
+IPV4 = struct.Struct('!I')
+
+
+def ip_to_int(ip):
+    return IPV4.unpack(socket.inet_aton(ip))[0]
+
+
+def int_to_ip(value):
+    return socket.inet_ntoa(IPV4.pack(value))
+
+
+def format_mac(mac):
+    return mac.hex(':').upper()
+
+
+def parse_network(cidr):
+    """'192.168.1.0/24' -> (réseau, masque) en entiers."""
+    adresse, _, longueur = cidr.partition('/')
+    masque = (0xFFFFFFFF << (32 - int(longueur or 32))) & 0xFFFFFFFF
+    return ip_to_int(adresse) & masque, masque
+
+
+def interface_network(sock, interface):
+    """(réseau, masque) de l'interface, lus par ioctl ; None si elle n'a pas d'IPv4."""
+    requete = struct.pack('256s', interface[:15].encode())
+    try:
+        adresse = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, requete)[20:24]
+        masque = fcntl.ioctl(sock.fileno(), SIOCGIFNETMASK, requete)[20:24]
+    except OSError:
+        return None
+    masque = IPV4.unpack(masque)[0]
+    return IPV4.unpack(adresse)[0] & masque, masque
+
+
+class Entry:
+    __slots__ = ('mac', 'deadline', 'source', 'updated_ns')
+
+    def __init__(self, mac, deadline, source, updated_ns):
+        self.mac = mac
+        self.deadline = deadline      # seconde (tick) à laquelle l'entrée expire
+        self.source = source          # 'arp', 'ipv4' ou 'kernel'
+        self.updated_ns = updated_ns
+
+
+class ArpCache:
+    """
+    Table IP -> MAC à durée de vie, utilisable depuis le thread de capture (learn) et
+    les threads du serveur (lookup) en même temps : les deux côtés prennent le verrou.
+    """
+
+    def __init__(self, ttl=300, max_entries=65536, networks=(), clock=time.monotonic):
+        self.ttl = max(1, int(ttl))
+        self.max_entries = max_entries
+        self.networks = list(networks)
+        self.clock = clock
+        self.entries = {}
+        self.wheel = [set() for _ in range(self.ttl + 1)]
+        self.tick = int(clock())
+        self.lock = threading.Lock()
+        self.learned = 0
+        self.expired = 0
+        self.evicted = 0
+        self.changed = 0             # une IP a changé de MAC (nouvelle carte... ou usurpation)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def is_local(self, ip):
+        return any(ip & masque == reseau for reseau, masque in self.networks)
+
+    def learn(self, ip, mac, source='arp'):
+        """Enregistre ou rafraîchit ip (entier) -> mac (6 octets)."""
+        if ip == 0 or mac[0] & 1:
+            return    # 0.0.0.0 (sonde ARP) ou MAC de groupe : rien à retenir
+        with self.lock:
+            self._advance(int(self.clock()))
+            deadline = self.tick + self.ttl
+            entry = self.entries.get(ip)
+            if entry is None:
+                if len(self.entries) >= self.max_entries:
+                    self._evict_one()
+                self.entries[ip] = Entry(mac, deadline, source, time.time_ns())
+                self.wheel[deadline % len(self.wheel)].add(ip)
+                self.learned += 1
+                return
+            if entry.mac != mac:
+                entry.mac = mac
+                self.changed += 1
+            entry.source = source
+            entry.updated_ns = time.time_ns()
+            if entry.deadline != deadline:
+                # L'ancienne inscription reste dans sa case : elle sera ignorée au passage
+                entry.deadline = deadline
+                self.wheel[deadline % len(self.wheel)].add(ip)
+
+    def learn_frame(self, frame):
+        """Apprend depuis une trame Ethernet brute (ARP ou IPv4), sans rien allouer d'autre."""
+        if len(frame) < SNAPLEN:
+            return
+        ethertype, = ETH_TYPE.unpack_from(frame)
+        if ethertype == 0x0806:
+            _, mac, ip = ARP_SENDER.unpack_from(frame)
+            self.learn(ip, mac, 'arp')
+        elif ethertype == 0x0800:
+            mac, ip = IPV4_SOURCE.unpack_from(frame)
+            if self.is_local(ip):
+                self.learn(ip, mac, 'ipv4')
+
+    def lookup(self, ips):
+        """{ip (entier): mac ou None} pour un lot d'adresses, sous un seul verrou."""
+        with self.lock:
+            self._advance(int(self.clock()))
+            entries = self.entries
+            return {ip: (entries[ip].mac if ip in entries else None) for ip in ips}
+
+    def items(self):
+        with self.lock:
+            self._advance(int(self.clock()))
+            return sorted((ip, entry.mac) for ip, entry in self.entries.items())
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'learned': self.learned, 'expired': self.expired,
+                    'evicted': self.evicted, 'changed': self.changed}
+
+    def advance(self):
+        with self.lock:
+            self._advance(int(self.clock()))
+
+    def _advance(self, now):
+        """Vide les cases de la roue entre le dernier tick et `now`."""
+        if now <= self.tick:
+            return
+        # Plus d'un tour de retard : chaque case n'a besoin d'être vue qu'une fois
+        debut = max(self.tick + 1, now - len(self.wheel) + 1)
+        entries = self.entries
+        for tick in range(debut, now + 1):
+            case = self.wheel[tick % len(self.wheel)]
+            for ip in case:
+                entry = entries.get(ip)
+                if entry is not None and entry.deadline <= now:
+                    del entries[ip]
+                    self.expired += 1
+            case.clear()
+        self.tick = now
+
+    def _evict_one(self):
+        """Évince l'entrée la plus proche de l'expiration : les cases suivantes, dans l'ordre."""
+        entries = self.entries
+        taille = len(self.wheel)
+        for pas in range(1, taille + 1):
+            case = self.wheel[(self.tick + pas) % taille]
+            while case:
+                ip = case.pop()
+                entry = entries.get(ip)
+                if entry is not None and entry.deadline == self.tick + pas:
+                    del entries[ip]
+                    self.evicted += 1
+                    return
+
+    def seed_from_kernel(self, path='/proc/net/arp'):
+        """Reprend les entrées complètes du cache ARP du noyau (drapeau 0x2)."""
+        try:
+            with open(path) as f:
+                lignes = f.readlines()[1:]
+        except OSError:
+            return 0
+        n = 0
+        for ligne in lignes:
+            champs = ligne.split()
+            if len(champs) >= 4 and int(champs[2], 16) & 0x2:
+                self.learn(ip_to_int(champs[0]), bytes.fromhex(champs[3].replace(':', '')), 'kernel')
+                n += 1
+        return n
+
+
+def stats_line(cache):
+    return ' '.join(f"{nom}={valeur}" for nom, valeur in cache.stats().items())
+
+
+def handle_request(cache, ligne):
+    """Une ligne de requête -> une ligne de réponse (sans le saut de ligne)."""
+    commande, _, reste = ligne.strip().partition(' ')
+    commande = commande.upper()
+    if commande == 'GET':
+        adresses = reste.split()
+        try:
+            cles = [ip_to_int(ip) for ip in adresses]
+        except OSError:
+            return "ERR adresse IPv4 invalide"
+        macs = cache.lookup(cles)
+        return ' '.join(f"{ip}={format_mac(macs[cle]) if macs[cle] else UNKNOWN}"
+                        for ip, cle in zip(adresses, cles))
+    if commande == 'STATS':
+        return stats_line(cache)
+    if commande == 'DUMP':
+        return ' '.join(f"{int_to_ip(ip)}={format_mac(mac)}" for ip, mac in cache.items())
+    return f"ERR commande inconnue : {commande} (GET, STATS, DUMP)"
+
+
+def start_server(cache, path=SOCKET_PATH):
+    """Sert les requêtes sur la socket UNIX `path` dans des threads de fond ; rend le serveur."""
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            # Plusieurs requêtes par connexion : un outil garde sa connexion ouverte
+            for ligne in self.rfile:
+                try:
+                    reponse = handle_request(cache, ligne.decode('ascii', 'replace'))
+                    self.wfile.write(reponse.encode() + b'\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+
+    if os.path.exists(path):
+        os.unlink(path)   # socket laissée par une exécution précédente
+    serveur = socketserver.ThreadingUnixStreamServer(path, Handler)
+    serveur.daemon_threads = True
+    os.chmod(path, 0o666)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return serveur
+
+
+def lookup(ips, path=SOCKET_PATH, timeout=1.0):
+    """
+    Client : {ip: 'AA:BB:..' ou None} pour une liste d'adresses, en une requête.
+    Lève OSError si le service ne tourne pas : à l'appelant de revenir à un ARP Request.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(f"GET {' '.join(ips)}\n".encode())
+        with sock.makefile('rb') as f:
+            reponse = f.readline().decode().split()
+    if reponse[:1] == ['ERR']:
+        raise ValueError(' '.join(reponse[1:]))
+    resultat = {}
+    for paire in reponse:
+        ip, _, mac = paire.partition('=')
+        resultat[ip] = None if mac == UNKNOWN else mac
+    return resultat
+
+
+def query(commande, path=SOCKET_PATH, timeout=1.0):
+    """Envoie une commande brute (STATS, DUMP...) et rend la ligne de réponse."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(commande.encode() + b'\n')
+        with sock.makefile('rb') as f:
+            return f.readline().decode().rstrip('\n')
+
+
+def run(cache, conn, stop):
+    """Boucle de capture : chaque trame (déjà filtrée et tronquée par le noyau) est apprise."""
+    for trame, _, _, _ in conn.frames(stop):
+        cache.learn_frame(trame)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Cache ARP passif servi sur une socket UNIX")
+    ap.add_argument('-i', '--interface', help="interface à écouter (défaut : toutes)")
+    ap.add_argument('--socket', default=SOCKET_PATH, help=f"chemin de la socket UNIX (défaut : {SOCKET_PATH})")
+    ap.add_argument('--ttl', type=int, default=300, help="secondes sans nouvelle avant d'oublier une IP (défaut : 300)")
+    ap.add_argument('--max-entries', type=int, default=65536, help="entrées au maximum (défaut : 65536)")
+    ap.add_argument('--network', action='append', default=[], metavar='CIDR',
+                    help="réseau local dont les IP sources IPv4 sont apprises (répétable ; "
+                         "défaut : celui de l'interface)")
+    ap.add_argument('--backend', choices=('recvfrom', 'ring'), default='recvfrom',
+                    help="capture par recvfrom ou par l'anneau mmap TPACKET_V3")
+    ap.add_argument('--no-kernel', action='store_true', help="ne pas reprendre /proc/net/arp au démarrage")
+    ap.add_argument('--query', nargs='+', metavar='IP', help="client : demander ces IP au service")
+    ap.add_argument('--stats', action='store_true', help="client : afficher les compteurs du service")
+    ap.add_argument('--dump', action='store_true', help="client : afficher toute la table")
+    args = ap.parse_args()
+
+    if args.query or args.stats or args.dump:
+        try:
+            if args.query:
+                for ip, mac in lookup(args.query, args.socket).items():
+                    print(f"{ip:<16} {mac or 'inconnue'}")
+            if args.stats:
+                print(query('STATS', args.socket))
+            if args.dump:
+                for paire in query('DUMP', args.socket).split():
+                    ip, _, mac = paire.partition('=')
+                    print(f"{ip:<16} {mac}")
+        except OSError as e:
+            print(f"Service injoignable sur {args.socket} ({e}) : lancez sudo python3 arp_cache.py")
+            sys.exit(1)
+        return
+
+    if os.geteuid() != 0:
+        print("Droits root requis : sudo python3 arp_cache.py [-i eth0]")
+        sys.exit(1)
+
+    sock = open_socket(args.interface)
+    # Seulement ARP et IPv4, et seulement les 42 premiers octets : le reste ne monte jamais
+    attach_filter(sock, compile_filter(snaplen=SNAPLEN))
+    networks = [parse_network(cidr) for cidr in args.network]
+    if not networks and args.interface:
+        local = interface_network(sock, args.interface)
+        if local is not None:
+            networks.append(local)
+    cache = ArpCache(args.ttl, args.max_entries, networks)
+    if not args.no_kernel:
+        print(f"{cache.seed_from_kernel()} entrée(s) reprises du cache du noyau")
+    conn = open_capture(args.backend, sock=sock)
+    serveur = start_server(cache, args.socket)
+    reseaux = ', '.join(f"{int_to_ip(r)}/{bin(m).count('1')}" for r, m in networks) or "aucun (ARP seul)"
+    print(f"Cache ARP sur {args.socket} | ttl {args.ttl} s | {args.max_entries} entrées max | "
+          f"IPv4 apprise sur : {reseaux}")
+
+    stop = threading.Event()
+    try:
+        run(cache, conn, stop)
+    except KeyboardInterrupt:
+        print(f"\nArrêt. {stats_line(cache)}")
+    finally:
+        stop.set()
+        serveur.shutdown()
+        serveur.server_close()
+        os.unlink(args.socket)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
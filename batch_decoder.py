@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ BATCH DECODER : décodage vectorisé (NumPy) des en-têtes Ethernet / IPv4 / TCP / UDP
+------------------------------------------------------------------------------------------------
+ PacketParser décode une trame à la fois : plusieurs struct.unpack et des dizaines
+ d'instructions Python par trame. Ici on décode des MILLIERS de trames d'un coup :
+
+   1. on recopie les 96 premiers octets de chaque trame dans une matrice (N, 96) d'uint8 ;
+   2. chaque champ devient une opération sur une colonne (décalages, masques, ordre réseau) ;
+   3. le résultat est un tableau structuré NumPy : une ligne par trame, une colonne par champ.
+
+ Le filtrage et l'agrégation deviennent des opérations de tableau :
+
+   batch = decode_batch(trames)
+   tcp = batch[batch['proto'] == 6]
+   ports, nombres = np.unique(tcp['dport'], return_counts=True)
+
+ Les champs absents (ports d'un paquet ICMP, TTL d'une trame ARP...) valent 0.
+ NumPy est une dépendance optionnelle : pip install numpy
+
+ Usage :
+   python3 batch_decoder.py capture.pcapng [--target 10.0.0.5] [--batch 8192]
+------------------------------------------------------------------------------------------------
+"""
+
+import argparse
+import socket
+import struct
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("batch_decoder.py nécessite NumPy : pip install numpy") from None
+
+# Fenêtre copiée par trame : Ethernet (14) + IPv4 avec options (60) + 14 octets de TCP
+WINDOW = 96
+
+HEADER_DTYPE = np.dtype([
+    ('dst_mac',   np.uint64),
+    ('src_mac',   np.uint64),
+    ('ethertype', np.uint16),
+    ('ihl',       np.uint8),
+    ('ttl',       np.uint8),
+    ('proto',     np.uint8),
+    ('src',       np.uint32),
+    ('dst',       np.uint32),
+    ('sport',     np.uint16),
+    ('dport',     np.uint16),
+    ('tcp_flags', np.uint8),
+    ('ip_len',    np.uint16),
+    ('length',    np.uint32),
+])
+
+
+def _be16(win, col):
+    return (win[:, col].astype(np.uint16) << 8) | win[:, col + 1]
+
+
+def _be16_at(win, rows, cols):
+    return (win[rows, cols].astype(np.uint16) << 8) | win[rows, cols + 1]
+
+
+def _be_uint(win, start, size, dtype):
+    """Lit `size` octets big-endian à partir de la colonne `start`, complétés à gauche par des 0."""
+    largeur = np.dtype(dtype).itemsize
+    tampon = np.zeros((len(win), largeur), dtype=np.uint8)
+    tampon[:, largeur - size:] = win[:, start:start + size]
+    return tampon.view(np.dtype(dtype).newbyteorder('>')).ravel().astype(dtype)
+
+
+def decode_window(win, lengths):
+    """
+    Décode une matrice (N, WINDOW) d'octets d'en-têtes. `lengths` = longueur capturée
+    de chaque trame (les octets au-delà doivent valoir 0).
+    """
+    n = len(win)
+    out = np.zeros(n, dtype=HEADER_DTYPE)
+    lengths = np.asarray(lengths, dtype=np.uint32)
+    out['length'] = lengths
+
+    eth_ok = lengths >= 14
+    out['dst_mac'] = np.where(eth_ok, _be_uint(win, 0, 6, np.uint64), 0)
+    out['src_mac'] = np.where(eth_ok, _be_uint(win, 6, 6, np.uint64), 0)
+    ethertype = np.where(eth_ok, _be16(win, 12), 0).astype(np.uint16)
+    out['ethertype'] = ethertype
+
+    # --- IPv4 : version 4, en-tête complet présent ---
+    ihl = (win[:, 14] & 0x0F).astype(np.uint8)
+    is_ip = (ethertype == 0x0800) & ((win[:, 14] >> 4) == 4) & (ihl >= 5) & (lengths >= 34)
+    ihl = np.where(is_ip, ihl, 0).astype(np.uint8)
+    proto = np.where(is_ip, win[:, 23], 0).astype(np.uint8)
+    out['ihl'] = ihl
+    out['ttl'] = np.where(is_ip, win[:, 22], 0)
+    out['proto'] = proto
+    out['ip_len'] = np.where(is_ip, _be16(win, 16), 0)
+    out['src'] = np.where(is_ip, _be_uint(win, 26, 4, np.uint32), 0)
+    out['dst'] = np.where(is_ip, _be_uint(win, 30, 4, np.uint32), 0)
+
+    # --- TCP / UDP : en-tête L4 après un en-tête IP de longueur variable ---
+    rows = np.arange(n)
+    l4 = 14 + ihl.astype(np.intp) * 4
+    l4 = np.where(is_ip, l4, 14)
+    non_fragment = (_be16(win, 20) & 0x1FFF) == 0
+    has_ports = is_ip & ((proto == 6) | (proto == 17)) & non_fragment & (lengths >= l4 + 4)
+    out['sport'] = np.where(has_ports, _be16_at(win, rows, l4), 0)
+    out['dport'] = np.where(has_ports, _be16_at(win, rows, l4 + 2), 0)
+    has_flags = has_ports & (proto == 6) & (lengths >= l4 + 14)
+    out['tcp_flags'] = np.where(has_flags, win[rows, l4 + 13] & 0x3F, 0)
+    return out
+
+
+def decode_batch(frames):
+    """Décode une séquence de trames (bytes ou memoryviews) en un tableau structuré."""
+    frames = list(frames)
+    raw = bytearray(len(frames) * WINDOW)
+    lengths = np.empty(len(frames), dtype=np.uint32)
+    for i, frame in enumerate(frames):
+        k = min(len(frame), WINDOW)
+        raw[i * WINDOW:i * WINDOW + k] = frame[:k]
+        lengths[i] = len(frame)
+    win = np.frombuffer(raw, dtype=np.uint8).reshape(len(frames), WINDOW)
+    return decode_window(win, lengths)
+
+
+def decode_buffer(buffer, offsets, lengths):
+    """
+    Décode des trames qui vivent déjà dans un même tampon (bloc de l'anneau, fichier mmap) :
+    la fenêtre est extraite par indexation NumPy, sans boucle Python par trame.
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    offsets = np.asarray(offsets, dtype=np.intp)
+    lengths = np.asarray(lengths, dtype=np.uint32)
+    colonnes = np.arange(WINDOW, dtype=np.intp)
+    index = np.minimum(offsets[:, None] + colonnes, len(data) - 1)
+    win = data[index]
+    win[colonnes[None, :] >= lengths[:, None]] = 0   # ne pas lire la trame suivante
+    return decode_window(win, lengths)
+
+
+def iter_batches(records, size=8192):
+    """
+    Regroupe un flux (trame, ts_ns, interface) en lots décodés. Chaque trame est copiée
+    dans la fenêtre dès son arrivée : compatible avec les memoryviews éphémères de l'anneau.
+    Rend des couples (tableau d'en-têtes, tableau de ts_ns).
+    """
+    raw = bytearray(size * WINDOW)
+    lengths = np.empty(size, dtype=np.uint32)
+    stamps = np.empty(size, dtype=np.uint64)
+    i = 0
+    for frame, ts_ns, _ in records:
+        k = min(len(frame), WINDOW)
+        base = i * WINDOW
+        raw[base:base + k] = frame[:k]
+        if k < WINDOW:
+            raw[base + k:base + WINDOW] = bytes(WINDOW - k)
+        lengths[i] = len(frame)
+        stamps[i] = ts_ns
+        i += 1
+        if i == size:
+            win = np.frombuffer(raw, dtype=np.uint8).reshape(size, WINDOW)
+            yield decode_window(win, lengths), stamps.copy()
+            i = 0
+    if i:
+        win = np.frombuffer(raw, dtype=np.uint8)[:i * WINDOW].reshape(i, WINDOW)
+        yield decode_window(win, lengths[:i]), stamps[:i].copy()
+
+
+# --- Filtres et agrégations ---
+
+def ip_to_uint32(ip):
+    return struct.unpack('!I', socket.inet_aton(ip))[0]
+
+
+def uint32_to_ip(value):
+    return socket.inet_ntoa(struct.pack('!I', int(value)))
+
+
+def involving(batch, ip):
+    """Masque des paquets IPv4 dont la source ou la destination vaut `ip`."""
+    valeur = ip_to_uint32(ip)
+    return (batch['ethertype'] == 0x0800) & ((batch['src'] == valeur) | (batch['dst'] == valeur))
+
+
+def top(batch, field, n=10, mask=None):
+    """Les n valeurs les plus fréquentes d'une colonne : liste de (valeur, nombre)."""
+    colonne = batch[field] if mask is None else batch[field][mask]
+    valeurs, nombres = np.unique(colonne, return_counts=True)
+    ordre = np.argsort(nombres)[::-1][:n]
+    return [(valeurs[i].item(), nombres[i].item()) for i in ordre]
+
+
+def main():
+    from pcap_io import PcapReader
+
+    ap = argparse.ArgumentParser(description="Décode un fichier pcap/pcapng par lots NumPy.")
+    ap.add_argument('fichier')
+    ap.add_argument('--target', help="ne garder que le trafic impliquant cette IP")
+    ap.add_argument('--batch', type=int, default=8192, help="trames par lot")
+    args = ap.parse_args()
+
+    lots = []
+    with PcapReader(args.fichier) as lecteur:
+        debut = time.perf_counter()
+        for batch, _ in iter_batches(lecteur.records(), args.batch):
+            if args.target:
+                batch = batch[involving(batch, args.target)]
+            lots.append(batch)
+        duree = time.perf_counter() - debut
+
+    tout = np.concatenate(lots) if lots else np.zeros(0, dtype=HEADER_DTYPE)
+    n = len(tout)
+    print(f"{n} trames retenues en {duree:.3f} s"
+          f" ({n / duree if duree else 0:,.0f} trames/s, {duree / n * 1e9 if n else 0:,.0f} ns/trame)")
+    if not n:
+        return
+    ip = tout['ethertype'] == 0x0800
+    print("\nEtherTypes :", ", ".join(f"0x{v:04X}={c}" for v, c in top(tout, 'ethertype')))
+    print("Protocoles :", ", ".join(f"{v}={c}" for v, c in top(tout, 'proto', mask=ip)))
+    print("Sources    :", ", ".join(f"{uint32_to_ip(v)}={c}" for v, c in top(tout, 'src', 5, mask=ip)))
+    ports = (tout['proto'] == 6) | (tout['proto'] == 17)
+    print("Ports dst  :", ", ".join(f"{v}={c}" for v, c in top(tout, 'dport', 10, mask=ports)))
+    print(f"Octets     : {int(tout['length'].sum()):,}")
+
+
+if __name__ == '__main__':
+    main()
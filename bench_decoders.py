@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ BENCH DECODERS : mesure reproductible des décodeurs sur un corpus synthétique
+------------------------------------------------------------------------------------------------
+ Chaque décodeur est appelé sur toutes les trames (ou couches) du corpus concernées :
+
+   decoder_ethernet          bible_code/module_01_liaison/01_sniffer_ethernet.py
+   PacketParser.unpack_*     live_packet_visualizer.py (ethernet, ipv4, tcp, udp, icmp, arp, dns)
+   parser_nom                bible_code/module_03_services/01_mini_dns.py
+   checksum_ip               bible_code/module_01_liaison/03_encapsulateur.py
+   format_payload            hexdump.py, via PacketParser (charges TCP et ICMP non vides)
+   build_layers, decode_message   les chemins actuels du visualiseur, pour comparaison
+
+ Pour chacun :
+   - ns/trame : meilleur temps sur --repeat passages (le minimum est le moins bruité) ;
+   - allocs/trame et octets/trame : blocs mémoire encore vivants après le passage, vus
+     par tracemalloc — c'est-à-dire ce que le décodeur crée et rend (tuples, chaînes...).
+
+ Le corpus vient de synthetic_frames.py : déterministe, en mémoire, sans root ni réseau.
+
+   python3 bench_decoders.py                              # mesurer
+   python3 bench_decoders.py --save bench_baseline.json   # enregistrer une référence
+   python3 bench_decoders.py --compare bench_baseline.json --tolerance 15
+     -> code de sortie 1 si un décodeur est plus lent de plus de 15 %
+------------------------------------------------------------------------------------------------
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from synthetic_frames import build_corpus, digest
+
+RACINE = os.path.dirname(os.path.abspath(__file__))
+
+
+def charger_lecon(chemin, nom):
+    """Les leçons (01_xxx.py) ne sont pas importables par leur nom : on les charge par chemin."""
+    spec = importlib.util.spec_from_file_location(nom, os.path.join(RACINE, chemin))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class _SansDessin:
+    """Visualiseur factice : build_layers ne fait que préparer ses appels draw_*."""
+    def __getattr__(self, nom):
+        return print
+
+
+def preparer(corpus):
+    """[(nom, fonction, [arguments, ...]), ...] : les entrées sont découpées d'avance."""
+    from dissectors import Dissection, REGISTRY
+    from dns_decoder import decode_message
+    from live_packet_visualizer import PacketParser
+
+    sniffer = charger_lecon('bible_code/module_01_liaison/01_sniffer_ethernet.py', 'sniffer_ethernet')
+    encapsulateur = charger_lecon('bible_code/module_01_liaison/03_encapsulateur.py', 'encapsulateur')
+    mini_dns = charger_lecon('bible_code/module_03_services/01_mini_dns.py', 'mini_dns')
+    parser = PacketParser()
+    vis = _SansDessin()
+
+    ipv4, tcp, udp, icmp, arp, dns, entetes, charges = [], [], [], [], [], [], [], []
+    for trame in corpus:
+        ethertype = (trame[12] << 8) | trame[13]
+        if ethertype == 0x0806:
+            arp.append((trame[14:],))
+            continue
+        paquet = trame[14:]
+        ipv4.append((paquet,))
+        entetes.append((paquet[:10] + b'\x00\x00' + paquet[12:20],))
+        segment = paquet[(paquet[0] & 0x0F) * 4:]
+        proto = paquet[9]
+        if proto == 6:
+            tcp.append((segment,))
+            if len(segment) > (segment[12] >> 4) * 4:
+                charges.append((segment[(segment[12] >> 4) * 4:],))
+        elif proto == 17:
+            udp.append((segment,))
+            if segment[0:2] == b'\x00\x35' or segment[2:4] == b'\x00\x35':
+                dns.append((segment[8:],))
+        elif proto == 1:
+            icmp.append((segment,))
+            if len(segment) > 8:
+                charges.append((segment[4:],))
+    trames = [(trame,) for trame in corpus]
+
+    def couches(trame):
+        return REGISTRY.dissect(trame, Dissection(None, parser, vis))
+
+    return [
+        ('decoder_ethernet', sniffer.decoder_ethernet, trames),
+        ('PacketParser.unpack_ethernet', parser.unpack_ethernet, trames),
+        ('PacketParser.unpack_ipv4', parser.unpack_ipv4, ipv4),
+        ('PacketParser.unpack_tcp', parser.unpack_tcp, tcp),
+        ('PacketParser.unpack_udp', parser.unpack_udp, udp),
+        ('PacketParser.unpack_icmp', parser.unpack_icmp, icmp),
+        ('PacketParser.unpack_arp', parser.unpack_arp, arp),
+        ('PacketParser.unpack_dns', parser.unpack_dns, dns),
+        ('parser_nom', mini_dns.parser_nom, [(message, 12) for (message,) in dns]),
+        ('checksum_ip', encapsulateur.checksum_ip, entetes),
+        ('PacketParser.format_payload', parser.format_payload, charges),
+        ('dns_decoder.decode_message', decode_message, dns),
+        ('build_layers', couches, trames),
+    ]
+
+
+def mesurer(fonction, entrees, repeat):
+    """(ns par appel, blocs alloués conservés par appel, octets conservés par appel)."""
+    meilleur = float('inf')
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            debut = time.perf_counter_ns()
+            for arguments in entrees:
+                fonction(*arguments)
+            meilleur = min(meilleur, time.perf_counter_ns() - debut)
+    finally:
+        gc.enable()
+
+    # Allocations : on garde chaque résultat pour compter ce que le décodeur a créé
+    resultats = [None] * len(entrees)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for k, arguments in enumerate(entrees):
+            resultats[k] = fonction(*arguments)
+        octets, _ = tracemalloc.get_traced_memory()
+        blocs = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    finally:
+        tracemalloc.stop()
+    n = len(entrees)
+    return meilleur / n, blocs / n, octets / n
+
+
+def comparer(resultats, reference, tolerance):
+    """Affiche l'écart avec la référence ; rend la liste des régressions."""
+    if reference.get('corpus') != resultats['corpus']:
+        print("ATTENTION : corpus différent de celui de la référence (taille ou graine) ;"
+              " la comparaison n'a pas de sens.")
+    regressions = []
+    print(f"\n{'DÉCODEUR':<30} {'RÉF ns':>9} {'ns':>9} {'ÉCART':>8}")
+    for nom, mesure in resultats['results'].items():
+        ancien = reference['results'].get(nom)
+        if ancien is None:
+            print(f"{nom:<30} {'-':>9} {mesure['ns']:>9.0f}   nouveau")
+            continue
+        ecart = (mesure['ns'] - ancien['ns']) / ancien['ns'] * 100
+        alerte = ''
+        if ecart > tolerance:
+            alerte = '  RÉGRESSION'
+            regressions.append(nom)
+        print(f"{nom:<30} {ancien['ns']:>9.0f} {mesure['ns']:>9.0f} {ecart:>+7.1f}%{alerte}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark des décodeurs sur un corpus synthétique.")
+    ap.add_argument('--frames', type=int, default=20_000, help="trames dans le corpus (défaut : 20000)")
+    ap.add_argument('--repeat', type=int, default=5, help="passages chronométrés par décodeur")
+    ap.add_argument('--only', metavar='MOT', help="ne mesurer que les décodeurs dont le nom contient MOT")
+    ap.add_argument('--save', metavar='FICHIER', help="enregistrer les résultats comme référence (JSON)")
+    ap.add_argument('--compare', metavar='FICHIER', help="comparer à une référence enregistrée")
+    ap.add_argument('--tolerance', type=float, default=15.0,
+                    help="écart en %% au-delà duquel un ralentissement est une régression")
+    args = ap.parse_args()
+
+    corpus = build_corpus(args.frames)
+    empreinte = digest(corpus)
+    print(f"Corpus : {len(corpus)} trames, {sum(map(len, corpus)):,} octets, sha256 {empreinte[:16]}")
+    print(f"Python {platform.python_version()} ({platform.machine()})\n")
+
+    resultats = {
+        'corpus': empreinte,
+        'frames': len(corpus),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': {},
+    }
+    print(f"{'DÉCODEUR':<30} {'ENTRÉES':>8} {'ns/trame':>10} {'allocs/trame':>13} {'octets/trame':>13}")
+    for nom, fonction, entrees in preparer(corpus):
+        if args.only and args.only not in nom:
+            continue
+        if not entrees:
+            continue
+        ns, allocs, octets = mesurer(fonction, entrees, args.repeat)
+        resultats['results'][nom] = {'inputs': len(entrees), 'ns': round(ns, 1),
+                                     'allocs': round(allocs, 2), 'bytes': round(octets, 1)}
+        print(f"{nom:<30} {len(entrees):>8} {ns:>10.0f} {allocs:>13.2f} {octets:>13.0f}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(resultats, f, indent=2)
+        print(f"\nRéférence enregistrée dans {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            reference = json.load(f)
+        regressions = comparer(resultats, reference, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} régression(s) au-delà de {args.tolerance:g} % : {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -16,10 +16,49 @@ Structure d'une trame Ethernet II :
 Crash Test :
   sudo python3 bible_code/module_01_liaison/01_sniffer_ethernet.py
   -> puis pingue une machine ou ouvre un navigateur pour générer du trafic
+
+  sudo python3 bible_code/module_01_liaison/01_sniffer_ethernet.py --backend ring
+  -> même capture via l'anneau mmap TPACKET_V3 (voir capture.py à la racine)
+
+  sudo python3 bible_code/module_01_liaison/01_sniffer_ethernet.py --workers 4 --fanout hash
+  -> 4 processus, un socket chacun, réunis dans un groupe PACKET_FANOUT :
+     le noyau répartit les flux entre eux, le parent additionne les compteurs
+
+  sudo python3 bible_code/module_01_liaison/01_sniffer_ethernet.py --write capture.pcapng --quiet
+  -> enregistre les trames (horodatage ns) pour Wireshark, via un thread d'écriture dédié ;
+     --rotate-size 100 / --rotate-seconds 60 pour changer de fichier, --snaplen 128 pour tronquer
+
+  sudo python3 bible_code/module_01_liaison/01_sniffer_ethernet.py --store capture.store --quiet
+  -> même enregistrement, plus des index (temps, IP, ports) tenus à jour pendant la capture :
+     python3 capture_store.py capture.store --ip 10.0.0.5 --from 14:02 --to 14:05
+
+  sudo python3 bible_code/module_01_liaison/01_sniffer_ethernet.py --quiet --metrics-port 9108
+  -> curl http://127.0.0.1:9108/metrics : trames, octets, débits, pertes noyau
+     (PACKET_STATISTICS), compteurs par EtherType et protocole IP (voir metrics.py)
+
+  sudo python3 bible_code/module_01_liaison/01_sniffer_ethernet.py --quiet --sample 100 --snaplen 96
+  -> sur un lien saturé : le filtre BPF tire au sort une trame sur 100 et n'en copie que
+     96 octets, DANS LE NOYAU ; les totaux affichés sont ré-extrapolés (x 100).
+     --sample-mode count : exactement une trame sur 100, mais le tri se fait ici, en Python
 """
 
-import socket
+import argparse
+import multiprocessing
+import os
+import queue
+import signal
 import struct
+import sys
+import time
+from collections import Counter
+
+# capture.py vit à la racine du dépôt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from bpf_filter import attach_filter, compile_sampler
+from capture import FANOUT_MODES, join_fanout, open_capture, open_socket, sample_frames
+from capture_store import CaptureStore
+from metrics import CaptureMetrics, MetricsPoller, start_server
+from pcap_io import PcapWriter, SNAPLEN_MAX
 
 ETHERTYPES = {
     0x0800: "IPv4",
@@ -51,7 +90,219 @@ def decoder_ethernet(trame):
     return mac_dest, mac_src, ethertype, nom_type, payload
 
 
+def ouvrir_capture(args):
+    """
+    Socket AF_PACKET + filtre BPF d'échantillonnage/snaplen (si demandé), puis le backend.
+    Le filtre est attaché avant l'anneau : ce qu'il rejette n'est jamais copié.
+    """
+    sock = open_socket()
+    if (args.sample > 1 and args.sample_mode == 'kernel') or args.snaplen < SNAPLEN_MAX:
+        echantillon = args.sample if args.sample_mode == 'kernel' else 1
+        attach_filter(sock, compile_sampler(echantillon, args.snaplen))
+    return open_capture(args.backend, sock=sock)
+
+
+def trames(capture, args):
+    """Les trames du backend, échantillonnées ici si --sample-mode count."""
+    if args.sample > 1 and args.sample_mode == 'count':
+        return sample_frames(capture.frames(), args.sample)
+    return capture.frames()
+
+
+def estimation(n, args):
+    """' (≈ N réelles, échantillon 1/K)' : ré-extrapole un compteur échantillonné."""
+    if args.sample <= 1:
+        return ''
+    return f" (≈ {n * args.sample} réelles, échantillon 1/{args.sample})"
+
+
+def ouvrir_enregistreur(args, suffixe=''):
+    """PcapWriter (--write) ou CaptureStore indexé (--store), ou None sans les deux."""
+    if args.store:
+        return CaptureStore(f"{args.store}{suffixe}", snaplen=args.snaplen)
+    if not args.write:
+        return None
+    racine, extension = os.path.splitext(args.write)
+    return PcapWriter(
+        f"{racine}{suffixe}{extension}",
+        snaplen=args.snaplen,
+        rotate_bytes=args.rotate_size * 1_000_000 if args.rotate_size else None,
+        rotate_seconds=args.rotate_seconds,
+    )
+
+
+def bilan_enregistreur(enregistreur):
+    enregistreur.close()
+    print(f"{enregistreur.written} trames écrites dans {len(enregistreur.files)} fichier(s)"
+          f" ({enregistreur.dropped} perdues : disque trop lent)")
+
+
+def interrompre_une_fois(signum, frame):
+    """Ctrl+C : les suivants sont ignorés AVANT que l'exception ne remonte (vidage tranquille)."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    raise KeyboardInterrupt
+
+
+def worker(numéro, args, groupe, file_compteurs):
+    """
+    Processus de capture : un socket dans le groupe fanout, décode sa part du trafic
+    et envoie ses compteurs au parent (par delta, environ une fois par seconde).
+    """
+    signal.signal(signal.SIGINT, interrompre_une_fois)
+    capture = ouvrir_capture(args)
+    join_fanout(capture.sock, groupe, args.fanout)
+    enregistreur = ouvrir_enregistreur(args, f"-w{numéro}")
+
+    compteurs = Counter()
+    mesures = CaptureMetrics() if args.metrics_port else None
+    prochain_envoi = time.monotonic() + 1.0
+    try:
+        for trame, meta, ts_ns, longueur in trames(capture, args):
+            mac_dest, mac_src, ethertype, nom_type, payload = decoder_ethernet(trame)
+            compteurs[nom_type] += 1
+            compteurs['octets'] += longueur
+            if mesures is not None:
+                mesures.observe(trame, longueur)
+            if enregistreur is not None:
+                enregistreur.write(trame, ts_ns, meta[0], longueur)
+            if not args.quiet:
+                print(
+                    f"[w{numéro}] {meta[0]:<8} | "
+                    f"{mac_src} → {mac_dest} | "
+                    f"{nom_type:<18} | "
+                    f"{len(payload):4d} octets"
+                )
+            if time.monotonic() >= prochain_envoi:
+                file_compteurs.put((numéro, compteurs, delta_mesures(mesures, capture)))
+                compteurs = Counter()
+                prochain_envoi = time.monotonic() + 1.0
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)   # un seul Ctrl+C suffit, même en fin de flux
+        dernier = delta_mesures(mesures, capture)
+        capture.close()
+        if enregistreur is not None:
+            enregistreur.close()
+        file_compteurs.put((numéro, compteurs, dernier))
+        file_compteurs.put((numéro, None, None))         # "j'ai fini"
+
+
+def delta_mesures(mesures, capture):
+    """Relève PACKET_STATISTICS du worker et rend ses mesures depuis le dernier envoi."""
+    if mesures is None:
+        return None
+    mesures.add_kernel_stats(*capture.stats())
+    return mesures.take_delta()
+
+
+def demarrer_mesures(args, stats=None):
+    """CaptureMetrics + relevé périodique + serveur HTTP, ou (None, None) sans --metrics-port."""
+    if not args.metrics_port:
+        return None, None
+    mesures = CaptureMetrics(scale=args.sample)
+    releveur = MetricsPoller(mesures, stats)
+    releveur.start()
+    start_server(mesures, args.metrics_port)
+    print(f"Métriques Prometheus : http://127.0.0.1:{args.metrics_port}/metrics\n")
+    return mesures, releveur
+
+
+def main_workers(args):
+    """Lance N workers PACKET_FANOUT et fusionne leurs compteurs."""
+    groupe = os.getpid() & 0xFFFF
+    file_compteurs = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=worker, args=(i, args, groupe, file_compteurs))
+        for i in range(args.workers)
+    ]
+    # Ctrl+C ignoré pendant le démarrage (hérité par les workers jusqu'à leur propre gestionnaire)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for w in workers:
+        w.start()
+
+    def relayer(signum, frame):
+        # Ignoré d'abord : un second Ctrl+C ne peut plus interrompre get() ou join() et laisser
+        # des workers orphelins. Pas d'exception : la boucle attend leurs derniers compteurs.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        for w in workers:
+            if w.is_alive():
+                os.kill(w.pid, signal.SIGINT)
+
+    signal.signal(signal.SIGINT, relayer)
+
+    # Les workers relèvent eux-mêmes PACKET_STATISTICS (un socket chacun) : le parent fusionne
+    mesures, _ = demarrer_mesures(args)
+    total = Counter()
+    par_worker = Counter()
+    actifs = len(workers)
+    while actifs:
+        try:
+            numéro, delta, delta_mesure = file_compteurs.get(timeout=1.0)
+        except queue.Empty:
+            if not any(w.is_alive() for w in workers):
+                break   # un worker mort sans dire "j'ai fini" ne doit pas bloquer le parent
+            continue
+        if delta is None:
+            actifs -= 1
+            continue
+        total.update(delta)
+        if mesures is not None and delta_mesure is not None:
+            mesures.merge(delta_mesure)
+        par_worker[numéro] += sum(n for k, n in delta.items() if k != 'octets')
+    for w in workers:
+        w.join()
+
+    octets = total.pop('octets', 0)
+    n = sum(total.values())
+    print(f"\n{n} trames capturées ({octets} octets) par {len(workers)} workers{estimation(n, args)}.")
+    for numéro in range(len(workers)):
+        print(f"  worker {numéro} : {par_worker[numéro]} trames")
+    for nom_type, n in total.most_common():
+        print(f"  {nom_type:<18} {n}")
+    if mesures is not None:
+        print(f"  perdues par le noyau : {mesures.kernel_drops} / {mesures.kernel_packets}")
+
+
 def main():
+    ap = argparse.ArgumentParser(description="Sniffer Ethernet — Couche 2")
+    ap.add_argument('--backend', choices=('recvfrom', 'ring'), default='recvfrom',
+                    help="recvfrom = un appel système par trame, ring = anneau mmap TPACKET_V3")
+    ap.add_argument('--workers', type=int, default=1,
+                    help="nombre de processus de capture (groupe PACKET_FANOUT si > 1)")
+    ap.add_argument('--fanout', choices=sorted(FANOUT_MODES), default='hash',
+                    help="répartition entre workers : hash (par flux), cpu, lb (round-robin)")
+    ap.add_argument('--quiet', action='store_true',
+                    help="ne pas afficher chaque trame, seulement le bilan")
+    ap.add_argument('--write', metavar='FICHIER',
+                    help="enregistrer les trames (.pcapng ou .pcap) ; un fichier par worker")
+    ap.add_argument('--store', metavar='RÉPERTOIRE',
+                    help="enregistrer dans un store indexé par temps, IP et port (capture_store.py)")
+    ap.add_argument('--snaplen', type=int, default=SNAPLEN_MAX,
+                    help="octets conservés par trame (tronquée dans le noyau, avant toute copie)")
+    ap.add_argument('--sample', type=int, default=1, metavar='N',
+                    help="ne capturer qu'une trame sur N ; les totaux sont ré-extrapolés")
+    ap.add_argument('--sample-mode', choices=('kernel', 'count'), default='kernel',
+                    help="kernel = tirage aléatoire dans le filtre BPF, count = exactement 1 sur N en Python")
+    ap.add_argument('--rotate-size', type=int, metavar='MO',
+                    help="nouveau fichier tous les MO mégaoctets")
+    ap.add_argument('--rotate-seconds', type=int, metavar='S',
+                    help="nouveau fichier toutes les S secondes")
+    ap.add_argument('--metrics-port', type=int, metavar='PORT',
+                    help="exposer les métriques (format Prometheus) sur http://127.0.0.1:PORT/metrics")
+    args = ap.parse_args()
+    if args.sample < 1:
+        ap.error("--sample doit valoir au moins 1 (1 = toutes les trames)")
+
+    if args.workers > 1:
+        if os.geteuid() != 0:
+            print("Droits root requis. Lancez : sudo python3 bible_code/module_01_liaison/01_sniffer_ethernet.py")
+            return
+        print(f"=== SNIFFER ETHERNET — {args.workers} workers (fanout {args.fanout}) ===")
+        print("Ctrl+C pour arrêter.\n")
+        main_workers(args)
+        return
+
     print("=== SNIFFER ETHERNET — Couche 2 ===")
     print("Capture toutes les trames sur toutes les interfaces.")
     print("Ctrl+C pour arrêter.\n")
@@ -59,20 +310,30 @@ def main():
     # AF_PACKET + SOCK_RAW = accès direct aux trames Ethernet brutes (Linux uniquement)
     # htons(0x0003) = ETH_P_ALL : capturer TOUS les types de trames
     try:
-        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(0x0003))
+        capture = ouvrir_capture(args)
     except PermissionError:
         print("Droits root requis. Lancez : sudo python3 bible_code/module_01_liaison/01_sniffer_ethernet.py")
         return
 
+    enregistreur = ouvrir_enregistreur(args)
+    mesures, releveur = demarrer_mesures(args, capture.stats)
+
     compteur = 0
     try:
-        while True:
-            # recvfrom retourne (trame_brute, (interface, ethertype, pkt_type, arphrd, addr))
-            trame, meta = sock.recvfrom(65535)
+        # Chaque trame arrive avec meta = (interface, ethertype, pkt_type, arphrd, addr),
+        # comme l'adresse retournée par recvfrom, son horodatage en nanosecondes et sa
+        # taille sur le fil (plus grande que la trame si --snaplen l'a tronquée)
+        for trame, meta, ts_ns, longueur in trames(capture, args):
             interface = meta[0]
             mac_dest, mac_src, ethertype, nom_type, payload = decoder_ethernet(trame)
 
             compteur += 1
+            if mesures is not None:
+                mesures.observe(trame, longueur)
+            if enregistreur is not None:
+                enregistreur.write(trame, ts_ns, interface, longueur)
+            if args.quiet:
+                continue
             print(
                 f"[#{compteur:04d}] {interface:<8} | "
                 f"{mac_src} → {mac_dest} | "
@@ -80,9 +341,16 @@ def main():
                 f"{len(payload):4d} octets"
             )
     except KeyboardInterrupt:
-        print(f"\n{compteur} trames capturées.")
+        signal.signal(signal.SIGINT, signal.SIG_IGN)   # laisser l'enregistreur vider son tampon
+        print(f"\n{compteur} trames capturées{estimation(compteur, args)}.")
+        if releveur is not None:
+            releveur.stop.set()
+            releveur.poll()
+            print(f"Perdues par le noyau : {mesures.kernel_drops} / {mesures.kernel_packets}")
     finally:
-        sock.close()
+        capture.close()
+        if enregistreur is not None:
+            bilan_enregistreur(enregistreur)
 
 
 if __name__ == '__main__':
@@ -27,14 +27,56 @@ Crash Test :
   sudo python3 bible_code/module_01_liaison/02_arp_forge.py
   -> interface : eth0 (ou ens33, wlan0...)
   -> IP cible  : l'IP de votre passerelle (ex: 192.168.1.1)
+
+  sudo python3 bible_code/module_01_liaison/02_arp_forge.py --sweep 192.168.1.0/24 -i eth0
+  -> crie dans TOUTE la pièce : une requête par adresse du réseau, un seul socket.
+     La trame est forgée une fois ; pour chaque cible, seuls les 4 octets "Target IP"
+     sont réécrits. Les requêtes partent par rafales (--rate, --burst) pendant qu'une
+     seule boucle ramasse les réponses, jusqu'à une échéance globale (--timeout après
+     le dernier envoi). Affiche la latence de chaque hôte et la durée totale.
+
+  sudo python3 bible_code/module_01_liaison/02_arp_forge.py --cache
+  -> demande d'abord au service arp_cache.py (à la racine) s'il connaît déjà la MAC :
+     pas de cri du tout si quelqu'un l'a déjà entendue.
+
+  sudo python3 bible_code/module_01_liaison/02_arp_forge.py --respond 10.99.0.0/20 -i eth0
+  -> l'inverse : répondre "c'est moi !" pour des milliers d'IP virtuelles. Chaque réponse
+     est préparée à l'avance (une par IP possédée) ; à l'arrivée d'une requête, on copie
+     le gabarit dans l'anneau d'émission et on n'y écrit que la MAC/IP du demandeur.
+     Réception par l'anneau TPACKET_V3, émission par PACKET_TX_RING : un send() par lot.
+
+  sudo python3 bible_code/module_01_liaison/02_arp_forge.py --respond 10.99.0.0/20 --bench 5
+  -> crée une paire veth (arpb0 <-> arpb1), inonde arpb1 de requêtes pendant 5 s et
+     compte les réponses reçues : réponses/s tenues, avec --tx send puis --tx ring.
 """
 
+import argparse
+import ipaddress
+import select
 import socket
 import struct
 import fcntl
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+# arp_cache.py vit à la racine du dépôt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+import arp_cache
+from bpf_filter import attach_filter, compile_arp
+from capture import RingCapture, open_socket, open_transmitter
 
 BROADCAST_MAC = b'\xff\xff\xff\xff\xff\xff'
 
+# Positions dans la trame de 42 octets (14 Ethernet + 28 ARP)
+OFFSET_OPCODE    = 20
+OFFSET_SENDER    = 22   # MAC (6) puis IP (4) de l'émetteur
+OFFSET_SENDER_IP = 28
+OFFSET_TARGET_IP = 38
+IPV4 = struct.Struct('!I')
+
 # Codes ioctl Linux pour lire les infos d'une interface réseau
 SIOCGIFHWADDR = 0x8927   # Lire l'adresse MAC
 SIOCGIFADDR   = 0x8915   # Lire l'adresse IP
@@ -101,10 +143,316 @@ def decoder_arp_reply(trame: bytes):
     return sender_ip, sender_mac
 
 
+def balayer_reseau(sock, mac_src, ip_src, reseau, debit=2000, rafale=64, delai=1.0):
+    """
+    Résout toutes les adresses de `reseau` (ipaddress.IPv4Network) avec un seul socket.
+
+    Envoi : un gabarit unique (bytearray) dont seuls les octets 38..41 changent,
+    `rafale` trames d'affilée, puis une pause pour tenir `debit` requêtes/s.
+    Réception : entre deux rafales, select() puis on vide le socket sans bloquer.
+    Tout s'arrête à l'échéance (fin théorique des envois + `delai`) ou dès que chaque
+    cible a répondu.
+
+    Rend (réponses, envoyées, durée) ; réponses = {ip (int): (mac bytes, latence ns)}.
+    """
+    gabarit = bytearray(forger_arp_request(mac_src, ip_src, '0.0.0.0'))
+    cibles = [int(hote) for hote in reseau.hosts()] or [int(reseau.network_address)]
+    envois = {}                        # ip -> instant d'envoi (ns)
+    reponses = {}
+    tampon = bytearray(64)             # une réponse ARP tient dans 60 octets
+    vue = memoryview(tampon)
+    pas = rafale / debit               # secondes entre deux rafales
+
+    debut = time.monotonic()
+    echeance = debut + len(cibles) / debit + delai
+    prochaine_rafale = debut
+    suivante = 0
+    while len(reponses) < len(cibles):
+        maintenant = time.monotonic()
+        if maintenant >= echeance:
+            break
+
+        # --- Rafale : patcher l'IP cible, envoyer ---
+        if suivante < len(cibles) and maintenant >= prochaine_rafale:
+            for ip in cibles[suivante:suivante + rafale]:
+                IPV4.pack_into(gabarit, OFFSET_TARGET_IP, ip)
+                sock.send(gabarit)
+                envois[ip] = time.perf_counter_ns()
+            suivante += rafale
+            prochaine_rafale += pas
+            if suivante >= len(cibles):
+                # Tout est parti : l'échéance ne dépend plus que du dernier envoi
+                echeance = time.monotonic() + delai
+
+        # --- Réception : attendre jusqu'à la prochaine rafale (ou l'échéance) ---
+        reveil = prochaine_rafale if suivante < len(cibles) else echeance
+        prets, _, _ = select.select([sock], [], [], max(0.0, reveil - time.monotonic()))
+        if not prets:
+            continue
+        while True:
+            try:
+                n = sock.recv_into(tampon, len(tampon), socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                break
+            recu = time.perf_counter_ns()
+            if n < 42 or tampon[OFFSET_OPCODE + 1] != 2 or tampon[OFFSET_OPCODE] != 0:
+                continue
+            ip, = IPV4.unpack_from(tampon, OFFSET_SENDER_IP)
+            envoi = envois.get(ip)
+            if envoi is not None and ip not in reponses:
+                reponses[ip] = (bytes(vue[22:28]), recu - envoi)
+
+    return reponses, min(suivante, len(cibles)), time.monotonic() - debut
+
+
+def preparer_reponses(mac_src: bytes, ips) -> dict:
+    """
+    {ip (int): réponse ARP de 42 octets} pour chaque IP possédée. Tout est déjà en place
+    (notre MAC, l'IP possédée, opcode 2) sauf la MAC destination et la MAC/IP cible.
+    """
+    entete = struct.pack('! H H B B H', 1, 0x0800, 6, 4, 2)
+    return {ip: bytes(6) + mac_src + b'\x08\x06' + entete + mac_src + IPV4.pack(ip) + bytes(10)
+            for ip in ips}
+
+
+def repondre(capture, emetteur, reponses, stop, compteurs):
+    """
+    Boucle du répondeur. `capture` : RingCapture filtrée sur les ARP Request ;
+    `emetteur` : capture.open_transmitter(). Une réponse = une copie du gabarit et deux
+    écritures : [0:6] MAC destination, [32:42] MAC + IP cible (= l'émetteur de la requête,
+    octets 22..31, contigus). Un flush() par bloc reçu.
+    """
+    for bloc in capture.blocks():
+        for trame, _, _, _ in bloc:
+            compteurs['requetes'] += 1
+            if len(trame) < 42:   # le filtre BPF les écarte déjà ; sans lui, trame tronquée
+                compteurs['ignorees'] += 1
+                continue
+            gabarit = reponses.get(IPV4.unpack_from(trame, OFFSET_TARGET_IP)[0])
+            if gabarit is None:
+                compteurs['ignorees'] += 1
+                continue
+            case = emetteur.slot()
+            if case is None:
+                emetteur.flush()   # anneau plein : on émet ce qui attend, les cases se libèrent
+                case = emetteur.slot()
+            case[:42] = gabarit
+            case[0:6] = trame[OFFSET_SENDER:OFFSET_SENDER + 6]
+            case[32:42] = trame[OFFSET_SENDER:OFFSET_SENDER + 10]
+            emetteur.commit(42)
+            compteurs['reponses'] += 1
+        emetteur.flush()
+        if stop():
+            return
+
+
+def ips_possedees(cidrs):
+    ips = []
+    for cidr in cidrs:
+        reseau = ipaddress.ip_network(cidr, strict=False)
+        ips.extend(int(hote) for hote in reseau.hosts() or [reseau.network_address])
+    return ips
+
+
+def ouvrir_repondeur(interface, tx):
+    """(capture des ARP Request entrants, émetteur) sur `interface`."""
+    sock = open_socket(interface, 0x0806)
+    attach_filter(sock, compile_arp(1))
+    return RingCapture(sock=sock, block_size=1 << 16, retire_ms=1, poll_ms=50), open_transmitter(tx, interface)
+
+
+def main_respond(args):
+    ips = ips_possedees(args.respond)
+    try:
+        capture, emetteur = ouvrir_repondeur(args.interface, args.tx)
+    except PermissionError:
+        print("Droits root requis : sudo python3 bible_code/module_01_liaison/02_arp_forge.py")
+        return
+    except OSError as e:
+        print(f"Interface '{args.interface}' introuvable. ({e})")
+        return
+    mac_src = get_mac_interface(capture.sock, args.interface)
+    reponses = preparer_reponses(mac_src, ips)
+    print(f"\nRépondeur ARP sur {args.interface} ({':'.join(f'{b:02X}' for b in mac_src)}) : "
+          f"{len(reponses)} IP possédées, émission '{args.tx}'. Ctrl+C pour arrêter.")
+    compteurs = {'requetes': 0, 'reponses': 0, 'ignorees': 0}
+    debut = time.monotonic()
+    try:
+        repondre(capture, emetteur, reponses, lambda: False, compteurs)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        duree = time.monotonic() - debut
+        _, perdues = capture.stats()
+        emetteur.close()
+        capture.close()
+    print(f"\n{compteurs['reponses']} réponses ({compteurs['reponses'] / duree:,.0f}/s), "
+          f"{compteurs['ignorees']} requêtes pour d'autres IP, {perdues} perdues par le noyau")
+
+
+# --- Benchmark sur une paire veth ----------------------------------------------------------------
+
+VETH_REPONDEUR, VETH_INONDEUR = 'arpb0', 'arpb1'
+
+
+def inonder(interface, ips, duree, envoyees):
+    """Processus fils : envoie des ARP Request pour `ips` en boucle, aussi vite que possible."""
+    emetteur = open_transmitter('ring', interface)
+    mac = get_mac_interface(emetteur.sock, interface)
+    requetes = [forger_arp_request(mac, '10.255.255.254', str(ipaddress.IPv4Address(ip))) for ip in ips]
+    fin = time.monotonic() + duree
+    n = 0
+    while time.monotonic() < fin:
+        for trame in requetes[n % len(requetes):][:256]:
+            case = emetteur.slot()
+            if case is None:
+                break
+            case[:42] = trame
+            emetteur.commit(42)
+        emetteur.flush()
+        n = emetteur.sent
+    envoyees.value = emetteur.sent
+    emetteur.close()
+
+
+def compter_reponses(interface, duree, recues):
+    """Processus fils : compte les ARP Reply qui reviennent sur `interface`."""
+    sock = open_socket(interface, 0x0806)
+    attach_filter(sock, compile_arp(2))
+    capture = RingCapture(sock=sock, block_size=1 << 16, retire_ms=1, poll_ms=50)
+    fin = time.monotonic() + duree
+    for bloc in capture.blocks():
+        recues.value += len(bloc)
+        if time.monotonic() >= fin:
+            break
+    capture.close()
+
+
+def mesurer_repondeur(tx, ips, duree):
+    capture, emetteur = ouvrir_repondeur(VETH_REPONDEUR, tx)
+    reponses = preparer_reponses(get_mac_interface(capture.sock, VETH_REPONDEUR), ips)
+    capture.stats()
+    envoyees = multiprocessing.Value('Q', 0)
+    recues = multiprocessing.Value('Q', 0)
+    compteur = multiprocessing.Process(target=compter_reponses, args=(VETH_INONDEUR, duree + 1.0, recues))
+    inondeur = multiprocessing.Process(target=inonder, args=(VETH_INONDEUR, ips, duree, envoyees))
+    compteur.start()
+    time.sleep(0.3)
+    inondeur.start()
+    compteurs = {'requetes': 0, 'reponses': 0, 'ignorees': 0}
+    fin = time.monotonic() + duree + 0.5
+    try:
+        repondre(capture, emetteur, reponses, lambda: time.monotonic() >= fin, compteurs)
+        _, perdues = capture.stats()
+    finally:
+        emetteur.close()
+        capture.close()
+        inondeur.join()
+        compteur.join()
+    return envoyees.value, compteurs['requetes'], recues.value, perdues
+
+
+def main_bench(args):
+    ips = ips_possedees(args.respond)
+    ip_link = ['ip', 'link']
+    try:
+        subprocess.run(ip_link + ['add', VETH_REPONDEUR, 'type', 'veth', 'peer', 'name', VETH_INONDEUR],
+                       check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"Impossible de créer la paire veth ({e}) : root et iproute2 requis.")
+        return
+    try:
+        for nom in (VETH_REPONDEUR, VETH_INONDEUR):
+            subprocess.run(ip_link + ['set', nom, 'up'], check=True)
+        print(f"\n{len(ips)} IP possédées, {args.bench:g} s par mode, veth {VETH_INONDEUR} -> {VETH_REPONDEUR}\n")
+        print(f"{'ÉMISSION':<9} {'REQUÊTES':>12} {'TRAITÉES':>12} {'RÉPONSES':>12} {'PERDUES':>10} {'RÉPONSES/S':>12}")
+        for tx in ('send', 'ring'):
+            envoyees, traitees, recues, perdues = mesurer_repondeur(tx, ips, args.bench)
+            print(f"{tx:<9} {envoyees:>12,} {traitees:>12,} {recues:>12,} {perdues:>10,} {recues / args.bench:>12,.0f}")
+    finally:
+        subprocess.run(ip_link + ['del', VETH_REPONDEUR], check=False)
+
+
+def main_sweep(args):
+    reseau = ipaddress.ip_network(args.sweep, strict=False)
+    try:
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(0x0806))
+        sock.bind((args.interface, 0))
+    except PermissionError:
+        print("Droits root requis : sudo python3 bible_code/module_01_liaison/02_arp_forge.py")
+        return
+    except OSError as e:
+        print(f"Interface '{args.interface}' introuvable. ({e})")
+        return
+
+    try:
+        mac_src = get_mac_interface(sock, args.interface)
+        ip_src  = get_ip_interface(sock, args.interface)
+        print(f"\nNous sommes : {ip_src} ({':'.join(f'{b:02X}' for b in mac_src)})")
+        print(f"Balayage de {reseau} : {max(reseau.num_addresses - 2, 1)} adresses, "
+              f"{args.rate:g} requêtes/s par rafales de {args.burst}...\n")
+        reponses, envoyees, duree = balayer_reseau(sock, mac_src, ip_src, reseau,
+                                                   args.rate, args.burst, args.timeout)
+    finally:
+        sock.close()
+
+    print(f"{'IP':<16} {'MAC':<18} {'LATENCE':>10}")
+    for ip in sorted(reponses):
+        mac, latence = reponses[ip]
+        print(f"{str(ipaddress.IPv4Address(ip)):<16} {':'.join(f'{b:02X}' for b in mac):<18} "
+              f"{latence / 1e6:>8.2f} ms")
+    print(f"\n{len(reponses)} hôte(s) sur {envoyees} adresses interrogées, en {duree:.2f} s")
+
+
 def main():
-    interface = input("Interface réseau (ex: eth0, ens33, wlan0) : ").strip()
+    ap = argparse.ArgumentParser(description="Forger des requêtes ARP (une IP, ou tout un réseau)")
+    ap.add_argument('--sweep', metavar='CIDR', help="balayer tout un réseau (ex: 192.168.1.0/24)")
+    ap.add_argument('-i', '--interface', help="interface réseau (demandée si absente)")
+    ap.add_argument('--rate', type=float, default=2000,
+                    help="requêtes par seconde pendant le balayage (défaut : 2000)")
+    ap.add_argument('--burst', type=int, default=64,
+                    help="requêtes envoyées d'affilée entre deux pauses (défaut : 64)")
+    ap.add_argument('--timeout', type=float, default=1.0,
+                    help="secondes d'attente après le dernier envoi (défaut : 1)")
+    ap.add_argument('--respond', nargs='+', metavar='CIDR',
+                    help="répondre aux ARP Request pour ces IP (ex: 10.99.0.0/20)")
+    ap.add_argument('--tx', choices=('ring', 'send'), default='ring',
+                    help="avec --respond : émission par PACKET_TX_RING (par lots) ou un send() par réponse")
+    ap.add_argument('--bench', type=float, metavar='SECONDES',
+                    help="avec --respond : mesurer le répondeur sur une paire veth créée pour l'occasion")
+    ap.add_argument('--cache', nargs='?', const=arp_cache.SOCKET_PATH, metavar='SOCKET',
+                    help="interroger d'abord le service arp_cache.py (socket UNIX)")
+    args = ap.parse_args()
+    if args.rate <= 0 or args.burst <= 0:
+        ap.error("--rate et --burst doivent être strictement positifs")
+    if args.respond and args.bench:
+        main_bench(args)
+        return
+    if args.respond:
+        if not args.interface:
+            args.interface = input("Interface réseau (ex: eth0, ens33, wlan0) : ").strip()
+        main_respond(args)
+        return
+    if args.sweep:
+        if not args.interface:
+            args.interface = input("Interface réseau (ex: eth0, ens33, wlan0) : ").strip()
+        main_sweep(args)
+        return
+
+    interface = args.interface or input("Interface réseau (ex: eth0, ens33, wlan0) : ").strip()
     ip_cible  = input("IP à résoudre  (ex: 192.168.1.1)          : ").strip()
 
+    if args.cache:
+        try:
+            mac = arp_cache.lookup([ip_cible], args.cache).get(ip_cible)
+        except (OSError, ValueError) as e:
+            print(f"[CACHE] Service injoignable ({e}) : on crie quand même.")
+        else:
+            if mac:
+                print(f"\n[CACHE] {ip_cible} → MAC : {mac} (aucune trame envoyée)")
+                return
+            print(f"[CACHE] {ip_cible} inconnue du cache : on crie.")
+
     try:
         # 0x0806 = ETH_P_ARP : on ne capture que les trames ARP
         sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(0x0806))
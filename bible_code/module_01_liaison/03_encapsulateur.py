@@ -26,10 +26,25 @@ Structure construite (de bas en haut) :
 
 Crash Test :
   python3 bible_code/module_01_liaison/03_encapsulateur.py
+
+  python3 bible_code/module_01_liaison/03_encapsulateur.py --bench 1000000
+  -> construire_* (trois bytes neufs et deux concaténations par trame) contre
+     FabriqueTrames : le gabarit est compilé une fois, chaque trame est écrite en place
+     dans un bytearray réutilisé (pack_into), la charge utile copiée une seule fois et
+     les checksums complétés à partir de sommes précalculées.
 """
 
+import argparse
+import os
 import struct
 import socket
+import sys
+import time
+
+# hexdump.py et checksum.py vivent à la racine du dépôt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+import checksum as internet
+from hexdump import rows
 
 # ── Couleurs terminal ─────────────────────────────────────────────────────────
 R  = '\033[91m'   # rouge   → Ethernet
@@ -49,7 +64,8 @@ def mac_str_vers_bytes(mac: str) -> bytes:
 
 
 def bytes_vers_hex(données: bytes, sep: str = ' ') -> str:
-    return sep.join(f'{b:02X}' for b in données)
+    # bytes.hex() fait la conversion en C, sans f-string par octet
+    return données.hex(sep).upper() if sep else données.hex().upper()
 
 
 def bytes_vers_bin(données: bytes, sep: str = ' ') -> str:
@@ -61,39 +77,18 @@ def checksum_ip(header: bytes) -> int:
     Calcul du checksum IP (RFC 791) :
     Somme de tous les mots de 16 bits, puis complément à 1.
     Le checksum est inclus dans le header avec la valeur 0 pour le calcul.
+    (checksum.py fait la somme en un seul passage, sans boucle Python par mot.)
     """
-    if len(header) % 2:
-        header += b'\x00'
-    total = 0
-    for i in range(0, len(header), 2):
-        mot = (header[i] << 8) + header[i + 1]
-        total += mot
-    # Ramener sur 16 bits en ajoutant les retenues
-    while total >> 16:
-        total = (total & 0xFFFF) + (total >> 16)
-    return ~total & 0xFFFF
+    return internet.checksum(header)
 
 
 def checksum_udp(src_ip: str, dst_ip: str, udp_segment: bytes) -> int:
     """
     Checksum UDP calculé sur un pseudo-header IP + segment UDP.
     Le pseudo-header garantit que les données arrivent à la bonne destination.
+    Sa somme est ajoutée à celle du segment : pas de copie pseudo + segment.
     """
-    pseudo = (
-        socket.inet_aton(src_ip) +
-        socket.inet_aton(dst_ip) +
-        struct.pack('!BBH', 0, 17, len(udp_segment))
-    )
-    données = pseudo + udp_segment
-    if len(données) % 2:
-        données += b'\x00'
-    total = 0
-    for i in range(0, len(données), 2):
-        total += (données[i] << 8) + données[i + 1]
-    while total >> 16:
-        total = (total & 0xFFFF) + (total >> 16)
-    résultat = ~total & 0xFFFF
-    return résultat if résultat != 0 else 0xFFFF
+    return internet.udp_checksum(socket.inet_aton(src_ip), socket.inet_aton(dst_ip), udp_segment)
 
 
 # ── Construction des couches ──────────────────────────────────────────────────
@@ -153,6 +148,106 @@ def construire_ethernet(src_mac: str, dst_mac: str, payload: bytes) -> bytes:
     )
 
 
+# ── Fabrique de trames (gabarit précompilé) ───────────────────────────────────
+
+ETH_IP_UDP = struct.Struct('! 6s 6s H  B B H H H B B H 4s 4s  H H H H')
+LONGUEUR_ID = struct.Struct('!HH')       # IP : longueur totale (16) et identifiant (18)
+UDP_ENTETE  = struct.Struct('!HHHH')     # UDP : ports, longueur, checksum (34)
+MOT         = struct.Struct('!H')
+ENTETES     = 14 + 20 + 8
+
+
+class FabriqueTrames:
+    """
+    Trames Ethernet + IPv4 + UDP à la chaîne, sans allocation par trame.
+
+    Le gabarit (MAC, IP, TTL, protocole, ports par défaut) est compilé une fois dans un
+    bytearray de 42 octets, avec les sommes partielles de ce qui ne bouge jamais :
+      - en-tête IP sans longueur ni identifiant ;
+      - pseudo-en-tête UDP sans la longueur.
+    ecrire() copie le gabarit et la charge dans le tampon cible, pose avec pack_into les
+    champs qui varient (longueurs, identifiant, ports), et termine les deux checksums en
+    ajoutant ces champs aux sommes partielles : seule la charge utile est additionnée.
+    """
+
+    def __init__(self, src_mac: str, dst_mac: str, src_ip: str, dst_ip: str,
+                 src_port: int = 12345, dst_port: int = 80, ttl: int = 64, taille_max: int = 1514):
+        self.src_port = src_port
+        self.dst_port = dst_port
+        self.gabarit = bytearray(ENTETES)
+        ETH_IP_UDP.pack_into(
+            self.gabarit, 0,
+            mac_str_vers_bytes(dst_mac), mac_str_vers_bytes(src_mac), 0x0800,
+            (4 << 4) | 5, 0, 0, 0, 0, ttl, 17, 0,            # longueur, id, checksum : plus tard
+            socket.inet_aton(src_ip), socket.inet_aton(dst_ip),
+            0, 0, 0, 0)                                      # UDP : écrit à chaque trame
+        self.somme_ip = internet.ones_sum(self.gabarit[14:34])
+        self.somme_pseudo = internet.pseudo_header_sum(socket.inet_aton(src_ip), socket.inet_aton(dst_ip), 17, 0)
+        self.tampon = bytearray(taille_max)
+        self.vue = memoryview(self.tampon)
+
+    def ecrire(self, dest, charge, ident: int = 0x1234, src_port: int = None, dst_port: int = None,
+               somme_charge: int = None) -> int:
+        """
+        Écrit une trame complète au début de `dest` (bytearray, memoryview, case d'un anneau
+        d'émission) et rend sa longueur. `somme_charge` (checksum.ones_sum(charge)) évite de
+        réadditionner une charge qu'on envoie plusieurs fois.
+        """
+        n = len(charge)
+        sport = self.src_port if src_port is None else src_port
+        dport = self.dst_port if dst_port is None else dst_port
+        longueur_udp = 8 + n
+        dest[:ENTETES] = self.gabarit
+        dest[ENTETES:ENTETES + n] = charge
+
+        LONGUEUR_ID.pack_into(dest, 16, 20 + longueur_udp, ident)
+        MOT.pack_into(dest, 24, ~internet.fold(self.somme_ip + 20 + longueur_udp + ident) & 0xFFFF)
+
+        if somme_charge is None:
+            somme_charge = internet.ones_sum(charge)
+        # Pseudo-en-tête + en-tête UDP (la longueur y figure deux fois) + charge
+        somme = internet.fold(self.somme_pseudo + 2 * longueur_udp + sport + dport + somme_charge)
+        UDP_ENTETE.pack_into(dest, 34, sport, dport, longueur_udp, (~somme & 0xFFFF) or 0xFFFF)
+        return ENTETES + n
+
+    def construire(self, charge, ident: int = 0x1234, src_port: int = None, dst_port: int = None,
+                   somme_charge: int = None) -> memoryview:
+        """La trame, dans le tampon interne : valable jusqu'à l'appel suivant (bytes() pour la garder)."""
+        return self.vue[:self.ecrire(self.vue, charge, ident, src_port, dst_port, somme_charge)]
+
+
+def bench(nombre: int) -> None:
+    """Compare construire_* et FabriqueTrames sur `nombre` trames (ports qui varient)."""
+    src_mac, dst_mac, src_ip, dst_ip = "AA:BB:CC:DD:EE:11", "AA:BB:CC:DD:EE:22", "192.168.1.10", "192.168.1.1"
+    charges = [bytes(range(256))[:taille] for taille in (18, 64, 200, 256)]
+    fabrique = FabriqueTrames(src_mac, dst_mac, src_ip, dst_ip)
+
+    # Les deux chemins doivent produire exactement les mêmes octets
+    for k, charge in enumerate(charges):
+        attendu = construire_ethernet(src_mac, dst_mac,
+                                      construire_ip(src_ip, dst_ip, construire_udp(40000 + k, 80, charge, src_ip, dst_ip)))
+        if bytes(fabrique.construire(charge, src_port=40000 + k)) != attendu:
+            raise AssertionError(f"FabriqueTrames diffère de construire_* ({len(charge)} octets)")
+
+    print(f"{nombre:,} trames, charges de {', '.join(str(len(c)) for c in charges)} octets\n")
+    debut = time.perf_counter()
+    for i in range(nombre):
+        construire_ethernet(src_mac, dst_mac,
+                            construire_ip(src_ip, dst_ip, construire_udp(i & 0xFFFF, 80, charges[i & 3], src_ip, dst_ip)))
+    ancien = time.perf_counter() - debut
+
+    sommes = [internet.ones_sum(charge) for charge in charges]
+    vue = fabrique.vue
+    debut = time.perf_counter()
+    for i in range(nombre):
+        fabrique.ecrire(vue, charges[i & 3], 0x1234, i & 0xFFFF, 80, sommes[i & 3])
+    nouveau = time.perf_counter() - debut
+
+    for nom, duree in (("construire_*", ancien), ("FabriqueTrames", nouveau)):
+        print(f"  {nom:<15} {duree:>7.2f} s   {nombre / duree:>12,.0f} trames/s   {duree / nombre * 1e9:>7,.0f} ns/trame")
+    print(f"\n  x{ancien / nouveau:.1f}")
+
+
 # ── Affichage pédagogique ─────────────────────────────────────────────────────
 
 def afficher_couche(nom: str, données: bytes, couleur: str, descriptions: list) -> None:
@@ -163,9 +258,8 @@ def afficher_couche(nom: str, données: bytes, couleur: str, descriptions: list)
 
     # Hex sur 16 colonnes
     print(f"{couleur}Hexadécimal :{N}")
-    for i in range(0, len(données), 16):
-        bloc = données[i:i+16]
-        print(f"  {G}{i:04X}{N}  {couleur}{bytes_vers_hex(bloc):<47}{N}")
+    for i, hexa, _ in rows(données):
+        print(f"  {G}{i:04X}{N}  {couleur}{hexa:<47}{N}")
 
     # Binaire sur 4 colonnes (4 octets par ligne = 32 bits, comme les schémas RFC)
     print(f"\n{couleur}Binaire (chaque groupe = 1 octet = 8 bits) :{N}")
@@ -191,12 +285,9 @@ def hexdump_wireshark(trame: bytes) -> None:
     print(f"{G}         00 01 02 03 04 05 06 07  08 09 0A 0B 0C 0D 0E 0F   ASCII{N}")
     print(f"{G}{'─'*70}{N}")
 
-    for i in range(0, len(trame), 16):
-        bloc = trame[i:i+16]
-        hex_partie = ' '.join(f'{b:02X}' for b in bloc[:8])
-        hex_partie2 = ' '.join(f'{b:02X}' for b in bloc[8:])
-        ascii_partie = ''.join(chr(b) if 32 <= b < 127 else '.' for b in bloc)
-        print(f"  {G}{i:04X}{N}  {hex_partie:<23}  {hex_partie2:<23}   {ascii_partie}")
+    # rows() : hexadécimal et colonne ASCII calculés en un appel pour toute la trame
+    for i, hexa, ascii_partie in rows(trame):
+        print(f"  {G}{i:04X}{N}  {hexa[:23]:<23}  {hexa[24:]:<23}   {ascii_partie}")
 
 
 def flux_binaire_complet(trame: bytes) -> None:
@@ -234,6 +325,14 @@ def legende() -> None:
 # ── Programme principal ───────────────────────────────────────────────────────
 
 def main():
+    ap = argparse.ArgumentParser(description="Encapsulateur de message (Ethernet / IPv4 / UDP)")
+    ap.add_argument('--bench', type=int, metavar='N',
+                    help="comparer construire_* et FabriqueTrames sur N trames")
+    args = ap.parse_args()
+    if args.bench:
+        bench(args.bench)
+        return
+
     print(f"\n{B}=== ENCAPSULATEUR DE MESSAGE — Visualisation binaire ==={N}")
     print("Construit une vraie trame réseau et montre chaque octet.\n")
 
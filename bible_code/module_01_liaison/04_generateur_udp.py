@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+MODULE 1.4 — Générateur de trafic UDP
+=======================================
+Analogie : 03_encapsulateur.py fabrique UNE lettre et la montre au microscope.
+Ici, on installe une imprimerie : la même machine (FabriqueTrames) sort des
+centaines de milliers de lettres par seconde, et un métronome décide quand
+chacune part.
+
+Chaque trame est écrite directement dans une case de l'anneau d'émission
+PACKET_TX_RING (capture.open_transmitter), ou dans un tampon réutilisé puis
+envoyée par send() (--tx send). Aucun octet ne passe par la pile IP du noyau.
+
+Ce qui varie d'une trame à l'autre :
+  --size 18-1472      taille de la charge utile (suite pseudo-aléatoire, --seed)
+  --sport / --dport   ports source / destination, parcourus en boucle (ex: 5000-5099)
+
+Profils de débit (--profile), tenus par un métronome précis : chaque trame a
+son heure de départ ; le programme dort jusqu'à ~300 µs avant, puis attend
+activement la bonne microseconde.
+  constant  --rate 10000                          10 000 trames/s régulières
+  burst     --rate 10000 --burst 500              rafales de 500 collées, même moyenne
+  ramp      --rate-start 1000 --rate 50000        montée linéaire sur --duration
+
+Crash Test :
+  sudo python3 bible_code/module_01_liaison/04_generateur_udp.py --veth --rate 20000 --duration 5
+  -> crée une paire veth (udpg0 -> udpg1), envoie sur udpg0 et compte ce qui arrive
+     sur udpg1 : trames/s et bits/s visés, envoyés et reçus, retard du métronome.
+
+  sudo python3 bible_code/module_01_liaison/04_generateur_udp.py -i eth0 \\
+       --dst-mac AA:BB:CC:DD:EE:22 --dst-ip 192.168.1.20 --dport 9000-9009 --profile ramp
+  -> une vraie charge vers une machine du réseau (à ne faire que chez soi !)
+"""
+
+import argparse
+import importlib.util
+import math
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+
+RACINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+# capture.py, bpf_filter.py et checksum.py vivent à la racine du dépôt
+sys.path.insert(0, RACINE)
+import checksum as internet
+from bpf_filter import attach_filter, compile_filter
+from capture import RingCapture, open_socket, open_transmitter, tx_frame_size
+
+
+def charger_lecon(nom_fichier, nom):
+    """Les leçons (03_xxx.py) ne sont pas importables par leur nom : on les charge par chemin."""
+    spec = importlib.util.spec_from_file_location(
+        nom, os.path.join(os.path.dirname(os.path.abspath(__file__)), nom_fichier))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+encapsulateur = charger_lecon('03_encapsulateur.py', 'encapsulateur')
+arp_forge = charger_lecon('02_arp_forge.py', 'arp_forge')
+ENTETES = encapsulateur.ENTETES
+
+VETH_EMETTEUR, VETH_RECEPTEUR = 'udpg0', 'udpg1'
+# Sur le câble, chaque trame coûte aussi préambule (8), FCS (4) et silence inter-trames (12)
+SURCOUT_CABLE = 24
+# Trames écrites d'affilée avant un flush(), même en retard sur le métronome
+LOT_MAX = 64
+# En deçà, time.sleep() n'est plus assez précis : on attend activement
+ATTENTE_ACTIVE = 0.0003
+# Retards du métronome gardés pour les centiles (échantillon, quelle que soit la durée)
+ECHANTILLON_RETARDS = 100_000
+
+
+# ── Profils de débit ──────────────────────────────────────────────────────────
+# Chaque profil répond à une seule question : à quelle seconde (depuis le départ)
+# la trame numéro n doit-elle partir ?
+
+class Constant:
+    def __init__(self, debit):
+        self.debit = debit
+
+    def depart(self, n):
+        return n / self.debit
+
+
+class Rafales:
+    """`taille` trames collées, puis une pause : la moyenne reste `debit`."""
+
+    def __init__(self, debit, taille):
+        self.debit = debit
+        self.taille = taille
+
+    def depart(self, n):
+        return (n // self.taille) * self.taille / self.debit
+
+
+class Rampe:
+    """Débit qui passe linéairement de `debut` à `fin` trames/s en `duree` secondes."""
+
+    def __init__(self, debut, fin, duree):
+        self.debut = debut
+        self.pente = (fin - debut) / duree
+
+    def depart(self, n):
+        # n = debut·t + pente·t²/2  ->  t = (-debut + √(debut² + 2·pente·n)) / pente
+        if not self.pente:
+            return n / self.debut
+        return (-self.debut + math.sqrt(self.debut ** 2 + 2 * self.pente * n)) / self.pente
+
+
+def creer_profil(args):
+    if args.profile == 'burst':
+        return Rafales(args.rate, args.burst)
+    if args.profile == 'ramp':
+        return Rampe(args.rate_start, args.rate, args.duration)
+    return Constant(args.rate)
+
+
+# ── Génération ────────────────────────────────────────────────────────────────
+
+def plage(texte):
+    """'5000-5099' -> (5000, 5099) ; '80' -> (80, 80)"""
+    bas, _, haut = texte.partition('-')
+    return int(bas), int(haut or bas)
+
+
+def attendre(echeance):
+    """Dort jusqu'à ATTENTE_ACTIVE avant l'échéance (perf_counter), puis attend activement."""
+    reste = echeance - time.perf_counter()
+    if reste > ATTENTE_ACTIVE:
+        time.sleep(reste - ATTENTE_ACTIVE)
+    while time.perf_counter() < echeance:
+        pass
+
+
+class Retards:
+    """
+    Retards du métronome en mémoire bornée : un échantillon uniforme de `taille` valeurs
+    (algorithme R : la n-ième remplace une case au hasard avec probabilité taille/n),
+    plus le nombre et le maximum exacts.
+    """
+
+    def __init__(self, taille=ECHANTILLON_RETARDS, graine=0):
+        self.taille = taille
+        self.echantillon = []
+        self.nombre = 0
+        self.max = 0.0
+        self.rng = random.Random(graine)
+
+    def ajouter(self, retard):
+        self.nombre += 1
+        if retard > self.max:
+            self.max = retard
+        if len(self.echantillon) < self.taille:
+            self.echantillon.append(retard)
+        else:
+            case = self.rng.randrange(self.nombre)
+            if case < self.taille:
+                self.echantillon[case] = retard
+
+    def centile(self, p):
+        valeurs = sorted(self.echantillon)
+        if not valeurs:
+            return 0.0
+        return valeurs[min(len(valeurs) - 1, int(len(valeurs) * p))]
+
+
+def generer(emetteur, fabrique, profil, duree, tailles, sports, dports, rapport=1.0):
+    """
+    Boucle d'émission, arrêtée après `duree` secondes même si le débit demandé n'est pas
+    tenu. Rend (trames, octets, durée, retards) ; `retards` (Retards) = retard, en secondes,
+    de chaque heure de départ prévue (une rafale compte une fois, au départ de sa première trame).
+    """
+    motif = bytes(range(256)) * (max(tailles) // 256 + 1)
+    charges = {t: memoryview(motif)[:t] for t in set(tailles)}
+    sommes = {t: internet.ones_sum(charges[t]) for t in charges}
+    sequence = [(charges[t], t, sommes[t]) for t in tailles]
+    sport_bas, nb_sports = sports[0], sports[1] - sports[0] + 1
+    dport_bas, nb_dports = dports[0], dports[1] - dports[0] + 1
+
+    envoyees = octets = 0
+    retards = Retards()
+    dernier_prevu = None
+    depart = profil.depart
+    ecrire = fabrique.ecrire
+    t0 = time.perf_counter()
+    prochain_rapport, deja = rapport, 0
+    while True:
+        prevu = depart(envoyees)
+        if prevu >= duree:
+            break
+        attendre(t0 + prevu)
+        maintenant = time.perf_counter() - t0
+        if maintenant >= duree:
+            break   # débit demandé hors de portée : on s'arrête à l'heure quand même
+        if prevu != dernier_prevu:
+            retards.ajouter(maintenant - prevu)
+            dernier_prevu = prevu
+
+        # Toutes les trames déjà dues partent dans le même lot (un seul flush)
+        lot = 0
+        while lot < LOT_MAX and depart(envoyees) <= maintenant:
+            case = emetteur.slot()
+            if case is None:
+                break   # anneau plein : flush, puis on reprend
+            charge, taille, somme = sequence[envoyees % len(sequence)]
+            octets += ecrire(case, charge, envoyees & 0xFFFF,
+                             sport_bas + envoyees % nb_sports, dport_bas + envoyees % nb_dports, somme)
+            emetteur.commit(ENTETES + taille)
+            envoyees += 1
+            lot += 1
+        emetteur.flush()
+
+        if rapport and maintenant >= prochain_rapport:
+            print(f"  t={maintenant:5.1f} s  {(envoyees - deja) / rapport:>12,.0f} trames/s")
+            deja = envoyees
+            prochain_rapport += rapport
+    return envoyees, octets, time.perf_counter() - t0, retards
+
+
+def compter_recues(interface, duree, trames, octets, perdues, pret):
+    """Processus fils : compte les trames UDP qui arrivent sur `interface` (l'autre bout du veth)."""
+    sock = open_socket(interface)
+    attach_filter(sock, compile_filter(proto='udp'))
+    capture = RingCapture(sock=sock, block_size=1 << 20, block_nr=32, retire_ms=10, poll_ms=50)
+    pret.set()
+    capture.stats()
+    fin = time.monotonic() + duree
+    for bloc in capture.blocks():
+        for _, meta, _, longueur in bloc:
+            if meta[2] != 4:   # PACKET_OUTGOING : pas nos propres envois
+                trames.value += 1
+                octets.value += longueur
+        if time.monotonic() >= fin:
+            break
+    perdues.value = capture.stats()[1]
+    capture.close()
+
+
+def creer_veth():
+    ip_link = ['ip', 'link']
+    subprocess.run(ip_link + ['add', VETH_EMETTEUR, 'type', 'veth', 'peer', 'name', VETH_RECEPTEUR], check=True)
+    for nom in (VETH_EMETTEUR, VETH_RECEPTEUR):
+        subprocess.run(ip_link + ['set', nom, 'up'], check=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Générateur de trafic Ethernet/IPv4/UDP (AF_PACKET)")
+    ap.add_argument('-i', '--interface', help="interface d'émission")
+    ap.add_argument('--veth', action='store_true',
+                    help=f"créer une paire veth ({VETH_EMETTEUR} -> {VETH_RECEPTEUR}), y émettre et compter les réceptions")
+    ap.add_argument('--dst-mac', default='FF:FF:FF:FF:FF:FF', help="MAC destination (défaut : broadcast)")
+    ap.add_argument('--src-ip', help="IP source (défaut : celle de l'interface, sinon 10.0.0.1)")
+    ap.add_argument('--dst-ip', default='10.0.0.2', help="IP destination (défaut : 10.0.0.2)")
+    ap.add_argument('--sport', default='40000-40999', help="port(s) source, ex: 5000 ou 5000-5099")
+    ap.add_argument('--dport', default='9000', help="port(s) destination, ex: 9000 ou 9000-9009")
+    ap.add_argument('--size', default='18-1472', help="taille(s) de charge utile en octets, ex: 64 ou 18-1472")
+    ap.add_argument('--seed', type=int, default=1, help="graine de la suite de tailles")
+    ap.add_argument('--profile', choices=('constant', 'burst', 'ramp'), default='constant')
+    ap.add_argument('--rate', type=float, default=10000, help="trames/s (débit final pour ramp)")
+    ap.add_argument('--rate-start', type=float, default=100, help="ramp : débit de départ")
+    ap.add_argument('--burst', type=int, default=256, help="burst : trames par rafale")
+    ap.add_argument('--duration', type=float, default=5.0, help="secondes d'émission")
+    ap.add_argument('--tx', choices=('ring', 'send'), default='ring',
+                    help="PACKET_TX_RING (un send() par lot) ou un send() par trame")
+    ap.add_argument('--report', type=float, default=1.0, help="secondes entre deux lignes de débit (0 : aucune)")
+    args = ap.parse_args()
+
+    if os.geteuid() != 0:
+        print("Droits root requis : sudo python3 bible_code/module_01_liaison/04_generateur_udp.py")
+        sys.exit(1)
+    if not args.veth and not args.interface:
+        ap.error("choisir une interface (-i eth0) ou --veth")
+    if args.rate <= 0 or args.duration <= 0 or args.burst <= 0:
+        ap.error("--rate, --duration et --burst doivent être positifs")
+    if args.profile == 'ramp' and args.rate_start <= 0:
+        ap.error("--rate-start doit être positif")
+
+    tailles_min, tailles_max = plage(args.size)
+    sports, dports = plage(args.sport), plage(args.dport)
+    if not (0 <= tailles_min <= tailles_max) or not all(0 <= p <= 0xFFFF for p in sports + dports):
+        ap.error("tailles ou ports hors limites")
+    rng = random.Random(args.seed)
+    tailles = [rng.randint(tailles_min, tailles_max) for _ in range(4096)]
+
+    compteur = None
+    if args.veth:
+        try:
+            creer_veth()
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"Impossible de créer la paire veth ({e}) : iproute2 requis.")
+            sys.exit(1)
+        args.interface = VETH_EMETTEUR
+
+    try:
+        with open(f'/sys/class/net/{args.interface}/mtu') as f:
+            mtu = int(f.read())
+        if tailles_max + 28 > min(mtu, 0xFFFF):
+            ap.error(f"charge de {tailles_max} octets > {min(mtu, 0xFFFF)} - 28 (en-têtes IP + UDP)")
+
+        # Cases de l'anneau (ou tampon de send) taillées pour la plus grande trame
+        emetteur = open_transmitter(args.tx, args.interface, frame_size=tx_frame_size(ENTETES + tailles_max))
+        src_mac = arp_forge.get_mac_interface(emetteur.sock, args.interface)
+        try:
+            src_ip = args.src_ip or arp_forge.get_ip_interface(emetteur.sock, args.interface)
+        except OSError:
+            src_ip = '10.0.0.1'   # interface sans IPv4 (veth fraîche)
+        fabrique = encapsulateur.FabriqueTrames(src_mac.hex(':'), args.dst_mac, src_ip, args.dst_ip,
+                                                taille_max=ENTETES + tailles_max)
+        profil = creer_profil(args)
+
+        if args.veth:
+            recues = multiprocessing.Value('Q', 0)
+            octets_recus = multiprocessing.Value('Q', 0)
+            perdues = multiprocessing.Value('Q', 0)
+            pret = multiprocessing.Event()
+            compteur = multiprocessing.Process(target=compter_recues,
+                                               args=(VETH_RECEPTEUR, args.duration + 1.0, recues, octets_recus,
+                                                     perdues, pret), daemon=True)
+            compteur.start()
+            pret.wait(5)
+
+        print(f"\n{args.interface} : {src_ip}:{args.sport} -> {args.dst_ip}:{args.dport}, "
+              f"charge {args.size} o, profil {args.profile}, émission '{args.tx}'\n")
+        try:
+            envoyees, octets, duree, retards = generer(emetteur, fabrique, profil, args.duration,
+                                                       tailles, sports, dports, args.report)
+        finally:
+            emetteur.close()
+        if compteur is not None:
+            compteur.join()
+    finally:
+        # Sur erreur, le compteur n'a plus rien à compter : arrêté avant de supprimer son veth
+        if compteur is not None and compteur.is_alive():
+            compteur.terminate()
+            compteur.join()
+        if args.veth:
+            subprocess.run(['ip', 'link', 'del', VETH_EMETTEUR], check=False)
+
+    print(f"\n{'':<10} {'TRAMES':>12} {'TRAMES/S':>12} {'Mbit/s (L2)':>12} {'Mbit/s (câble)':>15}"
+          f" {'PERDUES':>10}")
+    print(f"{'envoyées':<10} {envoyees:>12,} {envoyees / duree:>12,.0f} {octets * 8 / duree / 1e6:>12,.1f} "
+          f"{(octets + SURCOUT_CABLE * envoyees) * 8 / duree / 1e6:>15,.1f}")
+    if compteur is not None:
+        print(f"{'reçues':<10} {recues.value:>12,} {recues.value / duree:>12,.0f} "
+              f"{octets_recus.value * 8 / duree / 1e6:>12,.1f} {'':>15} {perdues.value:>10,}")
+        if perdues.value:
+            print("(perdues : jetées par le noyau, l'anneau du compteur étant plein)")
+    print(f"\nDurée {duree:.3f} s | {retards.nombre:,} lots | retard du métronome : "
+          f"médian {retards.centile(0.5) * 1e6:.0f} µs, p99 {retards.centile(0.99) * 1e6:.0f} µs, "
+          f"max {retards.max * 1e6:.0f} µs")
+
+
+if __name__ == '__main__':
+    main()
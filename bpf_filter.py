@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ BPF FILTER : petit compilateur de filtres BPF classiques (cBPF) pour les sockets AF_PACKET
+------------------------------------------------------------------------------------------------
+ Sans filtre, le noyau copie CHAQUE trame vers le programme, qui la jette ensuite en Python
+ si elle ne l'intéresse pas. Un filtre BPF est un mini-programme exécuté par le noyau sur
+ chaque trame : s'il renvoie 0, la trame n'arrive jamais en espace utilisateur.
+
+ Une instruction BPF classique fait 8 octets (struct sock_filter) :
+   [2] code   [1] jt (saut si vrai)   [1] jf (saut si faux)   [4] k (constante)
+
+ Le programme compilé ici accepte :
+   - les trames IPv4 dont la source OU la destination vaut l'IP cible,
+     éventuellement restreintes à un protocole (tcp/udp/icmp) et à un port ;
+   - les trames ARP dont l'IP émettrice OU cible vaut l'IP cible (sans port/protocole).
+ Tout le reste est rejeté dans le noyau. Les trames VLAN (802.1Q) ne sont pas gérées.
+
+ Échantillonnage et snaplen, eux aussi appliqués dans le noyau :
+   - sample=N : la première instruction charge un nombre aléatoire de 32 bits
+     (extension SKF_AD_RANDOM) et rejette la trame s'il dépasse 2**32 / N :
+     en moyenne une trame sur N passe, quel que soit le débit du lien ;
+   - snaplen=S : "ret #S" ne copie que les S premiers octets de chaque trame acceptée.
+
+ exclude_port=P rejette le trafic TCP du port P : le visualiseur ne se capture pas
+ lui-même en train d'envoyer ses paquets au navigateur (web_stream.py).
+
+ Afficher le programme généré (comme `tcpdump -d`) :
+   python3 bpf_filter.py 192.168.1.1 --proto tcp --port 80
+   python3 bpf_filter.py --sample 100 --snaplen 128
+------------------------------------------------------------------------------------------------
+"""
+
+import argparse
+import ctypes
+import socket
+import struct
+
+SO_ATTACH_FILTER = 26
+SO_DETACH_FILTER = 27
+
+# Codes d'instructions (linux/filter.h)
+BPF_LD_W_ABS  = 0x20   # A <- mot de 32 bits à [k]
+BPF_LD_H_ABS  = 0x28   # A <- demi-mot de 16 bits à [k]
+BPF_LD_B_ABS  = 0x30   # A <- octet à [k]
+BPF_LD_H_IND  = 0x48   # A <- demi-mot à [X + k]
+BPF_LD_W_LEN  = 0x80   # A <- longueur de la trame
+BPF_LDX_B_MSH = 0xb1   # X <- 4 * ([k] & 0x0f)   (longueur de l'en-tête IP)
+BPF_JEQ_K     = 0x15   # si A == k
+BPF_JGE_K     = 0x35   # si A >= k
+BPF_JSET_K    = 0x45   # si A & k
+BPF_RET_K     = 0x06   # retourne k octets de la trame (0 = rejet)
+
+SOCK_FILTER = struct.Struct('=HBBI')
+
+# Extensions "ancillaires" : un chargement à l'offset SKF_AD_OFF + n lit une donnée du noyau
+SKF_AD_OFF    = -0x1000
+SKF_AD_RANDOM = 56
+RANDOM_K = (SKF_AD_OFF + SKF_AD_RANDOM) & 0xFFFFFFFF   # "ld rand"
+
+IP_PROTOCOLS = {'icmp': 1, 'tcp': 6, 'udp': 17}
+
+# Retourner "toute la trame" (valeur utilisée par tcpdump)
+SNAPLEN_MAX = 0x40000
+
+ACCEPT = 'accept'
+REJECT = 'reject'
+
+
+def ip_to_int(ip):
+    return struct.unpack('!I', socket.inet_aton(ip))[0]
+
+
+class Assembler:
+    """Assemble une liste d'instructions dont les sauts visent des étiquettes."""
+
+    def __init__(self):
+        self.instructions = []   # (code, jt, jf, k) ; jt/jf = étiquette ou None
+        self.labels = {}
+
+    def label(self, nom):
+        self.labels[nom] = len(self.instructions)
+
+    def emit(self, code, k=0, jt=None, jf=None):
+        self.instructions.append((code, jt, jf, k))
+
+    def assemble(self):
+        programme = []
+        for index, (code, jt, jf, k) in enumerate(self.instructions):
+            programme.append((code, self._saut(index, jt), self._saut(index, jf), k))
+        return programme
+
+    def _saut(self, index, cible):
+        if cible is None:
+            return 0
+        décalage = self.labels[cible] - index - 1
+        if not 0 <= décalage <= 255:
+            raise ValueError(f"Saut BPF hors de portée vers {cible!r} ({décalage})")
+        return décalage
+
+
+def sample_threshold(sample):
+    """Seuil du tirage aléatoire : une valeur de 32 bits sous ce seuil a 1 chance sur `sample`."""
+    return (1 << 32) // sample
+
+
+def _emit_sampling(asm, sample):
+    if sample > 1:
+        asm.emit(BPF_LD_W_ABS, RANDOM_K)
+        asm.emit(BPF_JGE_K, sample_threshold(sample), jt=REJECT, jf='sampled')
+        asm.label('sampled')
+
+
+def compile_sampler(sample=1, snaplen=SNAPLEN_MAX):
+    """Programme qui accepte tout type de trame, échantillonnée (1 sur `sample`) et tronquée."""
+    asm = Assembler()
+    _emit_sampling(asm, sample)
+    asm.emit(BPF_RET_K, snaplen)
+    asm.label(REJECT)
+    asm.emit(BPF_RET_K, 0)
+    return asm.assemble()
+
+
+def compile_arp(opcode, snaplen=42):
+    """
+    Programme qui n'accepte que les trames ARP Ethernet/IPv4 complètes (42 octets au moins)
+    d'un opcode donné (1 = Request, 2 = Reply).
+    """
+    asm = Assembler()
+    asm.emit(BPF_LD_W_LEN)
+    asm.emit(BPF_JGE_K, 42, jf=REJECT)
+    asm.emit(BPF_LD_H_ABS, 12)
+    asm.emit(BPF_JEQ_K, 0x0806, jf=REJECT)
+    # htype 1 (Ethernet), ptype 0x0800 (IPv4), hlen 6, plen 4
+    asm.emit(BPF_LD_W_ABS, 14)
+    asm.emit(BPF_JEQ_K, 0x00010800, jf=REJECT)
+    asm.emit(BPF_LD_H_ABS, 18)
+    asm.emit(BPF_JEQ_K, 0x0604, jf=REJECT)
+    asm.emit(BPF_LD_H_ABS, 20)
+    asm.emit(BPF_JEQ_K, opcode, jf=REJECT)
+    asm.emit(BPF_RET_K, snaplen)
+    asm.label(REJECT)
+    asm.emit(BPF_RET_K, 0)
+    return asm.assemble()
+
+
+def compile_filter(target_ip=None, proto=None, port=None, snaplen=SNAPLEN_MAX, sample=1,
+                   exclude_port=None):
+    """
+    Compile les options de filtrage en programme BPF : liste de (code, jt, jf, k).
+    `proto` vaut 'tcp', 'udp', 'icmp' ou un numéro de protocole IP.
+    `sample` > 1 ne laisse passer qu'une trame sur `sample` en moyenne (tirage aléatoire).
+    `exclude_port` rejette les segments TCP dont le port source ou destination vaut ce port.
+    """
+    if isinstance(proto, str):
+        proto = IP_PROTOCOLS[proto.lower()]
+    if port is not None and proto not in (None, 6, 17):
+        raise ValueError("Un filtre de port n'a de sens qu'avec TCP ou UDP")
+
+    asm = Assembler()
+
+    # --- Échantillonnage : tiré avant tout décodage, c'est le rejet le moins cher ---
+    _emit_sampling(asm, sample)
+
+    # --- Ethernet : IPv4 ou ARP ---
+    asm.emit(BPF_LD_H_ABS, 12)
+    asm.emit(BPF_JEQ_K, 0x0800, jt='ipv4', jf='arp')
+
+    # --- IPv4 : adresses (offsets 14+12 et 14+16) ---
+    asm.label('ipv4')
+    if target_ip is not None:
+        ip = ip_to_int(target_ip)
+        asm.emit(BPF_LD_W_ABS, 26)
+        asm.emit(BPF_JEQ_K, ip, jt='ipv4_ok', jf='ipv4_dst')
+        asm.label('ipv4_dst')
+        asm.emit(BPF_LD_W_ABS, 30)
+        asm.emit(BPF_JEQ_K, ip, jt='ipv4_ok', jf=REJECT)
+    asm.label('ipv4_ok')
+
+    # --- Protocole IP (offset 14+9) ---
+    if proto is not None:
+        asm.emit(BPF_LD_B_ABS, 23)
+        asm.emit(BPF_JEQ_K, proto, jt='proto_ok', jf=REJECT)
+    elif port is not None:
+        asm.emit(BPF_LD_B_ABS, 23)
+        asm.emit(BPF_JEQ_K, 6, jt='proto_ok', jf='udp')
+        asm.label('udp')
+        asm.emit(BPF_JEQ_K, 17, jt='proto_ok', jf=REJECT)
+    asm.label('proto_ok')
+
+    # --- Port TCP exclu (le propre serveur web du visualiseur) ---
+    if exclude_port is not None:
+        asm.emit(BPF_LD_B_ABS, 23)
+        asm.emit(BPF_JEQ_K, 6, jt='exclu_tcp', jf='exclu_fin')
+        asm.label('exclu_tcp')
+        asm.emit(BPF_LD_H_ABS, 20)
+        asm.emit(BPF_JSET_K, 0x1FFF, jt='exclu_fin', jf='exclu_ports')
+        asm.label('exclu_ports')
+        asm.emit(BPF_LDX_B_MSH, 14)
+        asm.emit(BPF_LD_H_IND, 14)
+        asm.emit(BPF_JEQ_K, exclude_port, jt=REJECT, jf='exclu_dst')
+        asm.label('exclu_dst')
+        asm.emit(BPF_LD_H_IND, 16)
+        asm.emit(BPF_JEQ_K, exclude_port, jt=REJECT, jf='exclu_fin')
+        asm.label('exclu_fin')
+
+    # --- Ports TCP/UDP : seulement sur le premier fragment, après un en-tête IP variable ---
+    if port is not None:
+        asm.emit(BPF_LD_H_ABS, 20)
+        asm.emit(BPF_JSET_K, 0x1FFF, jt=REJECT, jf='non_fragment')
+        asm.label('non_fragment')
+        asm.emit(BPF_LDX_B_MSH, 14)
+        asm.emit(BPF_LD_H_IND, 14)
+        asm.emit(BPF_JEQ_K, port, jt=ACCEPT, jf='port_dst')
+        asm.label('port_dst')
+        asm.emit(BPF_LD_H_IND, 16)
+        asm.emit(BPF_JEQ_K, port, jt=ACCEPT, jf=REJECT)
+    else:
+        asm.emit(BPF_RET_K, snaplen)
+
+    # --- ARP : IP émettrice (14+14) ou IP cible (14+24) ---
+    asm.label('arp')
+    if proto is not None or port is not None:
+        asm.emit(BPF_RET_K, 0)
+    else:
+        asm.emit(BPF_JEQ_K, 0x0806, jt='arp_ok', jf=REJECT)
+        asm.label('arp_ok')
+        if target_ip is not None:
+            asm.emit(BPF_LD_W_ABS, 28)
+            asm.emit(BPF_JEQ_K, ip, jt=ACCEPT, jf='arp_dst')
+            asm.label('arp_dst')
+            asm.emit(BPF_LD_W_ABS, 38)
+            asm.emit(BPF_JEQ_K, ip, jt=ACCEPT, jf=REJECT)
+
+    asm.label(ACCEPT)
+    asm.emit(BPF_RET_K, snaplen)
+    asm.label(REJECT)
+    asm.emit(BPF_RET_K, 0)
+    return asm.assemble()
+
+
+def attach_filter(sock, programme, drain=True):
+    """
+    Attache le programme au socket avec SO_ATTACH_FILTER (struct sock_fprog).
+    Les trames arrivées avant l'attachement sont vidées pour ne garder que du trafic filtré.
+    """
+    octets = b''.join(SOCK_FILTER.pack(*ins) for ins in programme)
+    tampon = ctypes.create_string_buffer(octets, len(octets))
+    # struct sock_fprog { unsigned short len; struct sock_filter *filter; }
+    fprog = struct.pack('HL', len(programme), ctypes.addressof(tampon))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+    if drain:
+        sock.setblocking(False)
+        try:
+            while True:
+                sock.recv(65535)
+        except BlockingIOError:
+            pass
+        finally:
+            sock.setblocking(True)
+
+
+def detach_filter(sock):
+    sock.setsockopt(socket.SOL_SOCKET, SO_DETACH_FILTER, 0)
+
+
+def dump(programme):
+    """Affiche le programme au format de `tcpdump -d`."""
+    noms = {
+        BPF_LD_W_ABS: 'ld', BPF_LD_H_ABS: 'ldh', BPF_LD_B_ABS: 'ldb', BPF_LD_H_IND: 'ldh',
+        BPF_LD_W_LEN: 'ld', BPF_LDX_B_MSH: 'ldxb', BPF_JEQ_K: 'jeq', BPF_JGE_K: 'jge',
+        BPF_JSET_K: 'jset', BPF_RET_K: 'ret',
+    }
+    for i, (code, jt, jf, k) in enumerate(programme):
+        op = noms.get(code, f'0x{code:02x}')
+        if code == BPF_LD_W_ABS and k == RANDOM_K:
+            arg = 'rand'
+        elif code in (BPF_JEQ_K, BPF_JGE_K, BPF_JSET_K):
+            arg = f"{f'#0x{k:x}':<18}jt {i + 1 + jt:<4} jf {i + 1 + jf}"
+        elif code == BPF_LD_H_IND:
+            arg = f"[x + {k}]"
+        elif code == BPF_LDX_B_MSH:
+            arg = f"4*([{k}]&0xf)"
+        elif code == BPF_LD_W_LEN:
+            arg = '#pktlen'
+        elif code == BPF_RET_K:
+            arg = f"#{k}"
+        else:
+            arg = f"[{k}]"
+        print(f"({i:03d}) {op:<8}{arg}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compile un filtre BPF classique et l'affiche.")
+    ap.add_argument('target_ip', nargs='?', default=None)
+    ap.add_argument('--proto', choices=sorted(IP_PROTOCOLS))
+    ap.add_argument('--port', type=int)
+    ap.add_argument('--sample', type=int, default=1, help="ne garder qu'une trame sur N en moyenne")
+    ap.add_argument('--snaplen', type=int, default=SNAPLEN_MAX, help="octets copiés par trame")
+    ap.add_argument('--exclude-port', type=int, help="rejeter le trafic TCP de ce port")
+    args = ap.parse_args()
+    dump(compile_filter(args.target_ip, args.proto, args.port, args.snaplen, args.sample,
+                        args.exclude_port))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,589 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ CAPTURE STORE : capture sur disque, en ajout seul, avec index par temps, par IP et par port
+------------------------------------------------------------------------------------------------
+ Dans un simple fichier pcap, "tous les paquets de 10.0.0.5 entre 14:02 et 14:05" veut dire
+ relire tout le fichier. Le store range les trames dans un pcap ordinaire (Wireshark l'ouvre
+ tel quel) et tient à côté des index construits PENDANT la capture :
+
+   packets.pcap    les trames, au format pcap nanosecondes
+   records.idx     une entrée de 24 octets par trame : horodatage, position dans le pcap,
+                   longueurs — la trame n est à l'offset n * 24, sans recherche
+   blocks.idx      une entrée par seconde de capture : (premier horodatage, première trame)
+   segments.idx    une entrée par segment (~65 536 trames ou 5 s) : trames couvertes et
+                   position de ses clés dans ip.keys / port.keys
+   ip.keys         par segment, les IP vues (triées) -> (nombre, position dans postings.dat)
+   port.keys       idem pour les ports TCP/UDP
+   postings.dat    les listes de numéros de trames (uint32, croissants) de chaque clé
+
+ Tout est écrit en ajout seul ; un segment n'est référencé dans segments.idx qu'une fois
+ ses clés et listes écrites : un store interrompu brutalement reste lisible.
+
+ Une requête lit ces fichiers par mmap :
+   - l'intervalle de temps devient un intervalle de numéros de trames (recherche
+     dichotomique dans blocks.idx puis records.idx) ;
+   - pour chaque segment qui le recoupe, une dichotomie dans ses clés donne la liste
+     de l'IP ou du port, déjà triée : on n'en garde que la tranche utile.
+ Le coût dépend du nombre de segments et de réponses, pas de la taille de la capture.
+ Les trames pas encore indexées (segment en cours d'un store vivant) sont parcourues.
+
+   store = CaptureStore('capture.store')           # côté capture (thread d'écriture)
+   store.write(trame, ts_ns)
+
+   python3 capture_store.py capture.store --ip 10.0.0.5 --from 14:02 --to 14:05
+   python3 capture_store.py capture.store --port 53 --export dns.pcap
+   python3 capture_store.py capture.store --import ancienne.pcapng
+------------------------------------------------------------------------------------------------
+"""
+
+import argparse
+import mmap
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import defaultdict, deque
+
+from pcap_io import PCAP_GLOBAL_HEADER, PCAP_RECORD_HEADER, PcapFormat, PcapReader, SNAPLEN_MAX
+
+RECORD = struct.Struct('<qQII')      # horodatage indexé, offset des données, capturé, réel
+BLOCK = struct.Struct('<qQ')         # premier horodatage du bloc, première trame
+SEGMENT = struct.Struct('<QQQIQI')   # première trame, fin (exclue), clés IP (début, nombre), clés port
+KEY = struct.Struct('<IIQ')          # clé, nombre de trames, début dans postings.dat
+POSTING_SIZE = 4
+
+BLOCK_NS = 1_000_000_000
+SEGMENT_PACKETS = 65536
+SEGMENT_SECONDS = 5.0
+
+ETH_TYPE = struct.Struct('!12xH')
+IPV4_ADDRESSES = struct.Struct('!14xB5xHxB2x4s4s')   # vhl, frag, proto, src, dst
+PORTS = struct.Struct('!HH')
+ARP_ADDRESSES = struct.Struct('!28x4s6x4s')          # IP émettrice, IP cible
+
+FILES = ('packets.pcap', 'records.idx', 'blocks.idx', 'segments.idx', 'ip.keys', 'port.keys',
+         'postings.dat')
+# Lecteur : chaque fichier est projeté AVANT ceux qu'il référence (l'inverse de l'ordre
+# d'écriture). Un store vivant ne peut alors montrer un index qui pointe au-delà des données.
+READ_ORDER = ('segments.idx', 'ip.keys', 'port.keys', 'postings.dat', 'blocks.idx',
+              'records.idx', 'packets.pcap')
+
+
+def frame_keys(frame):
+    """(IP vues, ports vus) d'une trame Ethernet : adresses IPv4 ou ARP, ports TCP/UDP."""
+    try:
+        ethertype, = ETH_TYPE.unpack_from(frame)
+        if ethertype == 0x0800:
+            vhl, frag, proto, src, dst = IPV4_ADDRESSES.unpack_from(frame)
+            ips = (src, dst) if src != dst else (src,)
+            if proto in (6, 17) and not frag & 0x1FFF:
+                sport, dport = PORTS.unpack_from(frame, 14 + (vhl & 0x0F) * 4)
+                return ips, (sport, dport) if sport != dport else (sport,)
+            return ips, ()
+        if ethertype == 0x0806:
+            src, dst = ARP_ADDRESSES.unpack_from(frame)
+            return ((src, dst) if src != dst else (src,)), ()
+    except struct.error:
+        pass   # trame tronquée : indexée par le temps seulement
+    return (), ()
+
+
+def ip_key(ip):
+    """'10.0.0.5' ou b'\\x0a\\x00\\x00\\x05' -> clé entière de l'index IP."""
+    if isinstance(ip, str):
+        ip = socket.inet_aton(ip)
+    return int.from_bytes(ip, 'big')
+
+
+class CaptureStore:
+    """
+    Écrivain du store, sur thread dédié (mêmes règles que PcapWriter : write() ne touche
+    jamais le disque, et perd plutôt que de bloquer si le disque ne suit pas).
+    Rouvrir un store existant reprend l'ajout à la suite.
+    """
+
+    def __init__(self, path, snaplen=SNAPLEN_MAX, segment_packets=SEGMENT_PACKETS,
+                 segment_seconds=SEGMENT_SECONDS, max_pending=100_000):
+        self.path = path
+        self.snaplen = snaplen
+        self.segment_packets = segment_packets
+        self.segment_seconds = segment_seconds
+        self.max_pending = max_pending
+        self.files = [path]
+
+        self.pending = deque()
+        self.written = 0
+        self.dropped = 0
+
+        os.makedirs(path, exist_ok=True)
+        self._open_files()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='capture-store', daemon=True)
+        self._thread.start()
+
+    # --- Côté capture ---
+
+    def write(self, frame, ts_ns, interface='', orig_len=None):
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        if orig_len is None:
+            orig_len = len(frame)
+        self.pending.append((bytes(frame[:self.snaplen]), orig_len, ts_ns))
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+    # --- Côté thread d'écriture ---
+
+    def _open_files(self):
+        chemin = lambda nom: os.path.join(self.path, nom)
+        entete = PcapFormat(self.snaplen).file_header()
+        nouveau = (not os.path.exists(chemin('packets.pcap'))
+                   or os.path.getsize(chemin('packets.pcap')) < len(entete))
+        if nouveau:
+            for nom in FILES:
+                if os.path.exists(chemin(nom)):
+                    os.truncate(chemin(nom), 0)
+        else:
+            self._recover()
+        self._files = {nom: open(chemin(nom), 'ab') for nom in FILES}
+        self._pcap = self._files['packets.pcap']
+        if nouveau:
+            self._pcap.write(entete)
+        self._offset = self._pcap.tell()
+
+        # Reprise : compteurs relus dans les tailles de fichiers et le dernier enregistrement
+        self.packets = os.path.getsize(chemin('records.idx')) // RECORD.size
+        self._ip_entries = os.path.getsize(chemin('ip.keys')) // KEY.size
+        self._port_entries = os.path.getsize(chemin('port.keys')) // KEY.size
+        self._postings = os.path.getsize(chemin('postings.dat')) // POSTING_SIZE
+        self._last_ts = 0
+        self._block = None
+        self._segment_start = self.packets
+        self._ips = defaultdict(list)
+        self._ports = defaultdict(list)
+        if self.packets:
+            with CaptureStoreReader(self.path) as lecteur:
+                self._last_ts = lecteur.record(self.packets - 1)[0]
+                self._block = self._last_ts // BLOCK_NS
+                # Trames écrites mais jamais indexées (arrêt brutal) : elles rejoignent ce segment
+                self._segment_start = lecteur.indexed
+                for n in range(lecteur.indexed, self.packets):
+                    self._add_keys(n, lecteur.frame(n))
+        self._segment_opened = time.monotonic()
+
+    def _recover(self):
+        """
+        Arrêt brutal : chaque fichier est ramené à ce que le suivant dans l'ordre d'écriture
+        référence : les fichiers sont rouverts en ajout, un reste non aligné décalerait tout
+        ce qui suit.
+        Les trames d'un segment jamais inscrit dans segments.idx seront réindexées.
+        """
+        chemin = lambda nom: os.path.join(self.path, nom)
+        for nom in FILES:
+            open(chemin(nom), 'ab').close()
+        tailles = {nom: os.path.getsize(chemin(nom)) for nom in FILES}
+        maps = {nom: _map(chemin(nom)) for nom in ('records.idx', 'blocks.idx', 'segments.idx',
+                                                   'ip.keys', 'port.keys')}
+        try:
+            # records.idx : entrées entières, dont la trame est entièrement dans le pcap
+            records = maps['records.idx']
+            n = tailles['records.idx'] // RECORD.size
+            while n and sum(RECORD.unpack_from(records, (n - 1) * RECORD.size)[1:3]) > tailles['packets.pcap']:
+                n -= 1
+            fin_pcap = PCAP_GLOBAL_HEADER.size
+            if n:
+                fin_pcap = sum(RECORD.unpack_from(records, (n - 1) * RECORD.size)[1:3])
+
+            # blocks.idx et segments.idx : entrées entières, qui ne dépassent pas la trame n
+            b = tailles['blocks.idx'] // BLOCK.size
+            while b and BLOCK.unpack_from(maps['blocks.idx'], (b - 1) * BLOCK.size)[1] >= n:
+                b -= 1
+            segments = maps['segments.idx']
+            g = tailles['segments.idx'] // SEGMENT.size
+            while g and SEGMENT.unpack_from(segments, (g - 1) * SEGMENT.size)[1] > n:
+                g -= 1
+
+            # Clés et listes : jusqu'à la fin de celles du dernier segment référencé
+            fin_ip = fin_port = fin_postings = 0
+            if g:
+                _, _, ip_debut, ip_nombre, port_debut, port_nombre = SEGMENT.unpack_from(
+                    segments, (g - 1) * SEGMENT.size)
+                fin_ip, fin_port = ip_debut + ip_nombre, port_debut + port_nombre
+                for nom, fin in (('ip.keys', fin_ip), ('port.keys', fin_port)):
+                    if fin:
+                        _, nombre, debut = KEY.unpack_from(maps[nom], (fin - 1) * KEY.size)
+                        fin_postings = max(fin_postings, debut + nombre)
+        finally:
+            for m in maps.values():
+                if isinstance(m, mmap.mmap):
+                    m.close()
+
+        coupes = {'packets.pcap': fin_pcap, 'records.idx': n * RECORD.size,
+                  'blocks.idx': b * BLOCK.size, 'segments.idx': g * SEGMENT.size,
+                  'ip.keys': fin_ip * KEY.size, 'port.keys': fin_port * KEY.size,
+                  'postings.dat': fin_postings * POSTING_SIZE}
+        for nom, taille in coupes.items():
+            if tailles[nom] > taille:
+                os.truncate(chemin(nom), taille)
+
+    def _add_keys(self, n, frame):
+        ips, ports = frame_keys(frame)
+        for ip in ips:
+            self._ips[ip].append(n)
+        for port in ports:
+            self._ports[port].append(n)
+
+    def _append(self, data, orig_len, ts_ns):
+        """Entrées pcap et records.idx d'une trame ; index temps et listes mis à jour."""
+        n = self.packets
+        # L'index exige des horodatages croissants : une horloge qui recule est rattrapée
+        ts_index = ts_ns if ts_ns > self._last_ts else self._last_ts
+        self._last_ts = ts_index
+        bloc = ts_index // BLOCK_NS
+        if bloc != self._block:
+            self._block = bloc
+            self._files['blocks.idx'].write(BLOCK.pack(ts_index, n))
+        sec, nsec = divmod(ts_ns, 1_000_000_000)
+        entete = PCAP_RECORD_HEADER.pack(sec, nsec, len(data), orig_len)
+        self._offset += len(entete)
+        record = RECORD.pack(ts_index, self._offset, len(data), orig_len)
+        self._offset += len(data)
+        self._add_keys(n, data)
+        self.packets += 1
+        return entete, record
+
+    def _flush_segment(self):
+        """Écrit les clés et listes du segment, puis (en dernier) son entrée dans segments.idx."""
+        if self.packets == self._segment_start:
+            return
+        debuts = []
+        for table, nom, attribut in ((self._ips, 'ip.keys', '_ip_entries'),
+                                     (self._ports, 'port.keys', '_port_entries')):
+            cles, listes = [], []
+            for cle in sorted(table):
+                numeros = table[cle]
+                cle_int = int.from_bytes(cle, 'big') if isinstance(cle, bytes) else cle
+                cles.append(KEY.pack(cle_int, len(numeros), self._postings))
+                listes.append(array('I', numeros))
+                self._postings += len(numeros)
+            postings = self._files['postings.dat']
+            for liste in listes:
+                if sys.byteorder != 'little':
+                    liste.byteswap()
+                liste.tofile(postings)
+            self._files[nom].write(b''.join(cles))
+            debuts.append((getattr(self, attribut), len(cles)))
+            setattr(self, attribut, getattr(self, attribut) + len(cles))
+        for nom in ('postings.dat', 'ip.keys', 'port.keys'):
+            self._files[nom].flush()
+        (ip_debut, ip_nombre), (port_debut, port_nombre) = debuts
+        self._files['segments.idx'].write(SEGMENT.pack(self._segment_start, self.packets,
+                                                       ip_debut, ip_nombre, port_debut, port_nombre))
+        self._files['segments.idx'].flush()
+        self._segment_start = self.packets
+        self._ips = defaultdict(list)
+        self._ports = defaultdict(list)
+        self._segment_opened = time.monotonic()
+
+    def _segment_due(self):
+        return (self.packets - self._segment_start >= self.segment_packets
+                or time.monotonic() - self._segment_opened >= self.segment_seconds)
+
+    def _run(self):
+        pending = self.pending
+        try:
+            while True:
+                if not pending:
+                    if self._stop.is_set():
+                        break
+                    self._stop.wait(0.01)
+                    if self._segment_due():
+                        self._flush_segment()
+                    continue
+                morceaux, records = [], []
+                for _ in range(len(pending)):
+                    data, orig_len, ts_ns = pending.popleft()
+                    entete, record = self._append(data, orig_len, ts_ns)
+                    morceaux.append(entete)
+                    morceaux.append(data)
+                    records.append(record)
+                    if self.packets - self._segment_start >= self.segment_packets:
+                        self._write(morceaux, records)
+                        morceaux, records = [], []
+                        self._flush_segment()
+                self._write(morceaux, records)
+                if self._segment_due():
+                    self._flush_segment()
+        finally:
+            self._flush_segment()
+            for f in self._files.values():
+                f.close()
+
+    def _write(self, morceaux, records):
+        # Les trames avant leurs enregistrements : un lecteur ne voit jamais d'offset dans le vide
+        self._pcap.write(b''.join(morceaux))
+        self._pcap.flush()
+        self._files['records.idx'].write(b''.join(records))
+        self._files['records.idx'].flush()
+        self._files['blocks.idx'].flush()
+        self.written += len(records)
+
+
+def _map(path):
+    """Projection en lecture seule d'un fichier ; b'' s'il est vide (mmap refuse la taille 0)."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class CaptureStoreReader:
+    """
+    Lecture et requêtes par mmap. Les index sont relus à l'ouverture : rouvrir le lecteur
+    pour voir ce qu'un store vivant a ajouté depuis.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.maps = {nom: _map(os.path.join(path, nom)) for nom in READ_ORDER}
+        self.count = len(self.maps['records.idx']) // RECORD.size
+        # Garde-fou (store copié à chaud, pcap tronqué) : pas de trame hors de packets.pcap
+        pcap = len(self.maps['packets.pcap'])
+        while self.count and sum(self.record(self.count - 1)[1:3]) > pcap:
+            self.count -= 1
+        self.blocks = len(self.maps['blocks.idx']) // BLOCK.size
+        self.segments = [SEGMENT.unpack_from(self.maps['segments.idx'], i * SEGMENT.size)
+                         for i in range(len(self.maps['segments.idx']) // SEGMENT.size)]
+        self.indexed = min(self.segments[-1][1], self.count) if self.segments else 0
+        self._postings = memoryview(self.maps['postings.dat'])
+        if sys.byteorder == 'little' and len(self._postings):
+            self._postings = self._postings.cast('I')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._postings.release()
+        for m in self.maps.values():
+            if isinstance(m, mmap.mmap):
+                try:
+                    m.close()
+                except BufferError:
+                    pass  # une trame est encore tenue par l'appelant ; le GC s'en chargera
+
+    # --- Accès direct ---
+
+    def record(self, n):
+        """(horodatage indexé, offset, longueur capturée, longueur réelle) de la trame n."""
+        return RECORD.unpack_from(self.maps['records.idx'], n * RECORD.size)
+
+    def frame(self, n):
+        _, offset, caplen, _ = self.record(n)
+        return memoryview(self.maps['packets.pcap'])[offset:offset + caplen]
+
+    def timestamp(self, n):
+        """Horodatage réel (celui du pcap, qui peut reculer ; l'index, lui, ne recule pas)."""
+        offset = self.record(n)[1]
+        sec, nsec, _, _ = PCAP_RECORD_HEADER.unpack_from(self.maps['packets.pcap'],
+                                                        offset - PCAP_RECORD_HEADER.size)
+        return sec * 1_000_000_000 + nsec
+
+    # --- Temps -> numéros de trames ---
+
+    def _bisect(self, lo, hi, ts, right):
+        """Premier n de [lo, hi) dont l'horodatage est >= ts (> ts si right)."""
+        records = self.maps['records.idx']
+        while lo < hi:
+            mid = (lo + hi) // 2
+            valeur = RECORD.unpack_from(records, mid * RECORD.size)[0]
+            if valeur < ts or (right and valeur == ts):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _block_bounds(self, ts):
+        """Trames [début, fin) du bloc d'une seconde qui contient ts (dichotomie sur blocks.idx)."""
+        blocks = self.maps['blocks.idx']
+        lo, hi = 0, self.blocks
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if BLOCK.unpack_from(blocks, mid * BLOCK.size)[0] <= ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        debut = BLOCK.unpack_from(blocks, (lo - 1) * BLOCK.size)[1] if lo else 0
+        fin = BLOCK.unpack_from(blocks, lo * BLOCK.size)[1] if lo < self.blocks else self.count
+        return min(debut, self.count), min(fin, self.count)
+
+    def time_range(self, start_ns=None, end_ns=None):
+        """Numéros [premier, fin) des trames horodatées dans [start_ns, end_ns]."""
+        premier, fin = 0, self.count
+        if start_ns is not None:
+            premier = self._bisect(*self._block_bounds(start_ns), start_ns, right=False)
+        if end_ns is not None:
+            fin = self._bisect(*self._block_bounds(end_ns), end_ns, right=True)
+        return premier, max(premier, fin)
+
+    # --- Listes par clé ---
+
+    def postings(self, kind, key, first=0, end=None):
+        """Numéros croissants des trames de [first, end) où apparaît la clé (IP ou port)."""
+        end = self.count if end is None else end
+        keys = self.maps['ip.keys' if kind == 'ip' else 'port.keys']
+        resultat = []
+        for seg_debut, seg_fin, ip_debut, ip_nombre, port_debut, port_nombre in self.segments:
+            if seg_fin <= first or seg_debut >= end:
+                continue
+            lo, hi = (ip_debut, ip_debut + ip_nombre) if kind == 'ip' else (port_debut, port_debut + port_nombre)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if KEY.unpack_from(keys, mid * KEY.size)[0] < key:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo == (ip_debut + ip_nombre if kind == 'ip' else port_debut + port_nombre):
+                continue
+            cle, nombre, debut = KEY.unpack_from(keys, lo * KEY.size)
+            if cle != key:
+                continue
+            liste = self._posting_list(debut, nombre)
+            if seg_debut < first or seg_fin > end:
+                liste = [n for n in liste if first <= n < end]
+            resultat.extend(liste)
+        # Trames écrites mais pas encore indexées : parcourues une à une
+        for n in range(max(first, self.indexed), end):
+            ips, ports = frame_keys(self.frame(n))
+            if kind == 'ip' and any(int.from_bytes(ip, 'big') == key for ip in ips):
+                resultat.append(n)
+            elif kind == 'port' and key in ports:
+                resultat.append(n)
+        return resultat
+
+    def _posting_list(self, debut, nombre):
+        if sys.byteorder == 'little':
+            return self._postings[debut:debut + nombre].tolist()
+        liste = array('I', self._postings[debut * POSTING_SIZE:(debut + nombre) * POSTING_SIZE])
+        liste.byteswap()
+        return liste.tolist()
+
+    # --- Requête ---
+
+    def query(self, ip=None, port=None, start_ns=None, end_ns=None):
+        """Numéros des trames qui satisfont TOUS les critères donnés, dans l'ordre."""
+        premier, fin = self.time_range(start_ns, end_ns)
+        resultat = None
+        if ip is not None:
+            resultat = self.postings('ip', ip_key(ip), premier, fin)
+        if port is not None:
+            par_port = self.postings('port', port, premier, fin)
+            resultat = par_port if resultat is None else sorted(set(resultat).intersection(par_port))
+        return list(range(premier, fin)) if resultat is None else resultat
+
+    def export(self, numbers, path):
+        """Écrit les trames demandées dans un pcap nanosecondes."""
+        with open(path, 'wb') as f:
+            f.write(PcapFormat(SNAPLEN_MAX).file_header())
+            for n in numbers:
+                _, offset, caplen, _ = self.record(n)
+                debut = offset - PCAP_RECORD_HEADER.size
+                f.write(self.maps['packets.pcap'][debut:offset + caplen])
+
+
+# --- Ligne de commande ------------------------------------------------------------------------
+
+def parse_time(texte, reference_ns):
+    """
+    'HH:MM[:SS]' (le jour de la première trame), 'AAAA-MM-JJ HH:MM[:SS]' ou un epoch en
+    secondes -> nanosecondes.
+    """
+    try:
+        return int(float(texte) * 1e9)
+    except ValueError:
+        pass
+    if len(texte) <= 8:
+        jour = time.strftime('%Y-%m-%d', time.localtime(reference_ns / 1e9))
+        texte = f"{jour} {texte}"
+    for format_ in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M'):
+        try:
+            return int(time.mktime(time.strptime(texte, format_)) * 1e9)
+        except ValueError:
+            continue
+    raise ValueError(f"heure illisible : {texte!r}")
+
+
+def describe(frame, ts_ns):
+    heure = time.strftime('%H:%M:%S', time.localtime(ts_ns / 1e9)) + f".{ts_ns % 1_000_000_000 // 1000:06d}"
+    ips, ports = frame_keys(frame)
+    adresses = ' → '.join(socket.inet_ntoa(ip) for ip in ips) if ips else '-'
+    ports = f"  ports {'/'.join(map(str, ports))}" if ports else ''
+    return f"{heure}  {len(frame):5d} oct  {adresses}{ports}"
+
+
+def import_capture(source, path):
+    store = CaptureStore(path)
+    with PcapReader(source) as lecteur:
+        for trame, ts_ns, interface in lecteur.records():
+            while len(store.pending) >= store.max_pending:
+                time.sleep(0.001)   # import : on attend le disque au lieu de perdre des trames
+            store.write(trame, ts_ns, interface)
+    store.close()
+    return store.written
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Requêtes sur un store de capture indexé.")
+    ap.add_argument('store', help="répertoire du store")
+    ap.add_argument('--ip', help="trames dont l'IP source ou destination (IPv4 ou ARP) vaut celle-ci")
+    ap.add_argument('--port', type=int, help="trames TCP/UDP dont un des ports vaut celui-ci")
+    ap.add_argument('--from', dest='debut', metavar='HEURE', help="début : HH:MM[:SS], date complète ou epoch")
+    ap.add_argument('--to', dest='fin', metavar='HEURE', help="fin (incluse)")
+    ap.add_argument('--show', type=int, default=20, metavar='N', help="trames affichées (défaut : 20)")
+    ap.add_argument('--export', metavar='FICHIER', help="écrire les trames trouvées dans un pcap")
+    ap.add_argument('--import', dest='source', metavar='FICHIER',
+                    help="ajouter au store les trames d'un pcap/pcapng existant")
+    args = ap.parse_args()
+
+    if args.source:
+        debut = time.perf_counter()
+        n = import_capture(args.source, args.store)
+        print(f"{n} trames importées dans {args.store} en {time.perf_counter() - debut:.1f} s")
+        return
+
+    with CaptureStoreReader(args.store) as lecteur:
+        if not len(lecteur):
+            print(f"{args.store} : store vide")
+            return
+        reference = lecteur.timestamp(0)
+        debut_ns = parse_time(args.debut, reference) if args.debut else None
+        fin_ns = parse_time(args.fin, reference) if args.fin else None
+
+        debut = time.perf_counter()
+        numeros = lecteur.query(args.ip, args.port, debut_ns, fin_ns)
+        duree = time.perf_counter() - debut
+        print(f"{len(numeros)} trames sur {len(lecteur)} ({len(lecteur.segments)} segments indexés, "
+              f"{len(lecteur) - lecteur.indexed} en attente) — requête en {duree * 1000:.2f} ms")
+        for n in numeros[:args.show]:
+            print(f"  #{n:<9} {describe(lecteur.frame(n), lecteur.timestamp(n))}")
+        if len(numeros) > args.show:
+            print(f"  ... {len(numeros) - args.show} de plus")
+        if args.export:
+            lecteur.export(numeros, args.export)
+            print(f"{len(numeros)} trames écrites dans {args.export}")
+
+
+if __name__ == '__main__':
+    main()
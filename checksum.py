@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ CHECKSUM : somme de contrôle Internet (RFC 1071) rapide, et mise à jour incrémentale (RFC 1624)
+------------------------------------------------------------------------------------------------
+ IP, ICMP, UDP et TCP protègent leurs octets par la même somme : le complément à 1 de la
+ somme en complément à 1 des mots de 16 bits. Additionner les mots un par un dans une
+ boucle Python coûte ~2 µs par 100 octets ; tout le calcul est ici fait en C.
+
+ Somme complète (ones_sum) :
+   2**16 ≡ 1 (mod 0xFFFF) : la somme des mots de 16 bits et le buffer lu comme un seul grand
+   entier ont le même reste modulo 0xFFFF. Donc :
+       int.from_bytes(buffer, 'big') % 0xFFFF
+   (un seul passage en C, diviseur d'un seul "chiffre" CPython : chemin rapide).
+   Au-delà de NUMPY_MIN_BYTES (plus grand qu'une trame standard), np.frombuffer lit le
+   buffer en place comme des mots '>u2' et les additionne en uint64, quand NumPy est là.
+   Les deux acceptent bytes, bytearray ou memoryview, sans concaténation.
+
+ Pseudo-en-tête UDP/TCP (transport_checksum) : sa somme est ajoutée à celle du segment,
+   au lieu de construire pseudo + segment (une copie de tout le segment).
+
+ Mise à jour incrémentale (update, RFC 1624, équation 3) :
+       HC' = ~(~HC + ~m + m')
+   quand seul un champ change (TTL, identifiant, port...), le nouveau checksum se déduit de
+   l'ancien sans relire le paquet : le coût ne dépend plus de sa taille.
+
+   python3 checksum.py --bench          # 64 o à 64 Ko : boucle, struct, int, NumPy, incrémental
+------------------------------------------------------------------------------------------------
+"""
+
+import argparse
+import os
+import struct
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None   # chemin int.from_bytes pour toutes les tailles
+
+# Au-delà d'une trame Ethernet standard, NumPy rattrape son coût d'appel
+NUMPY_MIN_BYTES = 1500
+
+PSEUDO_HEADER = struct.Struct('!4s4sBBH')
+WORD = struct.Struct('!H')
+
+
+def fold(total):
+    """Ramène une somme quelconque sur 16 bits en complément à 1 (0xFFFF ≠ 0 sauf somme nulle)."""
+    if not total:
+        return 0
+    return total % 0xFFFF or 0xFFFF
+
+
+def ones_sum(data, initial=0):
+    """
+    Somme en complément à 1 des mots de 16 bits de `data` (+ `initial`), sur 16 bits.
+    Un nombre impair d'octets est complété par un zéro. Pour enchaîner plusieurs morceaux,
+    chacun doit commencer à un décalage pair du message.
+    """
+    n = len(data)
+    if np is not None and n >= NUMPY_MIN_BYTES:
+        total = int(np.frombuffer(data, dtype='>u2', count=n // 2).sum(dtype=np.uint64))
+        if n & 1:
+            total += data[-1] << 8
+    else:
+        total = int.from_bytes(data, 'big')
+        if n & 1:
+            total <<= 8
+    return fold(total + initial)
+
+
+def checksum(data, initial=0):
+    """Checksum Internet de `data` (champ à 0 dans `data` pendant le calcul)."""
+    return ~ones_sum(data, initial) & 0xFFFF
+
+
+def pseudo_header_sum(src, dst, proto, length):
+    """Somme du pseudo-en-tête IPv4 (src/dst : 4 octets bruts)."""
+    return ones_sum(PSEUDO_HEADER.pack(src, dst, 0, proto, length))
+
+
+def transport_checksum(src, dst, proto, segment):
+    """Checksum UDP (17) ou TCP (6) : pseudo-en-tête + segment, sans les concaténer."""
+    return checksum(segment, pseudo_header_sum(src, dst, proto, len(segment)))
+
+
+def udp_checksum(src, dst, segment):
+    """0 veut dire "pas de checksum" en UDP : un résultat nul s'écrit 0xFFFF (RFC 768)."""
+    return transport_checksum(src, dst, 17, segment) or 0xFFFF
+
+
+def update(old_checksum, old_word, new_word):
+    """RFC 1624 : nouveau checksum quand un mot de 16 bits passe de old_word à new_word."""
+    return ~fold((~old_checksum & 0xFFFF) + (~old_word & 0xFFFF) + new_word) & 0xFFFF
+
+
+def update_bytes(old_checksum, old, new):
+    """
+    Même chose pour un champ de plusieurs mots (adresse IP, paire de ports...) ; old et new
+    ont la même longueur paire et commencent à un décalage pair de l'en-tête.
+    """
+    return ~fold((~old_checksum & 0xFFFF) + (~ones_sum(old) & 0xFFFF) + ones_sum(new)) & 0xFFFF
+
+
+def update_in_place(buffer, checksum_offset, field_offset, new_field):
+    """
+    Réécrit le champ `field_offset` de `buffer` (bytearray / memoryview) avec `new_field`
+    et corrige le checksum situé à `checksum_offset` en conséquence. field_offset est pair.
+    """
+    fin = field_offset + len(new_field)
+    ancien = bytes(buffer[field_offset:fin])
+    buffer[field_offset:fin] = new_field
+    cs, = WORD.unpack_from(buffer, checksum_offset)
+    WORD.pack_into(buffer, checksum_offset, update_bytes(cs, ancien, new_field))
+
+
+# --- Benchmark -----------------------------------------------------------------------------------
+
+def _boucle(data):
+    """L'ancienne méthode de 03_encapsulateur.py : un mot de 16 bits par tour de boucle."""
+    if len(data) % 2:
+        data = bytes(data) + b'\x00'
+    total = 0
+    for i in range(0, len(data), 2):
+        total += (data[i] << 8) + data[i + 1]
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def _struct_sum(data):
+    """La méthode de synthetic_frames.py : struct.unpack de tous les mots, puis sum()."""
+    if len(data) % 2:
+        data = bytes(data) + b'\x00'
+    return ~fold(sum(struct.unpack(f'!{len(data) // 2}H', data))) & 0xFFFF
+
+
+def _int_sum(data):
+    n = len(data)
+    total = int.from_bytes(data, 'big') << (8 * (n & 1))
+    return ~fold(total) & 0xFFFF
+
+
+def _numpy_sum(data):
+    n = len(data)
+    total = int(np.frombuffer(data, dtype='>u2', count=n // 2).sum(dtype=np.uint64))
+    if n & 1:
+        total += data[-1] << 8
+    return ~fold(total) & 0xFFFF
+
+
+def _mesurer(fonction, argument, budget=0.05):
+    """Meilleur temps (ns) d'un appel, sur des lots calibrés pour durer ~`budget` s."""
+    n = 1
+    while True:
+        debut = time.perf_counter_ns()
+        for _ in range(n):
+            fonction(argument)
+        duree = time.perf_counter_ns() - debut
+        if duree >= budget * 1e9 / 5 or n >= 1 << 20:
+            break
+        n *= 4
+    meilleur = duree
+    for _ in range(4):
+        debut = time.perf_counter_ns()
+        for _ in range(n):
+            fonction(argument)
+        meilleur = min(meilleur, time.perf_counter_ns() - debut)
+    return meilleur / n
+
+
+def bench(tailles):
+    methodes = [('boucle', _boucle), ('struct', _struct_sum), ('int', _int_sum)]
+    if np is not None:
+        methodes.append(('numpy', _numpy_sum))
+    methodes.append(('checksum', checksum))
+    print(f"{'TAILLE':>7} " + ' '.join(f"{nom + ' ns':>12}" for nom, _ in methodes)
+          + f" {'incrémental':>12} {'Mo/s':>9}")
+    for taille in tailles:
+        paquet = bytearray(os.urandom(taille))
+        vue = memoryview(paquet)
+        reference = _boucle(paquet)
+        temps = []
+        for nom, fonction in methodes:
+            if fonction(vue) != reference:
+                raise AssertionError(f"{nom} : résultat faux pour {taille} octets")
+            temps.append(_mesurer(fonction, vue))
+        # Incrémental : le TTL (octet 8 d'un en-tête IP) change, le checksum suit sans relecture
+        ancien, = WORD.unpack_from(paquet, 8)
+        nouveau = ancien - 0x0100 if ancien >= 0x0100 else ancien + 0x0100
+        copie = bytearray(paquet)
+        WORD.pack_into(copie, 8, nouveau)
+        if update(reference, ancien, nouveau) != _boucle(copie):
+            raise AssertionError(f"update : résultat faux pour {taille} octets")
+        incremental = _mesurer(lambda _: update(reference, ancien, nouveau), None)
+        print(f"{taille:>7} " + ' '.join(f"{t:>12,.0f}" for t in temps)
+              + f" {incremental:>12,.0f} {taille / temps[-1] * 1e3:>9,.0f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Checksum Internet : vérification et benchmark.")
+    ap.add_argument('--bench', action='store_true', help="comparer les méthodes de 64 o à 64 Ko")
+    ap.add_argument('--sizes', type=int, nargs='+',
+                    default=[64, 128, 256, 512, 1024, 1500, 4096, 9000, 16384, 65535],
+                    help="tailles mesurées (octets)")
+    args = ap.parse_args()
+    if not args.bench:
+        ap.print_help()
+        return
+    if min(args.sizes) < 10:
+        ap.error("--sizes : 10 octets au moins (la mesure incrémentale modifie le TTL, octets 8-9)")
+    print(f"NumPy : {'oui' if np is not None else 'non'} (utilisé à partir de {NUMPY_MIN_BYTES} octets)\n")
+    bench(args.sizes)
+
+
+if __name__ == '__main__':
+    main()
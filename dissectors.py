@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ DISSECTORS : registre de dissecteurs de protocoles, aiguillés par dictionnaires
+------------------------------------------------------------------------------------------------
+ Chaque couche est confiée à un objet "dissecteur" qui :
+   - possède ses struct.Struct précompilés (le format n'est analysé qu'une fois) ;
+   - lit ses champs avec unpack_from sur une memoryview (pas de copie de la trame) ;
+   - ajoute ses dessins à la Dissection en cours, puis passe la main à la couche suivante.
+
+ La couche suivante est trouvée par une simple recherche dans un dict :
+
+   ethertypes    0x0800 -> IPv4     0x0806 -> ARP
+   ip_protocols  1 -> ICMP   6 -> TCP   17 -> UDP
+   ports         ('udp', 53) -> DNS
+
+ Ajouter un protocole ne demande pas de toucher à la boucle principale :
+
+   class SyslogDissector(Dissector):
+       name = "SYSLOG"
+       def dissect(self, data, ctx):
+           ctx.kind = self.name
+           ctx.layers.append((print, (bytes(data).decode(errors='replace'),)))
+           return True
+
+   REGISTRY.register_port('udp', 514, SyslogDissector())
+
+ dissect() rend False pour écarter la trame (filtre d'IP cible), True sinon.
+ Une couche tronquée (--snaplen, pcap court) n'efface pas les précédentes : la trame est
+ gardée, marquée ctx.truncated, avec les couches décodées jusque-là.
+------------------------------------------------------------------------------------------------
+"""
+
+import socket
+import struct
+from abc import ABC, abstractmethod
+
+from dns_decoder import decode_message
+from packet_views import format_mac
+
+
+class Dissection:
+    """État d'une trame en cours de dissection, partagé par les dissecteurs successifs."""
+    __slots__ = ('target_raw', 'parser', 'vis', 'streams', 'ts_ns',
+                 'kind', 'layers', 'src_raw', 'dst_raw', 'fragment', 'truncated')
+
+    def __init__(self, target_raw, parser, vis, streams=None, ts_ns=0):
+        self.target_raw = target_raw
+        self.parser = parser
+        self.vis = vis
+        self.streams = streams
+        self.ts_ns = ts_ns
+        self.kind = None
+        self.layers = []
+        self.src_raw = self.dst_raw = None
+        self.fragment = 0
+        self.truncated = False
+
+
+class Dissector(ABC):
+    """Un protocole : dissect() décode `data`, ajoute ses couches à ctx, rend True/False."""
+    name = "?"
+
+    @abstractmethod
+    def dissect(self, data, ctx):
+        ...
+
+
+class Registry:
+    """Tables d'aiguillage : EtherType, protocole IP, (transport, port) -> dissecteur."""
+
+    def __init__(self):
+        self.ethertypes = {}
+        self.ip_protocols = {}
+        self.ports = {}
+        self.root = EthernetDissector(self)
+
+    def register_ethertype(self, ethertype, dissector):
+        self.ethertypes[ethertype] = dissector
+
+    def register_ip_protocol(self, proto, dissector):
+        self.ip_protocols[proto] = dissector
+
+    def register_port(self, transport, port, dissector):
+        self.ports[(transport, port)] = dissector
+
+    def port_dissector(self, transport, src_port, dest_port):
+        """Le port de destination d'abord, puis le port source (réponse d'un serveur)."""
+        ports = self.ports
+        return ports.get((transport, dest_port)) or ports.get((transport, src_port))
+
+    def dissect_layer(self, dissector, data, ctx):
+        """
+        Passe `data` à la couche suivante. Si elle est tronquée, les couches déjà décodées
+        restent ; la trame n'est écartée que si le filtre d'IP cible n'a pas pu s'appliquer.
+        """
+        try:
+            return dissector.dissect(data, ctx)
+        except struct.error:
+            ctx.truncated = True
+            return ctx.target_raw is None or ctx.src_raw is not None
+
+    def dissect(self, frame, ctx):
+        """(kind, [(fonction_draw, args), ...]) ou None si la trame est écartée."""
+        try:
+            if not self.root.dissect(memoryview(frame), ctx):
+                return None
+        except struct.error:
+            return None
+        if ctx.truncated:
+            ctx.layers.append((ctx.vis.draw_truncated, (ctx.kind,)))
+        return ctx.kind, ctx.layers
+
+
+# --- Dissecteurs intégrés ---
+
+class EthernetDissector(Dissector):
+    name = "Ethernet"
+    HEADER = struct.Struct('!6s6sH')
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def dissect(self, data, ctx):
+        dst, src, ethertype = self.HEADER.unpack_from(data, 0)
+        suivant = self.registry.ethertypes.get(ethertype)
+        if suivant is None:
+            return False
+        ctx.kind = self.name
+        if not self.registry.dissect_layer(suivant, data[14:], ctx):
+            return False
+        # Adresses formatées seulement pour les trames retenues par le filtre d'IP cible
+        ctx.layers.insert(0, (ctx.vis.draw_ethernet, (format_mac(dst), format_mac(src), ethertype)))
+        return True
+
+
+class IPv4Dissector(Dissector):
+    name = "IPv4"
+    HEADER = struct.Struct('!BBHHHBBH4s4s')
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def dissect(self, data, ctx):
+        vhl, _, total_length, _, frag, ttl, proto, _, src, dst = self.HEADER.unpack_from(data, 0)
+        # Filtrage IPv4 (comparaison des 4 octets bruts, sans formater les adresses)
+        target = ctx.target_raw
+        if target is not None and src != target and dst != target:
+            return False
+        header_len = (vhl & 0x0F) * 4
+        # total_length borne la charge utile : le bourrage Ethernet des petites trames est exclu
+        fin = total_length if header_len <= total_length <= len(data) else len(data)
+        ctx.kind = self.name
+        ctx.src_raw, ctx.dst_raw, ctx.fragment = src, dst, frag & 0x1FFF
+        ctx.layers.append((ctx.vis.draw_ipv4, (vhl >> 4, header_len, ttl, proto,
+                                               socket.inet_ntoa(src), socket.inet_ntoa(dst))))
+        suivant = self.registry.ip_protocols.get(proto)
+        if suivant is not None:
+            self.registry.dissect_layer(suivant, data[header_len:fin], ctx)
+        return True
+
+
+class ARPDissector(Dissector):
+    name = "ARP"
+    BODY = struct.Struct('!HHBBH6s4s6s4s')
+
+    def dissect(self, data, ctx):
+        _, _, _, _, opcode, sender_mac, sender_ip, target_mac, target_ip = self.BODY.unpack_from(data, 0)
+        target = ctx.target_raw
+        if target is not None and sender_ip != target and target_ip != target:
+            return False
+        ctx.kind = self.name
+        ctx.layers.append((ctx.vis.draw_arp, (opcode, format_mac(sender_mac), socket.inet_ntoa(sender_ip),
+                                              format_mac(target_mac), socket.inet_ntoa(target_ip))))
+        return True
+
+
+class ICMPDissector(Dissector):
+    name = "ICMP"
+    HEADER = struct.Struct('!BBH')
+
+    def dissect(self, data, ctx):
+        icmp_type, code, checksum = self.HEADER.unpack_from(data, 0)
+        ctx.kind = self.name
+        ctx.layers.append((ctx.vis.draw_icmp, (icmp_type, code, checksum, bytes(data[4:]), ctx.parser)))
+        return True
+
+
+class TCPDissector(Dissector):
+    name = "TCP"
+    HEADER = struct.Struct('!HHIIBB')
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def dissect(self, data, ctx):
+        src_port, dest_port, seq, ack, offset, flags = self.HEADER.unpack_from(data, 0)
+        payload = bytes(data[(offset >> 4) * 4:])
+        ctx.kind = self.name
+        http = ()
+        # Flux TCP réassemblés : les messages HTTP complets arrivent ici (tcp_reassembly.py)
+        if ctx.streams is not None and ctx.fragment == 0:
+            http = ctx.streams.feed(ctx.src_raw, ctx.dst_raw, src_port, dest_port,
+                                    seq, flags & 0x3F, payload, ctx.ts_ns)
+            if http:
+                ctx.kind = "HTTP"
+        ctx.layers.append((ctx.vis.draw_tcp, (src_port, dest_port, seq, ack,
+                                              (flags >> 5) & 1, (flags >> 4) & 1, (flags >> 3) & 1,
+                                              (flags >> 2) & 1, (flags >> 1) & 1, flags & 1,
+                                              payload, ctx.parser, http)))
+        suivant = self.registry.port_dissector('tcp', src_port, dest_port)
+        if suivant is not None:
+            self.registry.dissect_layer(suivant, memoryview(payload), ctx)
+        return True
+
+
+class UDPDissector(Dissector):
+    name = "UDP"
+    HEADER = struct.Struct('!HHHH')
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def dissect(self, data, ctx):
+        src_port, dest_port, size, _ = self.HEADER.unpack_from(data, 0)
+        payload = data[8:]
+        ctx.kind = self.name
+        ctx.layers.append((ctx.vis.draw_udp, (src_port, dest_port, size, bytes(payload), ctx.parser)))
+        suivant = self.registry.port_dissector('udp', src_port, dest_port)
+        if suivant is not None:
+            self.registry.dissect_layer(suivant, payload, ctx)
+        return True
+
+
+class DNSDissector(Dissector):
+    name = "DNS"
+
+    def dissect(self, data, ctx):
+        try:
+            message = decode_message(bytes(data))
+        except ValueError:
+            return True   # pas du DNS, ou en-tête tronqué : la couche UDP suffit
+        domain = message.questions[0][0] if message.questions else ""
+        ctx.kind = self.name
+        ctx.layers.append((ctx.vis.draw_dns, (message.id, message.qr, message.opcode, message.rcode,
+                                              domain, message)))
+        return True
+
+
+def default_registry():
+    """Registre avec les dissecteurs intégrés : Ethernet, IPv4, ARP, ICMP, TCP, UDP, DNS."""
+    registry = Registry()
+    registry.register_ethertype(0x0800, IPv4Dissector(registry))
+    registry.register_ethertype(0x0806, ARPDissector())
+    registry.register_ip_protocol(1, ICMPDissector())
+    registry.register_ip_protocol(6, TCPDissector(registry))
+    registry.register_ip_protocol(17, UDPDissector(registry))
+    registry.register_port('udp', 53, DNSDissector())
+    return registry
+
+
+REGISTRY = default_registry()
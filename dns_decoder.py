@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ DNS DECODER : décodage complet d'un message DNS (format filaire, RFC 1035)
+------------------------------------------------------------------------------------------------
+ En-tête (12 octets) : [2] ID  [2] flags  [2] QDCOUNT  [2] ANCOUNT  [2] NSCOUNT  [2] ARCOUNT
+ Puis 4 sections : questions, réponses, autorité, additionnelles.
+
+ Un nom est une suite de labels [longueur][octets]... terminée par 0. Pour gagner de la
+ place, un nom peut finir par un POINTEUR (2 octets 11xxxxxx xxxxxxxx) vers un nom déjà
+ écrit plus tôt dans le message : "www.exemple.fr" puis "mail" + pointeur vers "exemple.fr".
+
+ Décodage des noms :
+   - les pointeurs sont suivis en boucle (pas de récursion) ;
+   - protection contre les boucles : un pointeur doit viser un octet situé AVANT le début
+     du segment de labels en cours, donc chaque saut recule strictement ;
+   - mémoïsation par message : chaque position de label décodée est mise en cache avec
+     son suffixe complet ; un pointeur vers "exemple.fr" déjà vu coûte une recherche de dict.
+
+ Un message tronqué (capture courte, UDP coupé) est décodé jusqu'où c'est possible :
+ message.truncated vaut alors True.
+
+   message = decode_message(udp_payload)
+   for rr in message.answers:
+       print(rr.describe())     # 'www.exemple.fr 300 A 93.184.216.34'
+------------------------------------------------------------------------------------------------
+"""
+
+import socket
+import struct
+
+HEADER = struct.Struct('!HHHHHH')
+QUESTION = struct.Struct('!HH')
+RR_HEADER = struct.Struct('!HHIH')
+U16 = struct.Struct('!H')
+SRV = struct.Struct('!HHH')
+SOA_TAIL = struct.Struct('!IIIII')
+
+MAX_NAME = 255
+
+TYPES = {
+    1: 'A', 2: 'NS', 5: 'CNAME', 6: 'SOA', 12: 'PTR', 15: 'MX', 16: 'TXT', 28: 'AAAA',
+    33: 'SRV', 41: 'OPT', 43: 'DS', 46: 'RRSIG', 47: 'NSEC', 48: 'DNSKEY', 64: 'SVCB',
+    65: 'HTTPS', 255: 'ANY',
+}
+
+RCODES = {0: 'NOERROR', 1: 'FORMERR', 2: 'SERVFAIL', 3: 'NXDOMAIN', 4: 'NOTIMP', 5: 'REFUSED'}
+
+
+class DnsError(ValueError):
+    pass
+
+
+def type_name(rtype):
+    return TYPES.get(rtype, f'TYPE{rtype}')
+
+
+class ResourceRecord:
+    __slots__ = ('name', 'type', 'rclass', 'ttl', 'data')
+
+    def __init__(self, name, rtype, rclass, ttl, data):
+        self.name, self.type, self.rclass, self.ttl, self.data = name, rtype, rclass, ttl, data
+
+    def describe(self):
+        return f"{self.name} {self.ttl} {type_name(self.type)} {self.data}"
+
+
+class DnsMessage:
+    __slots__ = ('id', 'flags', 'questions', 'answers', 'authority', 'additional', 'truncated')
+
+    def __init__(self, trans_id, flags):
+        self.id = trans_id
+        self.flags = flags
+        self.questions = []      # (nom, type, classe)
+        self.answers = []
+        self.authority = []
+        self.additional = []
+        self.truncated = False
+
+    @property
+    def qr(self):
+        return (self.flags >> 15) & 1
+
+    @property
+    def opcode(self):
+        return (self.flags >> 11) & 0xF
+
+    @property
+    def rcode(self):
+        return self.flags & 0xF
+
+
+def read_name(data, offset, cache):
+    """
+    Décode le nom qui commence à `offset`. Rend (nom, offset juste après le nom).
+    `cache` : dict position -> (nom, fin), propre à un message.
+    """
+    labels = []              # (position, label, segment)
+    seg_ends = []            # fin de chaque segment contigu de labels
+    seg_start = pos = offset
+    longueur = 0
+    while True:
+        hit = cache.get(pos)
+        if hit is not None:
+            suffix = hit[0]
+            seg_ends.append(hit[1])
+            break
+        if pos >= len(data):
+            raise DnsError("nom tronqué")
+        n = data[pos]
+        if n == 0:
+            suffix = ''
+            seg_ends.append(pos + 1)
+            break
+        if n & 0xC0 == 0xC0:
+            if pos + 1 >= len(data):
+                raise DnsError("pointeur tronqué")
+            cible = ((n & 0x3F) << 8) | data[pos + 1]
+            if cible >= seg_start:
+                raise DnsError(f"pointeur de compression invalide ({pos} -> {cible})")
+            seg_ends.append(pos + 2)
+            seg_start = pos = cible
+            continue
+        if n & 0xC0:
+            raise DnsError(f"type de label inconnu (0x{n:02x})")
+        label = data[pos + 1:pos + 1 + n]
+        if len(label) < n:
+            raise DnsError("label tronqué")
+        longueur += n + 1
+        if longueur > MAX_NAME:
+            raise DnsError("nom trop long")
+        labels.append((pos, label.decode('latin-1'), len(seg_ends)))
+        pos += 1 + n
+
+    # Mémoïsation : chaque label décodé devient un suffixe réutilisable
+    name = suffix
+    for position, label, segment in reversed(labels):
+        name = f"{label}.{name}" if name else label
+        cache[position] = (name, seg_ends[segment])
+    return name or '.', seg_ends[0]
+
+
+def _rdata(data, rtype, rclass, start, end, cache):
+    """Représentation texte des données d'un enregistrement."""
+    rd = data[start:end]
+    if rtype == 1 and len(rd) == 4:
+        return socket.inet_ntoa(rd)
+    if rtype == 28 and len(rd) == 16:
+        return socket.inet_ntop(socket.AF_INET6, rd)
+    if rtype in (2, 5, 12):
+        return read_name(data, start, cache)[0]
+    if rtype == 15:
+        return f"{U16.unpack_from(data, start)[0]} {read_name(data, start + 2, cache)[0]}"
+    if rtype == 33:
+        priorite, poids, port = SRV.unpack_from(data, start)
+        return f"{priorite} {poids} {port} {read_name(data, start + 6, cache)[0]}"
+    if rtype == 6:
+        mname, pos = read_name(data, start, cache)
+        rname, pos = read_name(data, pos, cache)
+        serial, refresh, retry, expire, minimum = SOA_TAIL.unpack_from(data, pos)
+        return f"{mname} {rname} {serial} {refresh} {retry} {expire} {minimum}"
+    if rtype == 16:
+        textes, i = [], 0
+        while i < len(rd):
+            n = rd[i]
+            textes.append('"' + rd[i + 1:i + 1 + n].decode('utf-8', errors='replace') + '"')
+            i += 1 + n
+        return ' '.join(textes)
+    if rtype == 41:
+        return f"EDNS0 (UDP {rclass})"
+    return f"[{len(rd)} octets]"
+
+
+def _read_rr(data, pos, cache):
+    name, pos = read_name(data, pos, cache)
+    if pos + RR_HEADER.size > len(data):
+        raise DnsError("enregistrement tronqué")
+    rtype, rclass, ttl, rdlength = RR_HEADER.unpack_from(data, pos)
+    pos += RR_HEADER.size
+    fin = pos + rdlength
+    if fin > len(data):
+        raise DnsError("données d'enregistrement tronquées")
+    try:
+        valeur = _rdata(data, rtype, rclass, pos, fin, cache)
+    except (DnsError, struct.error, IndexError, ValueError):
+        valeur = f"[{rdlength} octets illisibles]"
+    return ResourceRecord(name, rtype, rclass, ttl, valeur), fin
+
+
+def decode_message(data):
+    """Décode un message DNS complet (bytes). Lève DnsError si l'en-tête manque."""
+    if len(data) < HEADER.size:
+        raise DnsError("en-tête DNS tronqué")
+    trans_id, flags, qdcount, ancount, nscount, arcount = HEADER.unpack_from(data, 0)
+    message = DnsMessage(trans_id, flags)
+    cache = {}
+    pos = HEADER.size
+    try:
+        for _ in range(qdcount):
+            name, pos = read_name(data, pos, cache)
+            if pos + QUESTION.size > len(data):
+                raise DnsError("question tronquée")
+            qtype, qclass = QUESTION.unpack_from(data, pos)
+            pos += QUESTION.size
+            message.questions.append((name, qtype, qclass))
+        for section, count in ((message.answers, ancount), (message.authority, nscount),
+                               (message.additional, arcount)):
+            for _ in range(count):
+                rr, pos = _read_rr(data, pos, cache)
+                section.append(rr)
+    except DnsError:
+        message.truncated = True
+    return message
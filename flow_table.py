@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ FLOW TABLE : suivi des conversations (flux 5-tuple) en mémoire bornée
+------------------------------------------------------------------------------------------------
+ Un flux = (IP src, IP dst, protocole, port src, port dst). Les deux sens d'une même
+ conversation partagent une entrée : le premier paquet vu fixe l'"initiateur".
+
+ Chaque flux garde (Flow, __slots__) :
+   - paquets et octets, premier et dernier horodatage (ns)
+   - l'union des flags TCP vus et un court historique à la Zeek :
+       S = SYN   H = SYN+ACK   A = ACK pur   D = données   F = FIN   R = RST
+     en MAJUSCULE pour l'initiateur, en minuscule pour le répondeur ("ShAaDd...")
+
+ Une trame TCP/UDP tronquée avant ses ports ne crée pas de flux : elle est seulement
+ comptée dans `truncated`.
+
+ Mémoire bornée :
+   - la table est un OrderedDict rangé par dernière activité : le flux le moins récemment
+     actif est toujours en tête (LRU) ;
+   - expiration à l'inactivité : on retire la tête tant qu'elle est plus vieille que
+     idle_timeout — pas de parcours de toute la table ;
+   - plafond dur : au-delà de max_flows, on évince la tête (LRU), quoi qu'il arrive.
+------------------------------------------------------------------------------------------------
+"""
+
+import heapq
+import socket
+import sys
+import threading
+from collections import OrderedDict
+
+from packet_views import EthernetView, ETH_P_IP, IPPROTO_TCP, IPPROTO_UDP
+
+HISTORY_MAX = 16
+
+# Bits de flags TCP (octet 13 de l'en-tête)
+TCP_FIN, TCP_SYN, TCP_RST, TCP_PSH, TCP_ACK, TCP_URG = 0x01, 0x02, 0x04, 0x08, 0x10, 0x20
+
+PROTO_NAMES = {1: "ICMP", 6: "TCP", 17: "UDP"}
+
+
+class Flow:
+    __slots__ = ('src', 'dst', 'proto', 'sport', 'dport',
+                 'packets', 'bytes', 'first_ts', 'last_ts', 'tcp_flags', 'history')
+
+    def __init__(self, src, dst, proto, sport, dport, ts_ns):
+        self.src, self.dst, self.proto, self.sport, self.dport = src, dst, proto, sport, dport
+        self.packets = 0
+        self.bytes = 0
+        self.first_ts = ts_ns
+        self.last_ts = ts_ns
+        self.tcp_flags = 0
+        self.history = ''
+
+    def describe(self):
+        """'10.0.0.5:51234 → 93.184.216.34:443 TCP'"""
+        src, dst = socket.inet_ntoa(self.src), socket.inet_ntoa(self.dst)
+        nom = PROTO_NAMES.get(self.proto, str(self.proto))
+        if self.proto in (IPPROTO_TCP, IPPROTO_UDP):
+            return f"{src}:{self.sport} → {dst}:{self.dport} {nom}"
+        return f"{src} → {dst} {nom}"
+
+    @property
+    def duration(self):
+        return (self.last_ts - self.first_ts) / 1e9
+
+
+def _history_letter(flags, has_data):
+    if flags & TCP_RST:
+        return 'R'
+    if flags & TCP_SYN:
+        return 'H' if flags & TCP_ACK else 'S'
+    if flags & TCP_FIN:
+        return 'F'
+    if has_data:
+        return 'D'
+    if flags & TCP_ACK:
+        return 'A'
+    return ''
+
+
+class FlowTable:
+    """
+    Table de flux bornée, utilisable depuis un thread de capture pendant qu'un autre
+    thread lit top() (les deux côtés prennent le verrou).
+    """
+
+    def __init__(self, max_flows=100_000, idle_timeout=60.0):
+        self.flows = OrderedDict()
+        self.max_flows = max_flows
+        self.idle_timeout_ns = int(idle_timeout * 1e9)
+        self.lock = threading.Lock()
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+        self.truncated = 0
+        self._updates = 0
+
+    @classmethod
+    def from_memory(cls, megabytes, idle_timeout=60.0):
+        """Dimensionne max_flows pour tenir dans environ `megabytes` Mo."""
+        return cls(max(1, int(megabytes * 1_000_000 // estimated_flow_size())), idle_timeout)
+
+    def __len__(self):
+        return len(self.flows)
+
+    def update(self, src, dst, proto, sport, dport, length, ts_ns, tcp_flags=None, has_data=False):
+        """Compte un paquet. src/dst = 4 octets bruts (bytes)."""
+        # Clé canonique : les deux sens d'une conversation tombent sur la même entrée
+        if (src, sport) <= (dst, dport):
+            key, forward = (src, dst, proto, sport, dport), True
+        else:
+            key, forward = (dst, src, proto, dport, sport), False
+
+        with self.lock:
+            flows = self.flows
+            flow = flows.get(key)
+            if flow is None:
+                if len(flows) >= self.max_flows:
+                    flows.popitem(last=False)
+                    self.evicted_lru += 1
+                flow = flows[key] = Flow(src, dst, proto, sport, dport, ts_ns)
+            else:
+                flows.move_to_end(key)
+            flow.packets += 1
+            flow.bytes += length
+            flow.last_ts = ts_ns
+
+            if tcp_flags is not None:
+                flow.tcp_flags |= tcp_flags
+                lettre = _history_letter(tcp_flags, has_data)
+                if lettre:
+                    if (src != flow.src or sport != flow.sport):
+                        lettre = lettre.lower()
+                    if not flow.history.endswith(lettre) and len(flow.history) < HISTORY_MAX:
+                        flow.history += lettre
+
+            self._updates += 1
+            if not self._updates & 0xFF:
+                self._expire(ts_ns)
+
+    def add_frame(self, frame, ts_ns, length=None):
+        """
+        Met à jour la table depuis une trame Ethernet brute (IPv4 uniquement).
+        `length` : taille sur le fil, quand la trame capturée a été tronquée.
+        """
+        eth = EthernetView(frame)
+        if len(frame) < 34 or eth.ethertype != ETH_P_IP:
+            return
+        ip = eth.ipv4()
+        proto = ip.proto
+        sport = dport = 0
+        tcp_flags = None
+        has_data = False
+        if ip.fragment_offset == 0:
+            # Trame tronquée avant les ports (--snaplen, pcap court) : ignorée, mais comptée
+            segment = len(ip.payload)
+            if (proto == IPPROTO_TCP and segment < 20) or (proto == IPPROTO_UDP and segment < 8):
+                self.truncated += 1
+                return
+            if proto == IPPROTO_TCP:
+                tcp = ip.tcp()
+                sport, dport = tcp.src_port, tcp.dst_port
+                tcp_flags = tcp.flags
+                has_data = len(tcp.buf) > tcp.header_len
+            elif proto == IPPROTO_UDP:
+                udp = ip.udp()
+                sport, dport = udp.src_port, udp.dst_port
+        self.update(bytes(ip.src_raw), bytes(ip.dst_raw), proto, sport, dport,
+                    len(frame) if length is None else length, ts_ns, tcp_flags, has_data)
+
+    def _expire(self, now_ns):
+        limite = now_ns - self.idle_timeout_ns
+        flows = self.flows
+        while flows:
+            flow = next(iter(flows.values()))
+            if flow.last_ts >= limite:
+                break
+            flows.popitem(last=False)
+            self.evicted_idle += 1
+
+    def expire(self, now_ns):
+        with self.lock:
+            self._expire(now_ns)
+
+    def top(self, n=10, by='bytes'):
+        """Les n flux les plus gros (par 'bytes' ou 'packets')."""
+        with self.lock:
+            return heapq.nlargest(n, self.flows.values(), key=lambda f: getattr(f, by))
+
+
+def estimated_flow_size():
+    """Octets occupés par une entrée (clé + Flow + nœud d'OrderedDict), mesurés sur un exemple."""
+    cle = (b'\x0a\x00\x00\x01', b'\x0a\x00\x00\x02', 6, 51234, 443)
+    flow = Flow(cle[0], cle[1], 6, 51234, 443, 0)
+    taille = sys.getsizeof(cle) + sys.getsizeof(flow) + sum(sys.getsizeof(x) for x in cle)
+    return taille + 100   # entrée de dict + nœud de liste chaînée de l'OrderedDict
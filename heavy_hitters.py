@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ HEAVY HITTERS : "qui parle le plus ?" en mémoire fixe (Count-Min Sketch + Space-Saving)
+------------------------------------------------------------------------------------------------
+ Un dict {clé: compteur} grossit avec chaque IP, port ou paire de MAC jamais vue : sur un
+ lien avec des millions de clés distinctes, la mémoire ne s'arrête jamais de monter.
+ Deux structures de taille FIXE, choisie au démarrage, répondent à la place :
+
+ Count-Min Sketch (depth lignes x width compteurs, NumPy uint64)
+   Chaque clé incrémente un compteur par ligne (une fonction de hachage par ligne).
+   Estimation = le minimum des `depth` compteurs : jamais en dessous de la vraie valeur,
+   et au-dessus d'au plus ε·N (ε = e / width) avec une probabilité 1 - δ (δ = e^-depth),
+   N étant le total compté.
+
+ Space-Saving (k emplacements)
+   Garde k clés candidates. Une clé inconnue, table pleine, prend la place de la plus
+   petite et hérite de son compteur (noté comme erreur possible). Toute clé de fréquence
+   supérieure à N / k est forcément dans la table, et pour chacune :
+       compteur - erreur  <=  vraie valeur  <=  compteur
+
+ HeavyHitters combine les deux : Space-Saving fournit les candidats et la borne basse,
+ le sketch resserre la borne haute. Mises à jour par paquet (add) ou par lot (add_batch,
+ hachage vectorisé et np.add.at).
+
+ NumPy est une dépendance optionnelle : pip install numpy
+
+   talkers = TopTalkers.from_memory(16)        # ~16 Mo pour les trois tableaux
+   talkers.add_frame(trame)                    # dans la boucle de capture
+   talkers.tracker('src').top(10)              # [(clé, estimation, basse, haute), ...]
+------------------------------------------------------------------------------------------------
+"""
+
+import math
+import random
+import socket
+import struct
+import threading
+from collections import Counter, deque
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("heavy_hitters.py nécessite NumPy : pip install numpy") from None
+
+MASK64 = (1 << 64) - 1
+SEED = 0x7A1C
+
+
+def fold64(key):
+    """Ramène une clé entière quelconque (une paire de MAC fait 96 bits) à 64 bits."""
+    return (key ^ (key >> 64)) & MASK64
+
+
+class CountMinSketch:
+    """depth x width compteurs uint64 ; width est arrondie à une puissance de 2."""
+
+    def __init__(self, width=1 << 16, depth=4, seed=SEED):
+        self.bits = max(1, (width - 1).bit_length())
+        self.width = 1 << self.bits
+        self.depth = depth
+        self.table = np.zeros((depth, self.width), dtype=np.uint64)
+        self.total = 0
+        # Hachage multiplicatif (multiply-shift) : a impair, les bits de poids fort font l'index
+        rng = random.Random(seed)
+        self._a = [rng.getrandbits(64) | 1 for _ in range(depth)]
+        self._b = [rng.getrandbits(64) for _ in range(depth)]
+        self._a_np = np.array(self._a, dtype=np.uint64)[:, None]
+        self._b_np = np.array(self._b, dtype=np.uint64)[:, None]
+        self._shift = 64 - self.bits
+
+    @property
+    def epsilon(self):
+        return math.e / self.width
+
+    @property
+    def delta(self):
+        return math.exp(-self.depth)
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def _indexes(self, key):
+        x = fold64(key)
+        shift = self._shift
+        return [((a * x + b) & MASK64) >> shift for a, b in zip(self._a, self._b)]
+
+    def add(self, key, count=1):
+        table = self.table
+        for ligne, index in enumerate(self._indexes(key)):
+            table[ligne, index] += count
+        self.total += count
+
+    def add_batch(self, keys, counts):
+        """keys : uint64 (déjà ramenées à 64 bits), counts : compteurs correspondants."""
+        keys = np.asarray(keys, dtype=np.uint64)
+        counts = np.asarray(counts, dtype=np.uint64)
+        # (depth, n) index d'un coup ; la multiplication uint64 boucle modulo 2**64, comme voulu
+        index = (self._a_np * keys + self._b_np) >> np.uint64(self._shift)
+        for ligne in range(self.depth):
+            np.add.at(self.table[ligne], index[ligne], counts)
+        self.total += int(counts.sum())
+
+    def estimate(self, key):
+        table = self.table
+        return int(min(table[ligne, index] for ligne, index in enumerate(self._indexes(key))))
+
+    def error_bound(self):
+        """ε·N : dépassement maximal d'une estimation (avec probabilité 1 - δ)."""
+        return self.epsilon * self.total
+
+
+class SpaceSaving:
+    """k emplacements : clés Python (entiers) + compteurs et erreurs dans des tableaux NumPy."""
+
+    def __init__(self, k=100):
+        self.k = k
+        self.counts = np.zeros(k, dtype=np.uint64)
+        self.errors = np.zeros(k, dtype=np.uint64)
+        self.keys = [None] * k
+        self.slots = {}
+        self.total = 0
+        self.replaced = 0
+
+    @property
+    def nbytes(self):
+        return self.counts.nbytes + self.errors.nbytes
+
+    def add(self, key, count=1):
+        self.total += count
+        slot = self.slots.get(key)
+        if slot is not None:
+            self.counts[slot] += count
+            return
+        if len(self.slots) < self.k:
+            slot = len(self.slots)
+            self.errors[slot] = 0
+            self.counts[slot] = count
+        else:
+            # Table pleine : la plus petite clé cède sa place, son compteur devient l'erreur
+            slot = int(self.counts.argmin())
+            del self.slots[self.keys[slot]]
+            self.errors[slot] = self.counts[slot]
+            self.counts[slot] += count
+            self.replaced += 1
+        self.keys[slot] = key
+        self.slots[key] = slot
+
+    def top(self, n):
+        """[(clé, compteur, erreur), ...] des n plus gros compteurs."""
+        used = len(self.slots)
+        if not used:
+            return []
+        counts = self.counts[:used]
+        ordre = np.argsort(counts)[::-1][:n]
+        return [(self.keys[i], int(counts[i]), int(self.errors[i])) for i in ordre]
+
+    def error_bound(self):
+        """N / k : une clé absente de la table ne peut pas dépasser ce nombre."""
+        return self.total / self.k
+
+
+class HeavyHitters:
+    """Top-K avec bornes : Space-Saving pour les candidats, Count-Min pour resserrer."""
+
+    def __init__(self, k=100, width=1 << 16, depth=4, seed=SEED):
+        self.sketch = CountMinSketch(width, depth, seed)
+        self.summary = SpaceSaving(k)
+
+    @property
+    def nbytes(self):
+        return self.sketch.nbytes + self.summary.nbytes
+
+    @property
+    def total(self):
+        return self.summary.total
+
+    def add(self, key, count=1):
+        self.sketch.add(key, count)
+        self.summary.add(key, count)
+
+    def add_batch(self, keys):
+        """Un lot de clés (une par paquet) : regroupées d'abord, chaque clé distincte une fois."""
+        if not keys:
+            return
+        groupes = Counter(keys)
+        distinctes = list(groupes)
+        self.sketch.add_batch([fold64(cle) for cle in distinctes], list(groupes.values()))
+        summary = self.summary
+        # Les plus fréquentes d'abord : elles entrent avant que le lot n'évince quoi que ce soit
+        for cle, n in groupes.most_common():
+            summary.add(cle, n)
+
+    def top(self, n=10):
+        """[(clé, estimation, borne basse, borne haute), ...] triés par estimation."""
+        lignes = []
+        for cle, compte, erreur in self.summary.top(n):
+            haute = min(compte, self.sketch.estimate(cle))
+            lignes.append((cle, haute, compte - erreur, haute))
+        lignes.sort(key=lambda ligne: ligne[1], reverse=True)
+        return lignes
+
+
+# --- Top talkers d'une capture ------------------------------------------------------------------
+
+ETH_HEADER = struct.Struct('!12sH')
+IPV4_FIELDS = struct.Struct('!14xB5xHxB2x4s')   # vhl, frag, proto, src
+DEST_PORT = struct.Struct('!2xH')
+
+
+def format_ip(key):
+    return socket.inet_ntoa(key.to_bytes(4, 'big'))
+
+
+def format_port(key):
+    return str(key)
+
+
+def format_mac_pair(key):
+    """Clé 96 bits (MAC destination << 48 | MAC source) -> 'src → dst'."""
+    brut = key.to_bytes(12, 'big')
+    return f"{brut[6:].hex(':').upper()} → {brut[:6].hex(':').upper()}"
+
+
+class TopTalkers:
+    """
+    Trois classements : IP source, port de destination TCP/UDP, paire de MAC.
+    La boucle de capture empile les clés (add_frame) ; tous les `batch` paquets, elles
+    sont versées dans les sketches d'un coup. flush() et top() peuvent être appelés depuis
+    un autre thread (l'affichage vide ainsi ce qui attend quand le trafic est faible).
+    """
+
+    TRACKERS = (('src', "IP source", format_ip),
+                ('dport', "Port destination", format_port),
+                ('mac', "Paire MAC", format_mac_pair))
+
+    def __init__(self, k=100, width=1 << 16, depth=4, batch=4096):
+        self.trackers = {nom: HeavyHitters(k, width, depth) for nom, _, _ in self.TRACKERS}
+        self.batch = batch
+        self.lock = threading.Lock()
+        self._pending = {nom: deque() for nom, _, _ in self.TRACKERS}
+
+    @classmethod
+    def from_memory(cls, megabytes, k=100, depth=4, batch=4096):
+        """Largeur des sketches choisie pour que les trois tiennent dans ~`megabytes` Mo."""
+        par_sketch = megabytes * 1_000_000 / len(cls.TRACKERS)
+        width = 1 << max(4, int(math.log2(par_sketch / (depth * 8))))
+        return cls(k, width, depth, batch)
+
+    @property
+    def nbytes(self):
+        return sum(tracker.nbytes for tracker in self.trackers.values())
+
+    def tracker(self, nom):
+        return self.trackers[nom]
+
+    def add_frame(self, frame):
+        try:
+            macs, ethertype = ETH_HEADER.unpack_from(frame)
+        except struct.error:
+            return
+        pending = self._pending
+        pending['mac'].append(int.from_bytes(macs, 'big'))
+        if ethertype == 0x0800:
+            try:
+                vhl, frag, proto, src = IPV4_FIELDS.unpack_from(frame)
+                pending['src'].append(int.from_bytes(src, 'big'))
+                if proto in (6, 17) and not frag & 0x1FFF:
+                    pending['dport'].append(DEST_PORT.unpack_from(frame, 14 + (vhl & 0x0F) * 4)[0])
+            except struct.error:
+                pass
+        if len(pending['mac']) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        # popleft() : chaque clé va à un seul des threads qui vident, aucune n'est perdue
+        for nom, pending in self._pending.items():
+            cles = []
+            try:
+                for _ in range(len(pending)):
+                    cles.append(pending.popleft())
+            except IndexError:
+                pass
+            with self.lock:
+                self.trackers[nom].add_batch(cles)
+
+    def top(self, n=10):
+        """[(titre, tracker, [(libellé, estimation, basse, haute), ...]), ...]"""
+        with self.lock:
+            return [(titre, self.trackers[nom],
+                     [(formater(cle), est, basse, haute) for cle, est, basse, haute in self.trackers[nom].top(n)])
+                    for nom, titre, formater in self.TRACKERS]
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ HEXDUMP : mise en forme rapide des charges utiles (hexdump et texte)
+------------------------------------------------------------------------------------------------
+ Construire un hexdump octet par octet (f'{b:02X}', chr(b)...) coûte plusieurs appels
+ Python par octet : sur une capture chargée, c'est l'étape la plus chère par paquet.
+ Ici, tout le travail par octet est fait en C :
+
+   bytes.hex(' ')              -> "45 00 00 54 ..." pour tout le bloc, en un appel
+   bytes.translate(ASCII)      -> colonne ASCII : les octets non imprimables deviennent '.'
+   bytes.translate(None, TEXT) -> supprime les octets "texte" : ce qui reste est le binaire
+
+ La boucle Python ne fait plus que découper des tranches de 16 octets.
+
+ Deux garde-fous :
+   - printable_ratio() ne regarde que les `probe` premiers octets pour décider
+     texte ou binaire : pas de décodage UTF-8 spéculatif de toute la charge ;
+   - max_bytes borne ce qui est mis en forme ; la suite n'est produite qu'à la demande,
+     avec rows(data, start=...) (l'affichage indique combien d'octets restent).
+
+   print(hexdump(b'GET / HTTP/1.1\\r\\n'))
+   0000  47 45 54 20 2F 20 48 54 54 50 2F 31 2E 31 0D 0A  GET / HTTP/1.1..
+------------------------------------------------------------------------------------------------
+"""
+
+import textwrap
+
+MAX_BYTES = 512
+PROBE = 256
+TEXT_THRESHOLD = 0.95
+
+# Octets considérés comme du texte : ASCII imprimable, tabulation, retour chariot, saut de ligne
+TEXT_BYTES = bytes(range(32, 127)) + b'\t\n\r'
+# Colonne ASCII : chaque octet non imprimable devient '.'
+ASCII_TABLE = bytes(b if 32 <= b < 127 else 0x2E for b in range(256))
+
+
+def printable_ratio(data, probe=PROBE):
+    """Part d'octets "texte" parmi les `probe` premiers (0.0 pour une charge vide)."""
+    sample = bytes(data[:probe])
+    if not sample:
+        return 0.0
+    return 1.0 - len(sample.translate(None, TEXT_BYTES)) / len(sample)
+
+
+def looks_like_text(data, threshold=TEXT_THRESHOLD, probe=PROBE):
+    return printable_ratio(data, probe) >= threshold
+
+
+def rows(data, start=0, stop=None, width=16):
+    """
+    (offset, hexa, ascii) pour chaque ligne de `width` octets entre start et stop.
+    `hexa` est "45 00 00 54 ..." (octets séparés par un espace, en majuscules).
+    """
+    stop = len(data) if stop is None else min(stop, len(data))
+    chunk = bytes(data[start:stop])
+    hexa = chunk.hex(' ').upper()
+    ascii_column = chunk.translate(ASCII_TABLE).decode('ascii')
+    step = width * 3
+    for i in range(0, len(chunk), width):
+        yield start + i, hexa[i * 3:i * 3 + step - 1], ascii_column[i:i + width]
+
+
+def truncation_note(total, shown):
+    return f"... {total - shown} octets de plus (sur {total})"
+
+
+def hexdump(data, max_bytes=MAX_BYTES, width=16):
+    """Hexdump classique : offset, octets en hexadécimal, colonne ASCII ; borné à max_bytes."""
+    pad = width * 3
+    lines = [f"{offset:04X}  {hexa:<{pad}}  {text}" for offset, hexa, text in rows(data, 0, max_bytes, width)]
+    if len(data) > max_bytes:
+        lines.append(truncation_note(len(data), max_bytes))
+    return '\n'.join(lines)
+
+
+def format_payload(data, width=60, max_bytes=MAX_BYTES):
+    """Texte replié sur `width` colonnes si la charge ressemble à du texte, hexdump sinon."""
+    if not looks_like_text(data):
+        return hexdump(data, max_bytes)
+    text = textwrap.fill(bytes(data[:max_bytes]).decode('utf-8', 'replace'), width=width)
+    if len(data) > max_bytes:
+        text += '\n' + truncation_note(len(data), max_bytes)
+    return text
+
+
+def preview(data, size=48):
+    """Aperçu sur une ligne : le début de la charge en ASCII, '...' si elle est plus longue."""
+    text = bytes(data[:size]).translate(ASCII_TABLE).decode('ascii')
+    return text + '...' if len(data) > size else text
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ HTTP PARSER : analyseur HTTP/1.x incrémental pour les flux TCP réassemblés
+------------------------------------------------------------------------------------------------
+ Le parseur reçoit le flux d'UN sens d'une connexion, morceau par morceau, dans l'ordre
+ (c'est le travail de tcp_reassembly.py). Les frontières de segments n'ont aucune
+ importance : une requête peut arriver en dix segments, ou dix requêtes en un seul.
+
+   ligne de départ   GET /index.html HTTP/1.1        |  HTTP/1.1 200 OK
+   en-têtes          Host: exemple.fr                 (jusqu'à la ligne vide)
+   corps             Content-Length, chunked, ou jusqu'à la fermeture (réponse seule)
+
+ Mémoire bornée :
+   - seule une ligne incomplète est gardée en tampon (MAX_LINE octets au plus) ;
+   - le corps n'est jamais stocké : on ne fait que compter ses octets ;
+   - dès que le flux ne ressemble pas à du HTTP, le parseur se désactive (active = False)
+     et le réassembleur cesse de bufferiser ce sens de la connexion.
+
+ Limite connue : la réponse à un HEAD annonce un Content-Length sans envoyer de corps ;
+ chaque sens étant analysé seul, le parseur attend ce corps qui ne viendra pas.
+------------------------------------------------------------------------------------------------
+"""
+
+METHODS = frozenset((b'GET', b'POST', b'PUT', b'DELETE', b'HEAD', b'OPTIONS',
+                     b'PATCH', b'CONNECT', b'TRACE'))
+
+MAX_LINE = 8192
+MAX_HEADERS = 100
+HEX_DIGITS = frozenset(b'0123456789abcdefABCDEF')
+
+# États
+START, HEADERS, BODY, CHUNK_SIZE, CHUNK_DATA, CHUNK_END, TRAILER, UNTIL_CLOSE = range(8)
+
+
+class HttpMessage:
+    """Une requête ou une réponse complète (le corps n'est que compté)."""
+    __slots__ = ('is_request', 'method', 'target', 'status', 'reason', 'version',
+                 'headers', 'body_len', 'gaps')
+
+    def __init__(self, is_request, version):
+        self.is_request = is_request
+        self.version = version
+        self.method = self.target = self.reason = None
+        self.status = 0
+        self.headers = []
+        self.body_len = 0
+        self.gaps = 0          # octets de corps perdus (trous de capture)
+
+    def header(self, name):
+        """Valeur du premier en-tête `name` (insensible à la casse), ou None."""
+        name = name.lower()
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return None
+
+    def summary(self):
+        if self.is_request:
+            texte = f"{self.method} {self.target} {self.version}"
+            host = self.header('host')
+            if host:
+                texte += f" (Host: {host})"
+        else:
+            texte = f"{self.version} {self.status} {self.reason}"
+        if self.body_len:
+            texte += f" [{self.body_len} octets de corps]"
+        if self.gaps:
+            texte += f" [{self.gaps} octets manquants]"
+        return texte
+
+
+class HttpParser:
+    """
+    parser.feed(octets) -> liste des messages terminés par ces octets.
+    parser.gap(n)       -> le réassembleur signale n octets perdus dans le flux.
+    parser.close()      -> fin du flux (termine un corps "jusqu'à la fermeture").
+    """
+
+    def __init__(self):
+        self.active = True
+        self.state = START
+        self.buf = bytearray()
+        self.message = None
+        self.remaining = 0
+        self.messages = 0
+
+    def feed(self, data):
+        out = []
+        pos, n = 0, len(data)
+        while self.active and pos < n:
+            state = self.state
+            if state == BODY or state == CHUNK_DATA:
+                # Corps de longueur connue : on saute les octets sans les copier
+                k = min(self.remaining, n - pos)
+                self.message.body_len += k
+                self.remaining -= k
+                pos += k
+                if not self.remaining:
+                    if state == BODY:
+                        out.append(self._finish())
+                    else:
+                        self.state = CHUNK_END
+            elif state == UNTIL_CLOSE:
+                self.message.body_len += n - pos
+                pos = n
+            else:
+                fin = data.find(b'\n', pos)
+                if fin < 0:
+                    self.buf += data[pos:]
+                    if len(self.buf) > MAX_LINE:
+                        self.active = False
+                    break
+                if self.buf:
+                    self.buf += data[pos:fin]
+                    line = bytes(self.buf)
+                    self.buf.clear()
+                else:
+                    line = data[pos:fin]
+                pos = fin + 1
+                if len(line) > MAX_LINE:
+                    self.active = False
+                    break
+                if line.endswith(b'\r'):
+                    line = line[:-1]
+                self._on_line(line, out)
+        return out
+
+    def gap(self, n):
+        """Un trou dans le corps est absorbé ; ailleurs, on ne peut plus se resynchroniser."""
+        out = []
+        state = self.state
+        if (state == BODY or state == CHUNK_DATA) and n <= self.remaining:
+            self.remaining -= n
+            self.message.body_len += n
+            self.message.gaps += n
+            if not self.remaining:
+                if state == BODY:
+                    out.append(self._finish())
+                else:
+                    self.state = CHUNK_END
+        elif state == UNTIL_CLOSE:
+            self.message.body_len += n
+            self.message.gaps += n
+        else:
+            self.active = False
+        return out
+
+    def close(self):
+        if self.active and self.state == UNTIL_CLOSE:
+            return [self._finish()]
+        return []
+
+    # --- Lignes ---
+
+    def _on_line(self, line, out):
+        state = self.state
+        if state == START:
+            if line:                      # lignes vides tolérées entre deux messages
+                self._start_line(line)
+        elif state == HEADERS:
+            if line:
+                name, sep, value = line.partition(b':')
+                if not sep or len(self.message.headers) >= MAX_HEADERS:
+                    self.active = False
+                    return
+                self.message.headers.append((name.strip().decode('latin-1'),
+                                             value.strip().decode('latin-1')))
+            else:
+                self._headers_done(out)
+        elif state == CHUNK_SIZE:
+            # Hexadécimal strict : int(, 16) accepterait "-1", "+a", "0x10" ou "1_0"
+            taille = line.split(b';', 1)[0].strip()
+            if not taille or not HEX_DIGITS.issuperset(taille):
+                self.active = False
+                return
+            size = int(taille, 16)
+            if size:
+                self.remaining = size
+                self.state = CHUNK_DATA
+            else:
+                self.state = TRAILER
+        elif state == CHUNK_END:
+            if line:
+                self.active = False
+            else:
+                self.state = CHUNK_SIZE
+        elif state == TRAILER:
+            if not line:
+                out.append(self._finish())
+
+    def _start_line(self, line):
+        parts = line.split(b' ', 2)
+        if line.startswith(b'HTTP/1.') and len(parts) >= 2 and parts[1].isdigit():
+            message = HttpMessage(False, parts[0].decode('latin-1'))
+            message.status = int(parts[1])
+            message.reason = parts[2].decode('latin-1') if len(parts) == 3 else ''
+        elif len(parts) == 3 and parts[0] in METHODS and parts[2].startswith(b'HTTP/1.'):
+            message = HttpMessage(True, parts[2].decode('latin-1'))
+            message.method = parts[0].decode('ascii')
+            message.target = parts[1].decode('latin-1')
+        else:
+            self.active = False
+            return
+        self.message = message
+        self.state = HEADERS
+
+    def _headers_done(self, out):
+        message = self.message
+        if not message.is_request and (100 <= message.status < 200 or message.status in (204, 304)):
+            out.append(self._finish())
+            return
+        encoding = message.header('transfer-encoding')
+        longueur = message.header('content-length')
+        if encoding and 'chunked' in encoding.lower():
+            self.state = CHUNK_SIZE
+        elif longueur is not None:
+            # Décimal strict : int() accepterait "-5", "+5" ou "5_0" ; isdigit() seul, "²"
+            if not (longueur.isascii() and longueur.isdigit()):
+                self.active = False
+                return
+            self.remaining = int(longueur)
+            if self.remaining:
+                self.state = BODY
+            else:
+                out.append(self._finish())
+        elif not message.is_request:
+            self.state = UNTIL_CLOSE
+        else:
+            out.append(self._finish())
+
+    def _finish(self):
+        message = self.message
+        self.message = None
+        self.state = START
+        self.messages += 1
+        return message
@@ -1,9 +1,26 @@
 #!/usr/bin/env python3
+import argparse
+import io
 import socket
 import struct
-import textwrap
+import threading
+import time
 import os
 import sys
+from collections import Counter, deque
+from contextlib import redirect_stdout
+
+from bpf_filter import attach_filter, compile_filter, IP_PROTOCOLS, SNAPLEN_MAX
+from capture import open_capture, open_socket, sample_frames
+from dissectors import Dissection, REGISTRY
+from dns_decoder import decode_message, type_name, RCODES
+from flow_table import FlowTable
+from metrics import CaptureMetrics, start_server
+from hexdump import MAX_BYTES, format_payload
+from http_parser import HttpParser
+from pcap_io import PcapReader
+from tcp_reassembly import TcpReassembler
+import web_stream
 
 # --- Configuration & Colors ---
 class Colors:
@@ -18,74 +35,52 @@ class Colors:
     UNDERLINE = '\033[4m'
 
 # --- Packet Parser ---
+# Formats précompilés : struct.unpack('...') relirait sa chaîne de format à chaque appel
+ETH_HEADER  = struct.Struct('! 6s 6s H')
+IPV4_FIELDS = struct.Struct('! 8x B B 2x 4s 4s')
+ICMP_HEADER = struct.Struct('! B B H')
+TCP_HEADER  = struct.Struct('! H H L L H')
+UDP_HEADER  = struct.Struct('! H H 2x H')
+ARP_BODY    = struct.Struct('! H H B B H 6s 4s 6s 4s')
+
 class PacketParser:
+    def __init__(self, payload_bytes=MAX_BYTES):
+        self.payload_bytes = payload_bytes
+
     def get_mac_addr(self, bytes_addr):
         bytes_str = map('{:02x}'.format, bytes_addr)
         return ':'.join(bytes_str).upper()
 
     def unpack_dns(self, data):
-        # DNS Header: ID(2), Flags(2), Q(2), Ans(2), Auth(2), Add(2)
-        trans_id, flags, questions, answers = struct.unpack('! H H H H', data[:8])
-        qr = (flags >> 15) & 1 # 0=Query, 1=Response
-        opcode = (flags >> 11) & 0xF
-        rcode = flags & 0xF
-        
-        # Simple extraction of the first query domain name (if query)
-        domain = ""
-        try:
-            if questions > 0:
-                idx = 12
-                while idx < len(data):
-                    length = data[idx]
-                    if length == 0: break
-                    if length & 0xC0 == 0xC0: # Compression pointer
-                        break # Too complex for simple script
-                    idx += 1
-                    domain += data[idx:idx+length].decode('utf-8', errors='ignore') + "."
-                    idx += length
-        except:
-            domain = "<error parsing domain>"
-            
-        return trans_id, qr, opcode, rcode, domain, data[12:]
+        # DNS Header: ID(2), Flags(2), Q(2), Ans(2), Auth(2), Add(2) + 4 sections (dns_decoder.py)
+        message = decode_message(bytes(data))
+        domain = message.questions[0][0] if message.questions else ""
+        return message.id, message.qr, message.opcode, message.rcode, domain, message
 
     def format_payload(self, data, width=60):
-        # Determine if text or binary
-        try:
-            text = data.decode('utf-8')
-            if all(32 <= ord(c) <= 126 or c in '\\r\\n\\t' for c in text):
-                return textwrap.fill(text, width=width)
-        except:
-            pass
-        
-        # Binary/Mixed: Hexdump style
-        output = []
-        for i in range(0, len(data), 16):
-            chunk = data[i:i+16]
-            hex_part = ' '.join(f'{b:02X}' for b in chunk)
-            text_part = ''.join(chr(b) if 32 <= b <= 126 else '.' for b in chunk)
-            output.append(f"{i:04X}  {hex_part:<48}  {text_part}")
-        return '\\n'.join(output)
+        # Texte ou hexdump, décidé sur les premiers octets ; au plus payload_bytes mis en forme (hexdump.py)
+        return format_payload(data, width, self.payload_bytes)
 
     def unpack_ethernet(self, data):
-        dest_mac, src_mac, proto = struct.unpack('! 6s 6s H', data[:14])
+        dest_mac, src_mac, proto = ETH_HEADER.unpack_from(data)
         return self.get_mac_addr(dest_mac), self.get_mac_addr(src_mac), proto, data[14:]
 
     def unpack_ipv4(self, data):
         version_header_len = data[0]
         version = version_header_len >> 4
         header_len = (version_header_len & 15) * 4
-        ttl, proto, src, target = struct.unpack('! 8x B B 2x 4s 4s', data[:20])
+        ttl, proto, src, target = IPV4_FIELDS.unpack_from(data)
         return version, header_len, ttl, proto, self.ipv4(src), self.ipv4(target), data[header_len:]
 
     def ipv4(self, addr):
         return '.'.join(map(str, addr))
 
     def unpack_icmp(self, data):
-        icmp_type, code, checksum = struct.unpack('! B B H', data[:4])
+        icmp_type, code, checksum = ICMP_HEADER.unpack_from(data)
         return icmp_type, code, checksum, data[4:]
 
     def unpack_tcp(self, data):
-        (src_port, dest_port, sequence, acknowledgment, offset_reserved_flags) = struct.unpack('! H H L L H', data[:14])
+        (src_port, dest_port, sequence, acknowledgment, offset_reserved_flags) = TCP_HEADER.unpack_from(data)
         offset = (offset_reserved_flags >> 12) * 4
         flag_urg = (offset_reserved_flags & 32) >> 5
         flag_ack = (offset_reserved_flags & 16) >> 4
@@ -96,11 +91,11 @@ class PacketParser:
         return src_port, dest_port, sequence, acknowledgment, flag_urg, flag_ack, flag_psh, flag_rst, flag_syn, flag_fin, data[offset:]
 
     def unpack_udp(self, data):
-        src_port, dest_port, size = struct.unpack('! H H 2x H', data[:8])
+        src_port, dest_port, size = UDP_HEADER.unpack_from(data)
         return src_port, dest_port, size, data[8:]
 
     def unpack_arp(self, data):
-        hw_type, proto_type, hw_len, proto_len, opcode, src_mac, src_ip, dst_mac, dst_ip = struct.unpack('! H H B B H 6s 4s 6s 4s', data[:28])
+        hw_type, proto_type, hw_len, proto_len, opcode, src_mac, src_ip, dst_mac, dst_ip = ARP_BODY.unpack_from(data)
         return opcode, self.get_mac_addr(src_mac), self.ipv4(src_ip), self.get_mac_addr(dst_mac), self.ipv4(dst_ip)
 
 
@@ -139,15 +134,24 @@ class Visualizer:
             print(f"| Payload:\n{parser_ref.format_payload(data)}")
         print("+" + "-"*60 + "+")
 
-    def draw_dns(self, trans_id, qr, opcode, rcode, domain):
+    def draw_dns(self, trans_id, qr, opcode, rcode, domain, message=None):
         msg_type = "RESPONSE" if qr else "QUERY"
         print(f"{Colors.BOLD}--- DNS ({msg_type}) ---{Colors.ENDC}")
-        print(f"| ID: {trans_id} | Opcode: {opcode} | RCode: {rcode} |")
+        print(f"| ID: {trans_id} | Opcode: {opcode} | RCode: {RCODES.get(rcode, rcode)} |")
         if domain:
             print(f"| Domain: {Colors.CYAN}{domain}{Colors.ENDC} |")
+        if message is not None:
+            for name, qtype, _ in message.questions[1:]:
+                print(f"| Domain: {Colors.CYAN}{name}{Colors.ENDC} ({type_name(qtype)}) |")
+            for titre, section in (("Answer", message.answers), ("Authority", message.authority),
+                                   ("Additional", message.additional)):
+                for rr in section:
+                    print(f"| {titre}: {Colors.GREEN}{rr.describe()}{Colors.ENDC} |")
+            if message.truncated:
+                print(f"| {Colors.WARNING}Message tronqué{Colors.ENDC} |")
         print("+" + "-"*60 + "+")
 
-    def draw_tcp(self, src_port, dest_port, seq, ack, urg, ack_flag, psh, rst, syn, fin, data, parser_ref):
+    def draw_tcp(self, src_port, dest_port, seq, ack, urg, ack_flag, psh, rst, syn, fin, data, parser_ref, http=()):
         flags = []
         if urg: flags.append("URG")
         if ack_flag: flags.append("ACK")
@@ -159,12 +163,12 @@ class Visualizer:
         print(f"| {Colors.BLUE}PORT {src_port}{Colors.ENDC} --> {Colors.GREEN}PORT {dest_port}{Colors.ENDC} |")
         print(f"| SEQ: {seq} | ACK: {ack} | FLAGS: [{' '.join(flags)}] |")
         
-        # HTTP Detection
+        # HTTP : messages complets livrés par le réassembleur TCP (tcp_reassembly.py)
+        for message in http:
+            print(f"{Colors.BOLD}--- HTTP ---{Colors.ENDC}")
+            print(f"| {Colors.CYAN}{message.summary()}{Colors.ENDC} |")
+
         if len(data) > 0:
-            str_data = data[:10].decode('utf-8', errors='ignore')
-            if any(method in str_data for method in ['GET', 'POST', 'HTTP', 'PUT', 'DELETE']):
-                print(f"{Colors.BOLD}--- HTTP ---{Colors.ENDC}")
-            
             print(f"| Payload:\n{parser_ref.format_payload(data)}")
             
         print("+" + "-"*60 + "+")
@@ -175,89 +179,439 @@ class Visualizer:
         print(f"| Length: {size} |")
         print("+" + "-"*60 + "+")
 
+    def draw_truncated(self, last_layer):
+        print(f"| {Colors.WARNING}Trame tronquée (--snaplen) : décodée jusqu'à {last_layer}{Colors.ENDC} |")
+        print("+" + "-"*60 + "+")
+
+    def draw_flows(self, flows, table):
+        print(f"\n{Colors.BOLD}{Colors.HEADER}=== TOP {len(flows)} FLUX (actifs: {len(table)}) ==={Colors.ENDC}")
+        print(f"{Colors.BOLD}{'FLUX':<48} {'PAQUETS':>9} {'OCTETS':>12} {'DURÉE':>8}  HISTORIQUE{Colors.ENDC}")
+        for flow in flows:
+            print(f"{flow.describe():<48} {flow.packets:>9} {flow.bytes:>12} {flow.duration:>7.1f}s  {Colors.CYAN}{flow.history}{Colors.ENDC}")
+        print(f"| Évincés: {table.evicted_idle} inactifs, {table.evicted_lru} LRU (plafond {table.max_flows}) "
+              f"| Tronquées (sans ports): {table.truncated} |")
+        print("+" + "-"*60 + "+")
+
+    def draw_talkers(self, panels, talkers):
+        """Top N par IP source, port de destination et paire de MAC, avec l'intervalle [basse, haute]."""
+        print(f"\n{Colors.BOLD}{Colors.HEADER}=== TOP TALKERS (mémoire fixe : {talkers.nbytes / 1e6:.1f} Mo) ==={Colors.ENDC}")
+        for title, tracker, rows in panels:
+            total = tracker.total or 1
+            print(f"{Colors.BOLD}{title:<40} {'PAQUETS':>9} {'PART':>6}  INTERVALLE{Colors.ENDC}")
+            for label, estimate, low, high in rows:
+                print(f"{label:<40} {estimate:>9} {estimate / total:>6.1%}  {Colors.CYAN}[{low}, {high}]{Colors.ENDC}")
+            print(f"| Total: {tracker.total} | Hors top : ≤ {tracker.summary.error_bound():.0f} paquets | "
+                  f"Count-Min : +{tracker.sketch.error_bound():.0f} au plus (confiance {1 - tracker.sketch.delta:.0%}) |")
+        print("+" + "-"*60 + "+")
+
+# --- Packet Dissection ---
+def build_layers(raw_data, target_raw, parser, vis, streams=None, ts_ns=0, registry=REGISTRY):
+    """
+    Décode une trame et prépare son affichage : (kind, [(fonction_draw, args), ...]),
+    ou None si elle ne passe pas le filtre. Les charges utiles sont copiées en bytes :
+    l'enregistrement survit à la trame (qui peut être une memoryview de l'anneau).
+    `streams` (TcpReassembler) reconstruit les flux TCP pour y détecter les messages HTTP.
+    Chaque couche est confiée au dissecteur enregistré pour elle (dissectors.py).
+    """
+    return registry.dissect(raw_data, Dissection(target_raw, parser, vis, streams, ts_ns))
+
+def decode_with_parser(raw_data, target_ip, parser):
+    """
+    Classic decode path: PacketParser.unpack_* with tuple unpacking and string
+    comparison of addresses. Returns True if the frame passes the target filter.
+    """
+    dest_mac, src_mac, eth_proto, payload_data = parser.unpack_ethernet(raw_data)
+    if eth_proto == 0x0800:
+        version, header_len, ttl, proto, src, target, ip_payload = parser.unpack_ipv4(payload_data)
+        if target_ip is not None and target_ip != src and target_ip != target:
+            return False
+        if proto == 1:
+            parser.unpack_icmp(ip_payload)
+        elif proto == 6:
+            parser.unpack_tcp(ip_payload)
+        elif proto == 17:
+            src_port, dest_port, size, udp_data = parser.unpack_udp(ip_payload)
+            if src_port == 53 or dest_port == 53:
+                try:
+                    parser.unpack_dns(udp_data)
+                except:
+                    pass
+        return True
+    if eth_proto == 0x0806:
+        opcode, src_mac_arp, src_ip, dst_mac_arp, dst_ip = parser.unpack_arp(payload_data)
+        return target_ip is None or target_ip == src_ip or target_ip == dst_ip
+    return False
+
+# --- Offline Replay ---
+def involves_target(raw_data, target_raw):
+    """Même test que le filtre BPF du direct : IPv4 src/dst ou ARP émetteur/cible == la cible."""
+    ethertype = raw_data[12:14]
+    if ethertype == b'\x08\x00':
+        return raw_data[26:30] == target_raw or raw_data[30:34] == target_raw
+    if ethertype == b'\x08\x06':
+        return raw_data[28:32] == target_raw or raw_data[38:42] == target_raw
+    return False
+
+def replay(path, target_ip, parser, vis, bench=False, decoder='views', flows=None, top_n=10, streams=None,
+           talkers=None):
+    """
+    Rejoue un fichier pcap/pcapng : les trames sont des memoryviews du fichier projeté
+    en mémoire. Sans --bench, chaque paquet retenu est dessiné ; avec --bench, on ne
+    fait que décoder et on mesure le débit.
+    """
+    target_raw = socket.inet_aton(target_ip) if target_ip else None
+    frames = matched = total_bytes = 0
+    with PcapReader(path) as reader:
+        start = time.perf_counter()
+        for raw_data, ts_ns, interface in reader.records():
+            frames += 1
+            total_bytes += len(raw_data)
+            if flows is not None or talkers is not None:
+                # En direct, le filtre BPF a déjà écarté le reste : on fait de même ici
+                if target_raw is not None and not involves_target(raw_data, target_raw):
+                    continue
+                matched += 1
+                if talkers is not None:
+                    talkers.add_frame(raw_data)
+                if flows is not None:
+                    flows.add_frame(raw_data, ts_ns)
+                continue
+            if decoder == 'parser':
+                if decode_with_parser(raw_data, target_ip, parser):
+                    matched += 1
+                continue
+            record = build_layers(raw_data, target_raw, parser, vis, streams, ts_ns)
+            if record is None:
+                continue
+            matched += 1
+            if not bench:
+                for draw_func, draw_args in record[1]:
+                    draw_func(*draw_args)
+        elapsed = time.perf_counter() - start
+
+    if flows is not None:
+        vis.draw_flows(flows.top(top_n), flows)
+    if talkers is not None:
+        talkers.flush()
+        vis.draw_talkers(talkers.top(top_n), talkers)
+    rate = frames / elapsed if elapsed else 0.0
+    print(f"\n{Colors.BOLD}--- REPLAY {path} ({decoder}) ---{Colors.ENDC}")
+    print(f"| Trames: {frames} | Retenues: {matched} | Durée: {elapsed:.3f} s |")
+    print(f"| Débit: {rate:,.0f} trames/s | {total_bytes * 8 / elapsed / 1e6 if elapsed else 0:,.1f} Mbit/s "
+          f"| {elapsed / frames * 1e9 if frames else 0:,.0f} ns/trame |")
+
+# --- Display Pipeline ---
+class DisplayQueue:
+    """
+    Bounded ring buffer between the capture thread and the renderer.
+    When full, the oldest record is overwritten: capture never waits for the terminal.
+    """
+    def __init__(self, size):
+        self.records = deque(maxlen=size)
+        self.captured = 0     # trames reçues du noyau
+        self.pushed = 0       # trames passées par le filtre
+        self.overflowed = 0   # écrasées avant d'avoir été dessinées
+
+    def push(self, record):
+        if len(self.records) == self.records.maxlen:
+            self.overflowed += 1
+        self.records.append(record)
+        self.pushed += 1
+
+    def drain(self):
+        records = []
+        try:
+            for _ in range(len(self.records)):
+                records.append(self.records.popleft())
+        except IndexError:
+            pass # le producteur a écrasé un enregistrement entre-temps
+        return records
+
+class Renderer:
+    """
+    Draws queued packets at a fixed frame rate. Each frame draws at most `budget`
+    packets (the most recent ones) and coalesces the rest into a single summary line.
+    """
+    def __init__(self, queue, conn, fps=10, budget=20, flows=None, vis=None, flows_interval=2.0, top_n=10,
+                 metrics=None, sample=1, talkers=None):
+        self.queue = queue
+        self.conn = conn
+        self.interval = 1.0 / fps
+        self.budget = budget
+        self.flows = flows
+        self.talkers = talkers
+        self.vis = vis
+        self.flows_interval = flows_interval
+        self.top_n = top_n
+        self.metrics = metrics
+        self.sample = sample
+        self.drawn = 0
+        self.coalesced = 0
+        self.kernel_drops = 0
+        self._reported = (0, 0)
+
+    def dropped_for_display(self):
+        return self.coalesced + self.queue.overflowed
+
+    def render_frame(self):
+        records = self.queue.drain()
+        if not records:
+            return
+        skipped, shown = records[:-self.budget], records[-self.budget:]
+
+        # Un seul write() par image : les print() des draw_* vont dans un tampon
+        buf = io.StringIO()
+        with redirect_stdout(buf):
+            if skipped:
+                kinds = Counter(kind for kind, _ in skipped)
+                detail = ", ".join(f"{k}: {n}" for k, n in kinds.most_common())
+                print(f"\n{Colors.WARNING}... {len(skipped)} paquets non dessinés ({detail}){Colors.ENDC}")
+            for _, packet_layers in shown:
+                for draw_func, draw_args in packet_layers:
+                    draw_func(*draw_args)
+        sys.stdout.write(buf.getvalue())
+        sys.stdout.flush()
+
+        self.coalesced += len(skipped)
+        self.drawn += len(shown)
+
+    def status_line(self):
+        estimate = ""
+        if self.sample > 1:
+            estimate = f" (≈ {self.queue.captured * self.sample} réelles, 1/{self.sample})"
+        return (f"capturées: {self.queue.captured}{estimate} | filtrées: {self.queue.pushed} | "
+                f"dessinées: {self.drawn} | ignorées (affichage): {self.dropped_for_display()} | "
+                f"perdues (noyau): {self.kernel_drops}")
+
+    def report_drops(self):
+        """Lit PACKET_STATISTICS et signale toute nouvelle perte, en distinguant les deux causes."""
+        packets, kernel_drops = self.conn.stats()
+        self.kernel_drops += kernel_drops
+        if self.metrics is not None:
+            self.metrics.add_kernel_stats(packets, kernel_drops)
+            self.metrics.sample()
+        drops = (self.dropped_for_display(), self.kernel_drops)
+        if drops != self._reported:
+            self._reported = drops
+            print(f"{Colors.FAIL}[stats] {self.status_line()}{Colors.ENDC}")
+
+    def render_flows(self):
+        buf = io.StringIO()
+        with redirect_stdout(buf):
+            if self.flows is not None:
+                self.vis.draw_flows(self.flows.top(self.top_n), self.flows)
+            if self.talkers is not None:
+                # Les clés encore en attente (trafic faible, lot incomplet) sont versées d'abord
+                self.talkers.flush()
+                self.vis.draw_talkers(self.talkers.top(self.top_n), self.talkers)
+        sys.stdout.write(buf.getvalue())
+        sys.stdout.flush()
+
+    def run(self, stop):
+        next_report = time.monotonic() + 1.0
+        next_flows = time.monotonic() + self.flows_interval
+        while not stop.is_set():
+            start = time.monotonic()
+            self.render_frame()
+            if (self.flows is not None or self.talkers is not None) and start >= next_flows:
+                if self.flows is not None:
+                    self.flows.expire(time.time_ns())
+                self.render_flows()
+                next_flows = start + self.flows_interval
+            if start >= next_report:
+                self.report_drops()
+                next_report = start + 1.0
+            stop.wait(max(0.0, self.interval - (time.monotonic() - start)))
+        self.render_frame()
+
+def capture_loop(conn, queue, target_raw, parser, vis, stop, flows=None, streams=None, metrics=None,
+                 sample_every=1, web=None, talkers=None):
+    """
+    Capture thread: decode, filter and enqueue (or feed the flow table / top talkers). Never prints.
+    `web` (web_stream.StreamHub) receives a copy of each retained packet's headers.
+    """
+    frames = conn.frames(stop)
+    if sample_every > 1:
+        frames = sample_frames(frames, sample_every)
+    try:
+        for raw_data, addr, ts_ns, wire_len in frames:
+            queue.captured += 1
+            if metrics is not None:
+                metrics.observe(raw_data, wire_len)
+            if talkers is not None:
+                talkers.add_frame(raw_data)
+            if flows is not None:
+                flows.add_frame(raw_data, ts_ns, wire_len)
+            if flows is not None or talkers is not None:
+                continue
+            record = build_layers(raw_data, target_raw, parser, vis, streams, ts_ns)
+            if record is not None:
+                queue.push(record)
+                if web is not None:
+                    web.publish(ts_ns, record[0], raw_data)
+    finally:
+        stop.set()
+
 # --- Main Parsing Loop ---
+def parse_args():
+    ap = argparse.ArgumentParser(description="Visualiseur de paquets en direct")
+    ap.add_argument('target_ip', nargs='?', default=None,
+                    help="n'afficher que le trafic impliquant cette IP")
+    ap.add_argument('--proto', choices=sorted(IP_PROTOCOLS),
+                    help="ne garder qu'un protocole IP (filtré dans le noyau)")
+    ap.add_argument('--port', type=int,
+                    help="ne garder qu'un port TCP/UDP source ou destination (filtré dans le noyau)")
+    ap.add_argument('--ring', action='store_true',
+                    help="capturer via l'anneau mmap TPACKET_V3 au lieu de recvfrom")
+    ap.add_argument('--fps', type=float, default=10,
+                    help="images affichées par seconde (défaut : 10)")
+    ap.add_argument('--budget', type=int, default=20,
+                    help="paquets dessinés au maximum par image, les autres sont résumés (défaut : 20)")
+    ap.add_argument('--queue', type=int, default=4096,
+                    help="taille du tampon circulaire entre capture et affichage (défaut : 4096)")
+    ap.add_argument('--flows', type=int, metavar='N', default=0,
+                    help="au lieu de chaque paquet, afficher périodiquement les N plus gros flux")
+    ap.add_argument('--flows-interval', type=float, default=2.0,
+                    help="secondes entre deux tableaux de flux ou de top talkers (défaut : 2)")
+    ap.add_argument('--flow-memory', type=float, default=64,
+                    help="mémoire maximale de la table de flux en Mo (défaut : 64)")
+    ap.add_argument('--idle-timeout', type=float, default=60,
+                    help="secondes d'inactivité avant d'oublier un flux (défaut : 60)")
+    ap.add_argument('--talkers', type=int, metavar='N', default=0,
+                    help="au lieu de chaque paquet, afficher périodiquement les N plus grosses IP source, "
+                         "ports de destination et paires MAC (mémoire fixe, nécessite NumPy)")
+    ap.add_argument('--talkers-memory', type=float, default=16,
+                    help="mémoire des sketches de top talkers en Mo, les trois confondus (défaut : 16)")
+    ap.add_argument('--stream-memory', type=float, default=32,
+                    help="octets TCP en attente de réassemblage, tous flux confondus, en Mo (défaut : 32)")
+    ap.add_argument('--sample', type=int, default=1, metavar='N',
+                    help="ne capturer qu'une trame sur N (compteurs ré-extrapolés)")
+    ap.add_argument('--sample-mode', choices=('kernel', 'count'), default='kernel',
+                    help="kernel = tirage aléatoire dans le filtre BPF, count = exactement 1 sur N en Python")
+    ap.add_argument('--snaplen', type=int, default=SNAPLEN_MAX,
+                    help="octets copiés par trame : le noyau tronque, rien au-delà n'est décodé")
+    ap.add_argument('--metrics-port', type=int, metavar='PORT',
+                    help="exposer les métriques de capture (format Prometheus) sur http://127.0.0.1:PORT/metrics")
+    ap.add_argument('--payload-bytes', type=int, default=MAX_BYTES,
+                    help=f"octets de charge utile affichés par paquet, la suite est résumée (défaut : {MAX_BYTES})")
+    ap.add_argument('--web-port', type=int, metavar='PORT',
+                    help="diffuser les paquets vers visualiseur_v2.html sur http://127.0.0.1:PORT/ (SSE)")
+    ap.add_argument('--web-budget', type=int, default=200,
+                    help="lignes envoyées au navigateur par lot de 100 ms, les autres sont résumées (défaut : 200)")
+    ap.add_argument('--web-origin', metavar='ORIGINE',
+                    help="autre origine autorisée à lire le flux (ex: null pour la page ouverte en file://)")
+    ap.add_argument('--read', metavar='FICHIER',
+                    help="rejouer un fichier pcap/pcapng au lieu de capturer (pas besoin de root)")
+    ap.add_argument('--bench', action='store_true',
+                    help="avec --read : décoder sans dessiner et mesurer le débit")
+    ap.add_argument('--decoder', choices=('views', 'parser'), default='views',
+                    help="avec --read --bench : vues paresseuses ou PacketParser.unpack_*")
+    args = ap.parse_args()
+    if args.budget < 1:
+        ap.error("--budget doit valoir au moins 1 (paquets dessinés par image)")
+    if args.sample < 1:
+        ap.error("--sample doit valoir au moins 1 (1 = toutes les trames)")
+    if args.talkers < 0:
+        ap.error("--talkers doit être positif (0 = désactivé)")
+    if args.talkers_memory <= 0:
+        ap.error("--talkers-memory doit être strictement positif (Mo)")
+    return args
+
+def open_streams(args):
+    """Réassembleur TCP alimentant un HttpParser par sens de connexion."""
+    return TcpReassembler(HttpParser, max_buffered=int(args.stream_memory * 1_000_000))
+
+def open_talkers(args):
+    """Top talkers en mémoire fixe ; heavy_hitters (et donc NumPy) n'est importé que si demandé."""
+    if not args.talkers:
+        return None
+    from heavy_hitters import TopTalkers
+    return TopTalkers.from_memory(args.talkers_memory, k=max(100, args.talkers * 10))
+
 def main():
+    args = parse_args()
+    if args.read:
+        flows = FlowTable.from_memory(args.flow_memory, args.idle_timeout) if args.flows else None
+        replay(args.read, args.target_ip, PacketParser(args.payload_bytes), Visualizer(),
+               bench=args.bench, decoder=args.decoder, flows=flows, top_n=args.flows or args.talkers,
+               streams=open_streams(args), talkers=open_talkers(args))
+        return
+
     if os.geteuid() != 0:
         print(f"{Colors.FAIL}ERREUR: Ce script doit être lancé en ROOT (sudo) pour capturer les paquets.{Colors.ENDC}")
-        print("Usage: sudo python3 live_packet_visualizer.py [TARGET_IP]")
+        print("Usage: sudo python3 live_packet_visualizer.py [TARGET_IP] [--proto P] [--port N] [--ring] [--fps F]")
+        print("       python3 live_packet_visualizer.py [TARGET_IP] --read capture.pcapng [--bench]")
         sys.exit(1)
 
-    target_ip = None
-    if len(sys.argv) > 1:
-        target_ip = sys.argv[1]
+    target_ip = args.target_ip
+    target_raw = None
+    if target_ip:
+        target_raw = socket.inet_aton(target_ip)
         print(f"{Colors.GREEN}FILTRE ACTIVÉ : Affichage uniquement du trafic impliquant {target_ip}{Colors.ENDC}")
 
-    parser = PacketParser()
+    parser = PacketParser(args.payload_bytes)
     vis = Visualizer()
     
-    # Création du socket RAW
-    # ntohs(0x0003) capture tout le trafic Ethernet (ETH_P_ALL)
-    conn = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.ntohs(0x0003))
+    # Création du socket RAW (ETH_P_ALL : tout le trafic Ethernet)
+    # Le filtre BPF est attaché avant l'anneau : le trafic non désiré reste dans le noyau
+    sock = open_socket()
+    # --sample / --snaplen : tirage au sort et troncature aussi appliqués dans le noyau
+    kernel_sample = args.sample if args.sample_mode == 'kernel' else 1
+    # --web-port : le flux envoyé au navigateur n'est pas recapturé (boucle sur lo)
+    attach_filter(sock, compile_filter(target_ip, args.proto, args.port, args.snaplen, kernel_sample,
+                                       exclude_port=args.web_port))
+
+    # --ring : les trames arrivent en memoryview depuis l'anneau partagé avec le noyau
+    conn = open_capture('ring' if args.ring else 'recvfrom', sock=sock)
+    conn.stats() # remise à zéro des compteurs noyau
 
     print(f"{Colors.GREEN}Capture en cours... Appuyez sur Ctrl+C pour arrêter.{Colors.ENDC}")
     print(f"{Colors.CYAN}ASTUCE : Si vous ne voyez pas le trafic externe, activez le 'Mirrored Mode' via wsl_ip_manager.py{Colors.ENDC}")
-    
-    try:
-        while True:
-            raw_data, addr = conn.recvfrom(65536)
-            dest_mac, src_mac, eth_proto, payload_data = parser.unpack_ethernet(raw_data)
-            
-            should_show = False
-            
-            # Stockage temporaire pour affichage différé (si match)
-            packet_layers = [] # Liste de tuples (fonction_draw, args)
-
-            # 0x0800 = IPv4
-            if eth_proto == 0x0800:
-                version, header_len, ttl, proto, src, target, ip_payload = parser.unpack_ipv4(payload_data)
-                
-                # Filtrage IPv4
-                if target_ip is None or target_ip == src or target_ip == target:
-                    should_show = True
-                    packet_layers.append((vis.draw_ethernet, (dest_mac, src_mac, eth_proto)))
-                    packet_layers.append((vis.draw_ipv4, (version, header_len, ttl, proto, src, target)))
-
-                    # ICMP
-                    if proto == 1:
-                        icmp_type, code, checksum, icmp_data = parser.unpack_icmp(ip_payload)
-                        packet_layers.append((vis.draw_icmp, (icmp_type, code, checksum, icmp_data, parser)))
-                    
-                    # TCP
-                    elif proto == 6:
-                        src_port, dest_port, seq, ack, urg, ack_flag, psh, rst, syn, fin, tcp_data = parser.unpack_tcp(ip_payload)
-                        packet_layers.append((vis.draw_tcp, (src_port, dest_port, seq, ack, urg, ack_flag, psh, rst, syn, fin, tcp_data, parser)))
-
-                    # UDP
-                    elif proto == 17:
-                        src_port, dest_port, size, udp_data = parser.unpack_udp(ip_payload)
-                        packet_layers.append((vis.draw_udp, (src_port, dest_port, size, udp_data, parser)))
-                        
-                        # DNS Detection (Port 53)
-                        if src_port == 53 or dest_port == 53:
-                            try:
-                                trans_id, qr, opcode, rcode, domain, dns_payload = parser.unpack_dns(udp_data)
-                                packet_layers.append((vis.draw_dns, (trans_id, qr, opcode, rcode, domain)))
-                            except:
-                                pass # Not DNS or parse error
-            
-            # 0x0806 = ARP
-            elif eth_proto == 0x0806:
-                opcode, src_mac_arp, src_ip, dst_mac_arp, dst_ip = parser.unpack_arp(payload_data)
-                
-                # Filtrage ARP
-                if target_ip is None or target_ip == src_ip or target_ip == dst_ip:
-                    should_show = True
-                    packet_layers.append((vis.draw_ethernet, (dest_mac, src_mac, eth_proto)))
-                    packet_layers.append((vis.draw_arp, (opcode, src_mac_arp, src_ip, dst_mac_arp, dst_ip)))
-
-            # Affichage si le paquet passe le filtre
-            if should_show and packet_layers:
-                for draw_func, args in packet_layers:
-                    draw_func(*args)
 
+    # La capture tourne dans son propre thread ; un terminal lent ne ralentit que l'affichage
+    queue = DisplayQueue(args.queue)
+    flows = FlowTable.from_memory(args.flow_memory, args.idle_timeout) if args.flows else None
+    talkers = open_talkers(args)
+    # PACKET_STATISTICS se remet à zéro à chaque lecture : seul le Renderer la lit, et la partage
+    metrics = None
+    if args.metrics_port:
+        metrics = CaptureMetrics(scale=args.sample)
+        start_server(metrics, args.metrics_port)
+        print(f"{Colors.CYAN}Métriques Prometheus : http://127.0.0.1:{args.metrics_port}/metrics{Colors.ENDC}")
+    renderer = Renderer(queue, conn, fps=args.fps, budget=args.budget,
+                        flows=flows, vis=vis, flows_interval=args.flows_interval,
+                        top_n=args.flows or args.talkers, metrics=metrics, sample=args.sample, talkers=talkers)
+    # Le navigateur a sa propre file : un onglet lent est résumé, la capture n'attend pas
+    web = None
+    if args.web_port:
+        web = web_stream.StreamHub(budget=args.web_budget, status=lambda: {
+            'captured': queue.captured, 'filtered': queue.pushed,
+            'kernel_drops': renderer.kernel_drops, 'sample': args.sample})
+        web_server = web_stream.start_server(web, args.web_port, origin=args.web_origin)
+        print(f"{Colors.CYAN}Visualiseur web : http://127.0.0.1:{args.web_port}/{Colors.ENDC}")
+    stop = threading.Event()
+    capture_thread = threading.Thread(target=capture_loop,
+                                      args=(conn, queue, target_raw, parser, vis, stop, flows,
+                                            open_streams(args), metrics,
+                                            args.sample if args.sample_mode == 'count' else 1, web, talkers),
+                                      daemon=True)
+    capture_thread.start()
+
+    try:
+        renderer.run(stop)
     except KeyboardInterrupt:
+        stop.set()
+        capture_thread.join()
+        renderer.kernel_drops += conn.stats()[1]
         print(f"\n{Colors.WARNING}Arrêt de la capture.{Colors.ENDC}")
+        print(renderer.status_line())
         sys.exit(0)
+    finally:
+        capture_thread.join()
+        if web is not None:
+            web.close()
+            web_server.shutdown()
+        conn.close()
 
 if __name__ == "__main__":
     main()
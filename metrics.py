@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ METRICS : santé et débit d'une capture, exposés au format texte Prometheus
+------------------------------------------------------------------------------------------------
+ Un sniffer qui "ne voit rien" peut aussi être un sniffer qui PERD tout : quand le
+ programme ne lit pas assez vite, le noyau jette les trames et personne ne le dit.
+ CaptureMetrics rassemble ce qu'il faut pour le savoir :
+
+   - compteurs côté programme : trames, octets, par EtherType, par protocole IP ;
+   - compteurs côté noyau : PACKET_STATISTICS (vues / perdues), lus périodiquement —
+     la lecture remet le compteur noyau à zéro, on accumule donc les deltas ;
+   - débits glissants (trames/s, bits/s) sur une fenêtre de quelques secondes.
+
+ Le tout est servi sur http://127.0.0.1:PORT/metrics :
+
+   capture_frames_total 18234
+   capture_kernel_drops_total 0
+   capture_ethertype_frames_total{ethertype="0x0800",name="IPv4"} 18001
+   capture_frames_per_second 1520.4
+
+ Avec un échantillonnage 1 sur N (scale=N), les compteurs restent ceux de l'échantillon ;
+ les estimations du trafic réel (capture_estimated_*) et les débits sont multipliés par N.
+
+ Un seul thread (la capture) appelle observe() ; les autres ne font que lire.
+------------------------------------------------------------------------------------------------
+"""
+
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ETHERTYPE_NAMES = {0x0800: "IPv4", 0x0806: "ARP", 0x86DD: "IPv6", 0x8100: "802.1Q", 0x88CC: "LLDP"}
+IP_PROTOCOL_NAMES = {1: "ICMP", 2: "IGMP", 6: "TCP", 17: "UDP", 47: "GRE", 50: "ESP", 89: "OSPF", 132: "SCTP"}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class CaptureMetrics:
+
+    def __init__(self, window=10.0, scale=1):
+        self.window = window
+        self.scale = scale
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self._reset()
+        self.history = deque()      # (instant, trames, octets) pour les débits glissants
+
+    def _reset(self):
+        self.frames = 0
+        self.bytes = 0
+        self.ethertypes = {}
+        self.ip_protocols = {}
+        self.kernel_packets = 0
+        self.kernel_drops = 0
+
+    def observe(self, frame, length=None):
+        """
+        Compte une trame Ethernet (bytes ou memoryview) : deux lectures d'octets au plus.
+        `length` : taille sur le fil, quand la trame capturée a été tronquée.
+        """
+        n = len(frame)
+        self.frames += 1
+        self.bytes += n if length is None else length
+        if n < 14:
+            return
+        ethertype = (frame[12] << 8) | frame[13]
+        self.ethertypes[ethertype] = self.ethertypes.get(ethertype, 0) + 1
+        if ethertype == 0x0800 and n >= 24:
+            proto = frame[23]
+            self.ip_protocols[proto] = self.ip_protocols.get(proto, 0) + 1
+
+    def add_kernel_stats(self, packets, drops):
+        """Ajoute un relevé PACKET_STATISTICS (déjà un delta : la lecture remet à zéro)."""
+        self.kernel_packets += packets
+        self.kernel_drops += drops
+
+    # --- Agrégation multi-processus (workers PACKET_FANOUT) ---
+
+    def take_delta(self):
+        """Rend les compteurs accumulés depuis l'appel précédent, puis les remet à zéro."""
+        delta = {
+            'frames': self.frames, 'bytes': self.bytes,
+            'ethertypes': self.ethertypes, 'ip_protocols': self.ip_protocols,
+            'kernel_packets': self.kernel_packets, 'kernel_drops': self.kernel_drops,
+        }
+        self._reset()
+        return delta
+
+    def merge(self, delta):
+        self.frames += delta['frames']
+        self.bytes += delta['bytes']
+        self.kernel_packets += delta['kernel_packets']
+        self.kernel_drops += delta['kernel_drops']
+        for cible, source in ((self.ethertypes, delta['ethertypes']),
+                              (self.ip_protocols, delta['ip_protocols'])):
+            for cle, n in source.items():
+                cible[cle] = cible.get(cle, 0) + n
+
+    # --- Débits ---
+
+    def sample(self, now=None):
+        """Mémorise un point (instant, trames, octets) ; appelé environ une fois par seconde."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.history.append((now, self.frames, self.bytes))
+            while len(self.history) > 2 and now - self.history[0][0] > self.window:
+                self.history.popleft()
+
+    def rates(self):
+        """(trames/s, bits/s) du trafic réel estimé, sur la fenêtre glissante."""
+        with self.lock:
+            if len(self.history) < 2:
+                return 0.0, 0.0
+            (t0, f0, b0), (t1, f1, b1) = self.history[0], self.history[-1]
+        dt = t1 - t0
+        if dt <= 0:
+            return 0.0, 0.0
+        return (f1 - f0) * self.scale / dt, (b1 - b0) * 8 * self.scale / dt
+
+    def drop_ratio(self):
+        return self.kernel_drops / self.kernel_packets if self.kernel_packets else 0.0
+
+    # --- Exposition ---
+
+    def render(self):
+        """Texte au format d'exposition Prometheus (version 0.0.4)."""
+        pps, bps = self.rates()
+        lignes = []
+
+        def metrique(nom, genre, aide, valeurs):
+            lignes.append(f"# HELP {nom} {aide}")
+            lignes.append(f"# TYPE {nom} {genre}")
+            for etiquettes, valeur in valeurs:
+                lignes.append(f"{nom}{etiquettes} {valeur}")
+
+        metrique('capture_frames_total', 'counter', "Trames lues par le programme.", [('', self.frames)])
+        metrique('capture_bytes_total', 'counter', "Octets vus par le programme (taille sur le fil, même si --snaplen tronque).", [('', self.bytes)])
+        metrique('capture_sample_rate', 'gauge', "Une trame sur N est capturée (1 = tout).",
+                 [('', self.scale)])
+        metrique('capture_estimated_frames_total', 'counter', "Trames réelles estimées (trames x N).",
+                 [('', self.frames * self.scale)])
+        metrique('capture_estimated_bytes_total', 'counter', "Octets réels estimés (octets x N).",
+                 [('', self.bytes * self.scale)])
+        metrique('capture_kernel_packets_total', 'counter',
+                 "Trames vues par le socket (PACKET_STATISTICS tp_packets).", [('', self.kernel_packets)])
+        metrique('capture_kernel_drops_total', 'counter',
+                 "Trames perdues par le noyau, faute de place (tp_drops).", [('', self.kernel_drops)])
+        metrique('capture_kernel_drop_ratio', 'gauge',
+                 "Part des trames perdues par le noyau depuis le démarrage.", [('', f"{self.drop_ratio():.6f}")])
+        metrique('capture_frames_per_second', 'gauge',
+                 f"Débit en trames/s sur {self.window:g} s.", [('', f"{pps:.1f}")])
+        metrique('capture_bits_per_second', 'gauge',
+                 f"Débit en bits/s sur {self.window:g} s.", [('', f"{bps:.1f}")])
+        metrique('capture_ethertype_frames_total', 'counter', "Trames par EtherType.", [
+            (f'{{ethertype="0x{cle:04x}",name="{ETHERTYPE_NAMES.get(cle, "autre")}"}}', n)
+            for cle, n in sorted(dict(self.ethertypes).items())
+        ])
+        metrique('capture_ip_protocol_frames_total', 'counter', "Paquets IPv4 par protocole.", [
+            (f'{{proto="{cle}",name="{IP_PROTOCOL_NAMES.get(cle, "autre")}"}}', n)
+            for cle, n in sorted(dict(self.ip_protocols).items())
+        ])
+        metrique('capture_start_time_seconds', 'gauge', "Démarrage de la capture (epoch).",
+                 [('', f"{self.started:.3f}")])
+        return "\n".join(lignes) + "\n"
+
+
+class MetricsPoller(threading.Thread):
+    """
+    Toutes les `interval` secondes : relève PACKET_STATISTICS via `stats` (par exemple
+    capture.stats, qui rend (paquets, pertes)) puis échantillonne les débits.
+    """
+
+    def __init__(self, metrics, stats=None, interval=1.0):
+        super().__init__(daemon=True)
+        self.metrics = metrics
+        self.stats = stats
+        self.interval = interval
+        self.stop = threading.Event()
+
+    def run(self):
+        while not self.stop.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        if self.stats is not None:
+            try:
+                self.metrics.add_kernel_stats(*self.stats())
+            except OSError:
+                return   # socket fermé pendant l'arrêt
+        self.metrics.sample()
+
+
+def start_server(metrics, port, host='127.0.0.1'):
+    """Sert metrics.render() sur http://host:port/metrics dans un thread de fond."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            corps = metrics.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(corps)))
+            self.end_headers()
+            self.wfile.write(corps)
+
+        def log_message(self, format, *args):
+            pass   # pas de journal d'accès au milieu de l'affichage des trames
+
+    serveur = ThreadingHTTPServer((host, port), Handler)
+    serveur.daemon_threads = True
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return serveur
@@ -19,6 +19,8 @@ import sys
 import os
 import webbrowser
 
+from hexdump import preview
+
 # --- Configuration & Utilitaires ---
 
 # Couleurs pour rendre ça plus joli (si le terminal le supporte)
@@ -116,7 +118,9 @@ def draw_ipv4(src_ip, dst_ip, proto, length, identification, payload_desc="...")
     print("+" + "-"*60 + "+")
 
 def draw_icmp(itype, code, checksum, data):
-    """Dessine un en-tête ICMP."""
+    """Dessine un en-tête ICMP. `data` : texte déjà mis en forme, ou les octets de la charge utile."""
+    if not isinstance(data, str):
+        data = preview(data, 23)   # colonne ASCII calculée par bytes.translate (hexdump.py)
     type_desc = {8: "ECHO REQUEST (Ping)", 0: "ECHO REPLY (Pong)", 3: "DEST UNREACHABLE"}.get(itype, "Autre")
     
     print(f"{Colors.BOLD}--- MESSAGE ICMP ---{Colors.ENDC}")
@@ -197,11 +201,11 @@ def explain_icmp():
     
     print()
     slow_print(f"{Colors.BOLD}Exemple : PING (Echo Request){Colors.ENDC}")
-    draw_icmp(8, 0, "0x4D2E", "abcdefghijklmnopqrstuvw...")
+    draw_icmp(8, 0, "0x4D2E", b"abcdefghijklmnopqrstuvwabcdefghi")
     
     print()
     slow_print(f"{Colors.BOLD}Exemple : PONG (Echo Reply){Colors.ENDC}")
-    draw_icmp(0, 0, "0x55EE", "abcdefghijklmnopqrstuvw...")
+    draw_icmp(0, 0, "0x55EE", b"abcdefghijklmnopqrstuvwabcdefghi")
     
     print("\nNote : ICMP est encapsulé DANS IP. Donc un Ping c'est :")
     print("[ Ethernet [ IPv4 [ ICMP [ Données ] ] ] ]")
@@ -561,7 +565,7 @@ def simulation_ping():
     clear_screen()
     print_header("1. La couche Application demande un PING")
     slow_print("Alice crée un message ICMP Echo Request.")
-    draw_icmp(8, 0, "0x1234", "Hello Bob!")
+    draw_icmp(8, 0, "0x1234", b"Hello Bob!")
     print("\nCe message est passé à la couche IP.")
     pause()
     
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ PACKET VIEWS : vues paresseuses, sans copie, sur les couches d'une trame
+------------------------------------------------------------------------------------------------
+ PacketParser.unpack_* décode tous les champs d'un coup et recopie la charge utile
+ (data[header_len:]) à chaque couche. Ici, chaque couche est une petite vue (__slots__)
+ posée sur une memoryview de la trame :
+
+   - un champ n'est décodé que lorsqu'on le lit, via des struct.Struct précompilés ;
+   - la charge utile est une sous-memoryview : aucune copie d'une couche à l'autre ;
+   - les adresses existent sous deux formes : brute (`src_raw`, comparable à des bytes)
+     et texte (`src`, formatée seulement si on la demande).
+
+ Une trame rejetée par le filtre ne paie donc ni formatage de MAC ni copie de charge utile.
+
+   eth = EthernetView(trame)
+   if eth.ethertype == ETH_P_IP:
+       ip = eth.ipv4()
+       if ip.dst_raw == socket.inet_aton('10.0.0.5'):
+           tcp = ip.tcp()
+           print(ip.src, tcp.dst_port, bytes(tcp.payload[:16]))
+------------------------------------------------------------------------------------------------
+"""
+
+import socket
+import struct
+
+ETH_P_IP  = 0x0800
+ETH_P_ARP = 0x0806
+
+IPPROTO_ICMP = 1
+IPPROTO_TCP  = 6
+IPPROTO_UDP  = 17
+
+U8  = struct.Struct('!B')
+U16 = struct.Struct('!H')
+U32 = struct.Struct('!I')
+TCP_PORTS_SEQ_ACK = struct.Struct('!HHII')
+UDP_HEADER  = struct.Struct('!HHHH')
+ICMP_HEADER = struct.Struct('!BBH')
+
+
+def format_mac(raw):
+    return raw.hex(':').upper()
+
+
+def format_ipv4(raw):
+    return socket.inet_ntoa(raw)
+
+
+class EthernetView:
+    """[6] MAC dest  [6] MAC source  [2] EtherType  [N] données"""
+    __slots__ = ('buf',)
+
+    HEADER_LEN = 14
+
+    def __init__(self, buf):
+        self.buf = memoryview(buf)
+
+    @property
+    def ethertype(self):
+        return U16.unpack_from(self.buf, 12)[0]
+
+    @property
+    def dst_raw(self):
+        return self.buf[0:6]
+
+    @property
+    def src_raw(self):
+        return self.buf[6:12]
+
+    @property
+    def dst_mac(self):
+        return format_mac(self.buf[0:6])
+
+    @property
+    def src_mac(self):
+        return format_mac(self.buf[6:12])
+
+    @property
+    def payload(self):
+        return self.buf[14:]
+
+    def ipv4(self):
+        return IPv4View(self.buf[14:])
+
+    def arp(self):
+        return ARPView(self.buf[14:])
+
+
+class IPv4View:
+    """En-tête IPv4 : IHL variable, adresses aux octets 12-15 et 16-19."""
+    __slots__ = ('buf',)
+
+    def __init__(self, buf):
+        self.buf = memoryview(buf)
+
+    @property
+    def version(self):
+        return self.buf[0] >> 4
+
+    @property
+    def header_len(self):
+        return (self.buf[0] & 0x0F) * 4
+
+    @property
+    def total_length(self):
+        return U16.unpack_from(self.buf, 2)[0]
+
+    @property
+    def identification(self):
+        return U16.unpack_from(self.buf, 4)[0]
+
+    @property
+    def fragment_offset(self):
+        return U16.unpack_from(self.buf, 6)[0] & 0x1FFF
+
+    @property
+    def ttl(self):
+        return self.buf[8]
+
+    @property
+    def proto(self):
+        return self.buf[9]
+
+    @property
+    def checksum(self):
+        return U16.unpack_from(self.buf, 10)[0]
+
+    @property
+    def src_raw(self):
+        return self.buf[12:16]
+
+    @property
+    def dst_raw(self):
+        return self.buf[16:20]
+
+    @property
+    def src_int(self):
+        return U32.unpack_from(self.buf, 12)[0]
+
+    @property
+    def dst_int(self):
+        return U32.unpack_from(self.buf, 16)[0]
+
+    @property
+    def src(self):
+        return format_ipv4(self.buf[12:16])
+
+    @property
+    def dst(self):
+        return format_ipv4(self.buf[16:20])
+
+    @property
+    def payload(self):
+        # total_length borne la charge utile : le bourrage Ethernet des petites trames est exclu
+        fin = self.total_length
+        if not self.header_len <= fin <= len(self.buf):
+            fin = len(self.buf)
+        return self.buf[self.header_len:fin]
+
+    def tcp(self):
+        return TCPView(self.payload)
+
+    def udp(self):
+        return UDPView(self.payload)
+
+    def icmp(self):
+        return ICMPView(self.payload)
+
+
+class TCPView:
+    """[2] port src [2] port dst [4] seq [4] ack [2] offset+flags [2] fenêtre ..."""
+    __slots__ = ('buf',)
+
+    FIN, SYN, RST, PSH, ACK, URG = 0x01, 0x02, 0x04, 0x08, 0x10, 0x20
+
+    def __init__(self, buf):
+        self.buf = memoryview(buf)
+
+    @property
+    def src_port(self):
+        return U16.unpack_from(self.buf, 0)[0]
+
+    @property
+    def dst_port(self):
+        return U16.unpack_from(self.buf, 2)[0]
+
+    @property
+    def seq(self):
+        return U32.unpack_from(self.buf, 4)[0]
+
+    @property
+    def ack(self):
+        return U32.unpack_from(self.buf, 8)[0]
+
+    def ports_seq_ack(self):
+        """Les 4 premiers champs en un seul unpack : (src_port, dst_port, seq, ack)."""
+        return TCP_PORTS_SEQ_ACK.unpack_from(self.buf, 0)
+
+    @property
+    def header_len(self):
+        return (self.buf[12] >> 4) * 4
+
+    @property
+    def flags(self):
+        return self.buf[13] & 0x3F
+
+    def flag_bits(self):
+        """(urg, ack, psh, rst, syn, fin), dans l'ordre de PacketParser.unpack_tcp."""
+        f = self.buf[13]
+        return (f >> 5) & 1, (f >> 4) & 1, (f >> 3) & 1, (f >> 2) & 1, (f >> 1) & 1, f & 1
+
+    @property
+    def window(self):
+        return U16.unpack_from(self.buf, 14)[0]
+
+    @property
+    def payload(self):
+        return self.buf[self.header_len:]
+
+
+class UDPView:
+    """[2] port src [2] port dst [2] longueur [2] checksum"""
+    __slots__ = ('buf',)
+
+    def __init__(self, buf):
+        self.buf = memoryview(buf)
+
+    @property
+    def src_port(self):
+        return U16.unpack_from(self.buf, 0)[0]
+
+    @property
+    def dst_port(self):
+        return U16.unpack_from(self.buf, 2)[0]
+
+    @property
+    def length(self):
+        return U16.unpack_from(self.buf, 4)[0]
+
+    @property
+    def checksum(self):
+        return U16.unpack_from(self.buf, 6)[0]
+
+    def header(self):
+        """Les 4 champs en un seul unpack : (src_port, dst_port, length, checksum)."""
+        return UDP_HEADER.unpack_from(self.buf, 0)
+
+    @property
+    def payload(self):
+        return self.buf[8:]
+
+
+class ICMPView:
+    """[1] type [1] code [2] checksum [N] données"""
+    __slots__ = ('buf',)
+
+    def __init__(self, buf):
+        self.buf = memoryview(buf)
+
+    @property
+    def type(self):
+        return self.buf[0]
+
+    @property
+    def code(self):
+        return self.buf[1]
+
+    @property
+    def checksum(self):
+        return U16.unpack_from(self.buf, 2)[0]
+
+    def header(self):
+        return ICMP_HEADER.unpack_from(self.buf, 0)
+
+    @property
+    def payload(self):
+        return self.buf[4:]
+
+
+class ARPView:
+    """ARP Ethernet/IPv4 : [8] en-tête, [6] MAC émetteur, [4] IP émetteur, [6] MAC cible, [4] IP cible"""
+    __slots__ = ('buf',)
+
+    def __init__(self, buf):
+        self.buf = memoryview(buf)
+
+    @property
+    def opcode(self):
+        return U16.unpack_from(self.buf, 6)[0]
+
+    @property
+    def sender_mac_raw(self):
+        return self.buf[8:14]
+
+    @property
+    def sender_ip_raw(self):
+        return self.buf[14:18]
+
+    @property
+    def target_mac_raw(self):
+        return self.buf[18:24]
+
+    @property
+    def target_ip_raw(self):
+        return self.buf[24:28]
+
+    @property
+    def sender_mac(self):
+        return format_mac(self.buf[8:14])
+
+    @property
+    def sender_ip(self):
+        return format_ipv4(self.buf[14:18])
+
+    @property
+    def target_mac(self):
+        return format_mac(self.buf[18:24])
+
+    @property
+    def target_ip(self):
+        return format_ipv4(self.buf[24:28])
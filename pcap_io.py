@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ PCAP I/O : enregistrement des trames capturées au format pcap / pcapng (lisible par Wireshark)
+------------------------------------------------------------------------------------------------
+ pcap (classique, variante nanosecondes) :
+   En-tête global (24 octets) : magic 0xA1B23C4D, version 2.4, snaplen, linktype 1 (Ethernet)
+   Chaque trame : [4] secondes [4] nanosecondes [4] longueur capturée [4] longueur réelle + données
+
+ pcapng (format par blocs, type + longueur au début ET à la fin de chaque bloc) :
+   SHB (Section Header)        0x0A0D0D0A  — début de fichier, magic d'ordre 0x1A2B3C4D
+   IDB (Interface Description) 0x00000001  — une par interface, option if_tsresol = 9 (ns)
+   EPB (Enhanced Packet)       0x00000006  — une par trame : interface, horodatage 64 bits,
+                                             longueurs, données alignées sur 4 octets
+
+ PcapReader relit ces fichiers (et ceux de tcpdump/Wireshark) par mmap, trame par trame.
+
+ PcapWriter n'écrit jamais depuis la boucle de réception : write() copie la trame (tronquée
+ au snaplen) dans une file, un thread dédié la vide vers un fichier à gros tampon et fait
+ la rotation par taille ou par durée. Si le disque ne suit pas, les trames en trop sont
+ comptées comme perdues plutôt que de bloquer la capture.
+------------------------------------------------------------------------------------------------
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import deque
+
+LINKTYPE_ETHERNET = 1
+SNAPLEN_MAX = 262144
+
+# --- pcap classique (horodatage en nanosecondes) ---
+PCAP_MAGIC_NS = 0xA1B23C4D
+PCAP_MAGIC_US = 0xA1B2C3D4
+PCAP_GLOBAL_HEADER = struct.Struct('=IHHiIII')
+PCAP_RECORD_HEADER = struct.Struct('=IIII')
+
+# --- pcapng ---
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_IDB = 0x00000001
+PCAPNG_EPB = 0x00000006
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_BLOCK_HEADER = struct.Struct('=II')
+PCAPNG_EPB_HEADER = struct.Struct('=IIIIIII')   # type, longueur, interface, ts haut, ts bas, capturé, réel
+PCAPNG_TRAILER = struct.Struct('=I')
+OPT_ENDOFOPT = 0
+OPT_IF_NAME = 2
+OPT_IF_TSRESOL = 9
+
+
+def _pad4(n):
+    return (4 - n % 4) % 4
+
+
+def _option(code, valeur):
+    return struct.pack('=HH', code, len(valeur)) + valeur + b'\x00' * _pad4(len(valeur))
+
+
+class PcapFormat:
+    """pcap classique : pas de notion d'interface, un en-tête global par fichier."""
+
+    def __init__(self, snaplen):
+        self.snaplen = snaplen
+
+    def file_header(self):
+        return PCAP_GLOBAL_HEADER.pack(PCAP_MAGIC_NS, 2, 4, 0, 0, self.snaplen, LINKTYPE_ETHERNET)
+
+    def interface_block(self, interface):
+        return b''
+
+    def record(self, if_id, ts_ns, data, orig_len):
+        sec, nsec = divmod(ts_ns, 1_000_000_000)
+        return PCAP_RECORD_HEADER.pack(sec, nsec, len(data), orig_len) + data
+
+
+class PcapngFormat:
+    """pcapng : une IDB par interface, horodatages en nanosecondes (if_tsresol = 9)."""
+
+    def __init__(self, snaplen):
+        self.snaplen = snaplen
+
+    def file_header(self):
+        # SHB : byte-order magic, version 1.0, longueur de section inconnue (-1)
+        corps = struct.pack('=IHHq', PCAPNG_BYTE_ORDER_MAGIC, 1, 0, -1)
+        longueur = 8 + len(corps) + 4
+        return PCAPNG_BLOCK_HEADER.pack(PCAPNG_SHB, longueur) + corps + PCAPNG_TRAILER.pack(longueur)
+
+    def interface_block(self, interface):
+        options = b''
+        if interface:
+            options += _option(OPT_IF_NAME, interface.encode())
+        options += _option(OPT_IF_TSRESOL, bytes([9])) + _option(OPT_ENDOFOPT, b'')
+        corps = struct.pack('=HHI', LINKTYPE_ETHERNET, 0, self.snaplen) + options
+        longueur = 8 + len(corps) + 4
+        return PCAPNG_BLOCK_HEADER.pack(PCAPNG_IDB, longueur) + corps + PCAPNG_TRAILER.pack(longueur)
+
+    def record(self, if_id, ts_ns, data, orig_len):
+        bourrage = _pad4(len(data))
+        longueur = 28 + len(data) + bourrage + 4
+        return b''.join((
+            PCAPNG_EPB_HEADER.pack(PCAPNG_EPB, longueur, if_id, ts_ns >> 32, ts_ns & 0xFFFFFFFF,
+                                   len(data), orig_len),
+            data,
+            b'\x00' * bourrage,
+            PCAPNG_TRAILER.pack(longueur),
+        ))
+
+
+class PcapWriter:
+    """
+    Écrivain pcap/pcapng sur thread dédié, avec rotation.
+
+    path            : fichier de sortie ; l'extension (.pcap / .pcapng) choisit le format
+    snaplen         : octets conservés par trame
+    rotate_bytes    : nouveau fichier quand celui-ci dépasse cette taille
+    rotate_seconds  : nouveau fichier toutes les N secondes
+    buffer_size     : tampon d'écriture du fichier
+    max_pending     : trames en attente au-delà desquelles on perd plutôt que de bloquer
+    """
+
+    def __init__(self, path, snaplen=SNAPLEN_MAX, rotate_bytes=None, rotate_seconds=None,
+                 buffer_size=4 << 20, max_pending=100_000):
+        self.path = path
+        self.snaplen = snaplen
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.buffer_size = buffer_size
+        self.max_pending = max_pending
+        self.format = (PcapngFormat if path.endswith('.pcapng') else PcapFormat)(snaplen)
+
+        self.pending = deque()
+        self.written = 0
+        self.dropped = 0
+        self.files = []
+
+        self._file = None
+        self._interfaces = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='pcap-writer', daemon=True)
+        self._thread.start()
+
+    # --- Côté capture : aucune écriture disque ici ---
+
+    def write(self, frame, ts_ns, interface='', orig_len=None):
+        """orig_len : taille sur le fil (4e élément des tuples de capture), len(frame) par défaut."""
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        if orig_len is None:
+            orig_len = len(frame)
+        self.pending.append((bytes(frame[:self.snaplen]), orig_len, ts_ns, interface))
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+    # --- Côté thread d'écriture ---
+
+    def _file_name(self):
+        if self.rotate_bytes is None and self.rotate_seconds is None:
+            return self.path
+        racine, extension = os.path.splitext(self.path)
+        return f"{racine}.{len(self.files):05d}{extension}"
+
+    def _open(self):
+        if self._file is not None:
+            self._file.close()
+        nom = self._file_name()
+        self._file = open(nom, 'wb', buffering=self.buffer_size)
+        self._file.write(self.format.file_header())
+        self._interfaces = {}
+        self._opened_at = time.monotonic()
+        self.files.append(nom)
+
+    def _must_rotate(self):
+        if self.rotate_bytes is not None and self._file.tell() >= self.rotate_bytes:
+            return True
+        return (self.rotate_seconds is not None
+                and time.monotonic() - self._opened_at >= self.rotate_seconds)
+
+    def _interface_id(self, interface):
+        if_id = self._interfaces.get(interface)
+        if if_id is None:
+            if_id = self._interfaces[interface] = len(self._interfaces)
+            self._file.write(self.format.interface_block(interface))
+        return if_id
+
+    def _run(self):
+        self._open()
+        pending = self.pending
+        try:
+            while True:
+                if not pending:
+                    if self._stop.is_set():
+                        break
+                    self._stop.wait(0.01)
+                    if self._must_rotate():
+                        self._open()
+                    continue
+                morceaux = []
+                for _ in range(len(pending)):
+                    data, orig_len, ts_ns, interface = pending.popleft()
+                    if_id = self._interface_id(interface)
+                    morceaux.append(self.format.record(if_id, ts_ns, data, orig_len))
+                self._file.write(b''.join(morceaux))
+                self.written += len(morceaux)
+                if self._must_rotate():
+                    self._open()
+        finally:
+            self._file.close()
+
+
+# --- Lecture ------------------------------------------------------------------------------------
+
+PCAPNG_SPB = 0x00000003
+
+
+def _ts_resolution_to_ns(ts, tsresol):
+    """Convertit un horodatage pcapng en ns selon if_tsresol (10^-n ou 2^-n si le bit 7 est levé)."""
+    if tsresol & 0x80:
+        return (ts * 1_000_000_000) >> (tsresol & 0x7F)
+    if tsresol <= 9:
+        return ts * 10 ** (9 - tsresol)
+    return ts // 10 ** (tsresol - 9)
+
+
+class PcapReader:
+    """
+    Lecteur pcap/pcapng par mmap : records() rend chaque trame comme une memoryview du
+    fichier projeté en mémoire (aucune copie, aucun read()).
+
+        with PcapReader('capture.pcapng') as lecteur:
+            for trame, ts_ns, interface in lecteur.records():
+                ...
+
+    Comme pour l'anneau de capture, copier avec bytes(trame) ce qu'on veut garder après close().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} : fichier vide")
+        self.view = memoryview(self.map)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.view.release()
+        try:
+            self.map.close()
+        except BufferError:
+            pass  # une trame est encore tenue par l'appelant ; le GC s'en chargera
+        self._file.close()
+
+    def records(self):
+        magic = self.map[:4]
+        if magic == struct.pack('<I', PCAPNG_SHB):
+            return self._records_pcapng()
+        for ordre in ('<', '>'):
+            valeur = struct.unpack(ordre + 'I', magic)[0]
+            if valeur in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+                return self._records_pcap(ordre, valeur == PCAP_MAGIC_NS)
+        raise ValueError(f"{self.path} : format de capture inconnu (magic {magic.hex()})")
+
+    def _records_pcap(self, ordre, nanosecondes):
+        view, taille = self.view, len(self.map)
+        entete = struct.Struct(ordre + 'IIII')
+        facteur = 1 if nanosecondes else 1000
+        offset = PCAP_GLOBAL_HEADER.size
+        while offset + entete.size <= taille:
+            sec, frac, caplen, _ = entete.unpack_from(view, offset)
+            offset += entete.size
+            yield view[offset:offset + caplen], sec * 1_000_000_000 + frac * facteur, ''
+            offset += caplen
+
+    def _records_pcapng(self):
+        view, taille = self.view, len(self.map)
+        ordre = '<'
+        interfaces = []   # (nom, tsresol) par identifiant d'interface, remis à zéro à chaque SHB
+        offset = 0
+        while offset + 12 <= taille:
+            if view[offset:offset + 4] == struct.pack('<I', PCAPNG_SHB):
+                ordre = '<' if struct.unpack_from('<I', view, offset + 8)[0] == PCAPNG_BYTE_ORDER_MAGIC else '>'
+                interfaces = []
+            type_bloc, longueur = struct.unpack_from(ordre + 'II', view, offset)
+            if longueur < 12:
+                raise ValueError(f"{self.path} : bloc pcapng corrompu à l'offset {offset}")
+
+            if type_bloc == PCAPNG_EPB:
+                if_id, ts_haut, ts_bas, caplen, _ = struct.unpack_from(ordre + 'IIIII', view, offset + 8)
+                nom, tsresol = interfaces[if_id] if if_id < len(interfaces) else ('', 6)
+                ts = _ts_resolution_to_ns((ts_haut << 32) | ts_bas, tsresol)
+                debut = offset + 28
+                yield view[debut:debut + caplen], ts, nom
+            elif type_bloc == PCAPNG_SPB:
+                orig_len = struct.unpack_from(ordre + 'I', view, offset + 8)[0]
+                debut = offset + 12
+                yield view[debut:debut + min(orig_len, longueur - 16)], 0, interfaces[0][0] if interfaces else ''
+            elif type_bloc == PCAPNG_IDB:
+                interfaces.append(self._lire_idb(ordre, offset, longueur))
+            offset += longueur
+
+    def _lire_idb(self, ordre, offset, longueur):
+        nom, tsresol = '', 6   # résolution par défaut : microseconde
+        pos, fin = offset + 16, offset + longueur - 4
+        while pos + 4 <= fin:
+            code, taille = struct.unpack_from(ordre + 'HH', self.view, pos)
+            if code == OPT_ENDOFOPT:
+                break
+            valeur = self.view[pos + 4:pos + 4 + taille]
+            if code == OPT_IF_NAME:
+                nom = bytes(valeur).decode('utf-8', errors='replace')
+            elif code == OPT_IF_TSRESOL:
+                tsresol = valeur[0]
+            pos += 4 + taille + _pad4(taille)
+        return nom, tsresol
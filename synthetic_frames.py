@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ SYNTHETIC FRAMES : corpus de trames Ethernet synthétiques, déterministe
+------------------------------------------------------------------------------------------------
+ Génère en mémoire un mélange réaliste de trames valides (checksums compris), sans
+ réseau ni droits root. Même graine => mêmes octets, sur toutes les machines :
+ les mesures d'un commit à l'autre portent bien sur le même travail.
+
+   ARP          requêtes et réponses
+   ICMP         echo request / reply, avec ou sans données
+   TCP          SYN avec options (MSS, SACK, horodatage, échelle de fenêtre),
+                ACK pur, segments de données (requêtes et réponses HTTP)
+   UDP / DNS    requêtes et réponses (noms compressés, plusieurs réponses)
+   UDP          datagrammes de taille aléatoire
+
+   corpus = build_corpus(20_000)          # liste de bytes
+   digest(corpus)                         # empreinte SHA-256 du corpus
+------------------------------------------------------------------------------------------------
+"""
+
+import hashlib
+import random
+import struct
+
+SEED = 0x5EED
+
+ETH = struct.Struct('!6s6sH')
+IPV4 = struct.Struct('!BBHHHBBH4s4s')
+TCP = struct.Struct('!HHIIBBHHH')
+UDP = struct.Struct('!HHHH')
+ICMP_ECHO = struct.Struct('!BBHHH')
+ARP = struct.Struct('!HHBBH6s4s6s4s')
+DNS_HEADER = struct.Struct('!HHHHHH')
+
+# Proportions du mélange (somme = 100)
+MIX = (
+    ('arp', 4),
+    ('icmp', 3),
+    ('icmp_data', 3),
+    ('tcp_syn', 8),
+    ('tcp_ack', 30),
+    ('tcp_data', 27),
+    ('dns_query', 8),
+    ('dns_response', 7),
+    ('udp_data', 10),
+)
+
+DOMAINS = ('www.exemple.fr', 'api.exemple.fr', 'cdn.static.exemple.net', 'mail.exemple.org',
+           'monprojet.local', 'fonts.googleapis.com', 'update.debian.org')
+
+HTTP_REQUEST = (b"GET /%s HTTP/1.1\r\nHost: www.exemple.fr\r\nUser-Agent: bench/1.0\r\n"
+                b"Accept: */*\r\n\r\n")
+HTTP_RESPONSE = b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: %d\r\n\r\n"
+
+
+def internet_checksum(data):
+    """Complément à 1 de la somme des mots de 16 bits (RFC 1071)."""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+class _Builder:
+    def __init__(self, rng):
+        self.rng = rng
+        self.hosts = [bytes([10, 0, rng.randrange(4), rng.randrange(1, 255)]) for _ in range(64)]
+        self.macs = [bytes([0x02]) + rng.randbytes(5) for _ in range(len(self.hosts))]
+        self.ident = rng.randrange(0x10000)
+
+    def pair(self):
+        i, j = self.rng.sample(range(len(self.hosts)), 2)
+        return i, j
+
+    def ethernet(self, i, j, ethertype, payload):
+        return ETH.pack(self.macs[j], self.macs[i], ethertype) + payload
+
+    def ipv4(self, i, j, proto, payload):
+        self.ident = (self.ident + 1) & 0xFFFF
+        header = bytearray(IPV4.pack(0x45, 0, 20 + len(payload), self.ident, 0x4000,
+                                     self.rng.choice((64, 128, 255)), proto, 0,
+                                     self.hosts[i], self.hosts[j]))
+        struct.pack_into('!H', header, 10, internet_checksum(bytes(header)))
+        return self.ethernet(i, j, 0x0800, bytes(header) + payload)
+
+    def l4_checksum(self, i, j, proto, segment):
+        pseudo = self.hosts[i] + self.hosts[j] + struct.pack('!BBH', 0, proto, len(segment))
+        return internet_checksum(pseudo + segment)
+
+    def tcp(self, i, j, flags, options=b'', payload=b''):
+        rng = self.rng
+        sport, dport = rng.randrange(32768, 61000), rng.choice((80, 443, 8080, 22))
+        if rng.random() < 0.5:
+            sport, dport = dport, sport
+        offset = (20 + len(options)) // 4
+        segment = bytearray(TCP.pack(sport, dport, rng.getrandbits(32), rng.getrandbits(32),
+                                     offset << 4, flags, rng.randrange(1024, 65535), 0, 0))
+        segment += options + payload
+        struct.pack_into('!H', segment, 16, self.l4_checksum(i, j, 6, bytes(segment)))
+        return self.ipv4(i, j, 6, bytes(segment))
+
+    def udp(self, i, j, sport, dport, payload):
+        segment = bytearray(UDP.pack(sport, dport, 8 + len(payload), 0)) + payload
+        struct.pack_into('!H', segment, 6, self.l4_checksum(i, j, 17, bytes(segment)) or 0xFFFF)
+        return self.ipv4(i, j, 17, bytes(segment))
+
+    # --- Les familles du mélange ---
+
+    def arp(self):
+        i, j = self.pair()
+        reponse = self.rng.random() < 0.5
+        cible_mac = self.macs[j] if reponse else bytes(6)
+        corps = ARP.pack(1, 0x0800, 6, 4, 2 if reponse else 1,
+                         self.macs[i], self.hosts[i], cible_mac, self.hosts[j])
+        trame = ETH.pack(cible_mac if reponse else b'\xff' * 6, self.macs[i], 0x0806) + corps
+        return trame + bytes(18)   # bourrage jusqu'aux 60 octets minimum
+
+    def _icmp(self, data):
+        i, j = self.pair()
+        icmp_type = self.rng.choice((8, 0))
+        message = bytearray(ICMP_ECHO.pack(icmp_type, 0, 0, self.rng.randrange(0x10000),
+                                           self.rng.randrange(0x10000))) + data
+        struct.pack_into('!H', message, 2, internet_checksum(bytes(message)))
+        return self.ipv4(i, j, 1, bytes(message))
+
+    def icmp(self):
+        return self._icmp(b'')
+
+    def icmp_data(self):
+        return self._icmp(bytes(range(56)))
+
+    def tcp_syn(self):
+        i, j = self.pair()
+        options = (b'\x02\x04\x05\xb4'                                  # MSS 1460
+                   + b'\x04\x02'                                        # SACK permis
+                   + b'\x08\x0a' + self.rng.randbytes(8)                # horodatage
+                   + b'\x01'                                            # NOP
+                   + b'\x03\x03\x07')                                   # échelle de fenêtre
+        return self.tcp(i, j, 0x02 if self.rng.random() < 0.5 else 0x12, options)
+
+    def tcp_ack(self):
+        i, j = self.pair()
+        options = b'\x01\x01\x08\x0a' + self.rng.randbytes(8) if self.rng.random() < 0.7 else b''
+        return self.tcp(i, j, 0x10, options)
+
+    def tcp_data(self):
+        i, j = self.pair()
+        rng = self.rng
+        if rng.random() < 0.4:
+            payload = HTTP_REQUEST % rng.choice((b'', b'index.html', b'api/v1/items', b'static/app.js'))
+        elif rng.random() < 0.5:
+            corps = rng.randbytes(rng.randrange(200, 1400))
+            payload = HTTP_RESPONSE % len(corps) + corps
+        else:
+            payload = rng.randbytes(rng.choice((64, 512, 1448)))      # TLS, SSH...
+        options = b'\x01\x01\x08\x0a' + rng.randbytes(8)
+        return self.tcp(i, j, 0x18, options, payload[:1448])
+
+    def _dns_name(self, nom):
+        return b''.join(bytes([len(l)]) + l.encode() for l in nom.split('.')) + b'\x00'
+
+    def dns_query(self):
+        i, j = self.pair()
+        message = (DNS_HEADER.pack(self.rng.randrange(0x10000), 0x0100, 1, 0, 0, 0)
+                   + self._dns_name(self.rng.choice(DOMAINS))
+                   + struct.pack('!HH', self.rng.choice((1, 28)), 1))
+        return self.udp(i, j, self.rng.randrange(32768, 61000), 53, message)
+
+    def dns_response(self):
+        i, j = self.pair()
+        rng = self.rng
+        nom = rng.choice(DOMAINS)
+        n = rng.randrange(1, 5)
+        message = bytearray(DNS_HEADER.pack(rng.randrange(0x10000), 0x8180, 1, n + 1, 0, 0))
+        message += self._dns_name(nom) + struct.pack('!HH', 1, 1)
+        # CNAME vers "edge" + pointeur sur le nom de la question, puis n enregistrements A
+        cname = b'\x04edge\xc0\x0c'
+        debut_cname = len(message) + 12
+        message += b'\xc0\x0c' + struct.pack('!HHIH', 5, 1, 300, len(cname)) + cname
+        for _ in range(n):
+            message += (struct.pack('!H', 0xC000 | debut_cname)
+                        + struct.pack('!HHIH', 1, 1, 60, 4) + rng.randbytes(4))
+        return self.udp(i, j, 53, rng.randrange(32768, 61000), bytes(message))
+
+    def udp_data(self):
+        i, j = self.pair()
+        rng = self.rng
+        return self.udp(i, j, rng.randrange(1024, 65535), rng.choice((123, 514, 5004, 9999)),
+                        rng.randbytes(rng.choice((0, 16, 160, 1200))))
+
+
+def build_corpus(count=20_000, seed=SEED):
+    """Liste de `count` trames (bytes), mélangées selon MIX, identiques pour une même graine."""
+    rng = random.Random(seed)
+    builder = _Builder(rng)
+    familles = [nom for nom, _ in MIX]
+    poids = [p for _, p in MIX]
+    return [getattr(builder, famille)() for famille in rng.choices(familles, poids, k=count)]
+
+
+def digest(corpus):
+    h = hashlib.sha256()
+    for trame in corpus:
+        h.update(len(trame).to_bytes(4, 'big'))
+        h.update(trame)
+    return h.hexdigest()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ TCP REASSEMBLY : reconstruction des flux TCP pour les analyseurs de protocoles
+------------------------------------------------------------------------------------------------
+ Un segment TCP isolé ne dit presque rien : une requête HTTP peut être découpée en
+ plusieurs segments, arriver dans le désordre, être retransmise... Le réassembleur suit
+ les numéros de séquence de chaque sens de chaque connexion et livre à un analyseur
+ (HttpParser par exemple) un flux d'octets DANS L'ORDRE, sans doublons.
+
+ Pour chaque sens (HalfStream) :
+   - next_off : position (64 bits, sans bouclage) du prochain octet attendu ;
+   - un segment en avance est rangé dans une liste triée d'intervalles disjoints
+     (bisect) : les chevauchements sont rognés, le premier octet reçu l'emporte ;
+   - un segment déjà vu (retransmission) est ignoré, ou seulement sa partie nouvelle livrée.
+
+ Mémoire bornée :
+   - max_pending : octets en attente par sens ; au-delà, le trou est déclaré perdu
+     (analyseur.gap(n)) et la livraison reprend après lui ;
+   - max_buffered : octets en attente pour toutes les connexions ; au-delà, les
+     connexions les moins récemment actives sont vidées de la même façon ;
+   - max_streams et idle_timeout : table de connexions LRU, comme flow_table.FlowTable ;
+   - un analyseur qui se désactive (flux non reconnu) libère aussitôt son sens :
+     les segments suivants ne coûtent plus qu'une recherche dans un dict.
+
+   streams = TcpReassembler(lambda: HttpParser())
+   for message in streams.feed(src, dst, sport, dport, seq, flags, payload, ts_ns):
+       print(message.summary())
+------------------------------------------------------------------------------------------------
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+SEQ_MASK = 0xFFFFFFFF
+
+TCP_FIN, TCP_SYN, TCP_RST = 0x01, 0x02, 0x04
+
+
+def _seq_delta(a, b):
+    """a - b dans l'espace des numéros de séquence (modulo 2**32, signé)."""
+    d = (a - b) & SEQ_MASK
+    return d - 0x100000000 if d & 0x80000000 else d
+
+
+class HalfStream:
+    """Un sens d'une connexion : séquence attendue, segments en avance, analyseur."""
+    __slots__ = ('parser', 'base', 'next_off', 'starts', 'chunks', 'pending', 'finished')
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.base = None          # numéro de séquence de l'octet d'offset 0
+        self.next_off = 0
+        self.starts = []          # offsets de début des segments en attente (triés)
+        self.chunks = []          # données correspondantes
+        self.pending = 0          # octets en attente
+        self.finished = False
+
+
+class TcpReassembler:
+
+    def __init__(self, parser_factory, max_pending=1 << 20, max_buffered=32 << 20,
+                 max_streams=50_000, idle_timeout=120.0):
+        self.parser_factory = parser_factory
+        self.max_pending = max_pending
+        self.max_buffered = max_buffered
+        self.max_streams = max_streams
+        self.idle_timeout_ns = int(idle_timeout * 1e9)
+        self.streams = OrderedDict()     # clé canonique -> [dernier ts, sens aller, sens retour]
+        self.buffered = 0
+        self._updates = 0
+        # Compteurs
+        self.delivered = 0
+        self.out_of_order = 0
+        self.retransmitted = 0
+        self.gap_bytes = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.streams)
+
+    def feed(self, src, dst, sport, dport, seq, flags, payload, ts_ns):
+        """
+        Traite un segment. src/dst = adresses brutes (bytes), payload = bytes ou memoryview.
+        Rend la liste des événements produits par les analyseurs (souvent vide).
+        """
+        if (src, sport) <= (dst, dport):
+            key, index = (src, dst, sport, dport), 1
+        else:
+            key, index = (dst, src, dport, sport), 2
+
+        streams = self.streams
+        entry = streams.get(key)
+        if entry is None:
+            if flags & TCP_RST:
+                return []
+            if len(streams) >= self.max_streams:
+                _, old = streams.popitem(last=False)
+                self._drop(old)
+                self.evicted += 1
+            entry = streams[key] = [ts_ns, HalfStream(self.parser_factory()),
+                                    HalfStream(self.parser_factory())]
+        else:
+            streams.move_to_end(key)
+            entry[0] = ts_ns
+
+        self._updates += 1
+        if not self._updates & 0xFF:
+            self.expire(ts_ns)
+
+        if flags & TCP_RST:
+            del streams[key]
+            return self._close(entry[1]) + self._close(entry[2])
+
+        half = entry[index]
+        out = []
+        if half.parser is not None and not half.finished:
+            if half.base is None:
+                half.base = (seq + 1) & SEQ_MASK if flags & TCP_SYN else seq
+            data_seq = (seq + 1) & SEQ_MASK if flags & TCP_SYN else seq
+            if payload:
+                self._segment(half, data_seq, payload, out)
+            if flags & TCP_FIN:
+                out += self._close(half)
+        elif flags & TCP_FIN:
+            half.finished = True
+
+        if entry[1].finished and entry[2].finished:
+            del streams[key]
+        return out
+
+    # --- Un sens de la connexion ---
+
+    def _segment(self, half, data_seq, payload, out):
+        off = half.next_off + _seq_delta(data_seq, (half.base + half.next_off) & SEQ_MASK)
+        end = off + len(payload)
+        if end <= half.next_off:
+            self.retransmitted += 1
+            return
+        if off <= half.next_off:
+            self._deliver(half, bytes(payload[half.next_off - off:]), out)
+            self._drain(half, out)
+            return
+
+        # En avance : ranger le segment, en gardant les octets déjà reçus
+        self.out_of_order += 1
+        while half.parser is not None and half.pending + (end - off) > self.max_pending and half.starts:
+            self._skip_gap(half, out)
+        if half.parser is None:
+            return
+        if off <= half.next_off:        # le saut de trou l'a rendu livrable
+            if end > half.next_off:
+                self._deliver(half, bytes(payload[half.next_off - off:]), out)
+                self._drain(half, out)
+            return
+        self._insert(half, off, payload)
+        while self.buffered > self.max_buffered:
+            if not self._flush_oldest(out):
+                break
+
+    def _insert(self, half, off, payload):
+        starts, chunks = half.starts, half.chunks
+        end = off + len(payload)
+        # Morceaux de [off, end) qui ne recouvrent aucun intervalle déjà en attente
+        i = bisect_right(starts, off) - 1
+        if i < 0:
+            i = 0
+        cur = off
+        morceaux = []
+        while i < len(starts) and starts[i] < end:
+            s, e = starts[i], starts[i] + len(chunks[i])
+            if cur < s:
+                morceaux.append((cur, bytes(payload[cur - off:s - off])))
+            if e > cur:
+                cur = e
+            i += 1
+        if cur < end:
+            morceaux.append((cur, bytes(payload[cur - off:])))
+        for s, data in morceaux:
+            j = bisect_left(starts, s)
+            starts.insert(j, s)
+            chunks.insert(j, data)
+            half.pending += len(data)
+            self.buffered += len(data)
+
+    def _deliver(self, half, data, out):
+        half.next_off += len(data)
+        self.delivered += len(data)
+        out += half.parser.feed(data)
+        if not half.parser.active:
+            self._release(half)
+
+    def _drain(self, half, out):
+        """Livre les segments en attente devenus contigus."""
+        starts, chunks = half.starts, half.chunks
+        while half.parser is not None and starts and starts[0] <= half.next_off:
+            s = starts.pop(0)
+            data = chunks.pop(0)
+            half.pending -= len(data)
+            self.buffered -= len(data)
+            fin = s + len(data)
+            if fin > half.next_off:
+                self._deliver(half, data[half.next_off - s:], out)
+
+    def _skip_gap(self, half, out):
+        """Déclare perdu le trou avant le premier segment en attente, puis livre la suite."""
+        trou = half.starts[0] - half.next_off
+        self.gap_bytes += trou
+        half.next_off = half.starts[0]
+        out += half.parser.gap(trou)
+        if not half.parser.active:
+            self._release(half)
+            return
+        self._drain(half, out)
+
+    def _flush_oldest(self, out):
+        for entry in self.streams.values():
+            for half in entry[1:]:
+                if half.starts:
+                    while half.parser is not None and half.starts:
+                        self._skip_gap(half, out)
+                    return True
+        return False
+
+    def _release(self, half):
+        """L'analyseur a abandonné : on oublie ce sens (plus aucune bufferisation)."""
+        self.buffered -= half.pending
+        half.parser = None
+        half.starts, half.chunks, half.pending = [], [], 0
+
+    def _close(self, half):
+        out = []
+        while half.parser is not None and half.starts:
+            self._skip_gap(half, out)
+        if half.parser is not None:
+            out += half.parser.close()
+            self._release(half)
+        half.finished = True
+        return out
+
+    def _drop(self, entry):
+        for half in entry[1:]:
+            self.buffered -= half.pending
+            half.parser = None
+
+    def expire(self, now_ns):
+        """Oublie les connexions inactives depuis idle_timeout (tête de l'OrderedDict)."""
+        limite = now_ns - self.idle_timeout_ns
+        streams = self.streams
+        while streams:
+            entry = next(iter(streams.values()))
+            if entry[0] >= limite:
+                break
+            streams.popitem(last=False)
+            self._drop(entry)
+            self.evicted += 1
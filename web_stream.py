@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+------------------------------------------------------------------------------------------------
+ WEB STREAM : les paquets capturés, poussés en direct vers visualiseur_v2.html (SSE)
+------------------------------------------------------------------------------------------------
+ Le navigateur ouvre http://127.0.0.1:PORT/ (la page) qui se connecte à /events :
+ une réponse HTTP qui ne se termine jamais, au format Server-Sent Events.
+
+   event: packets
+   data: {"rows": [[ts_ms, "TCP", 66, "10.0.0.2", "10.0.0.1", 51234, 80, "PA"], ...],
+          "skipped": {"UDP": 120}}
+
+ Trois étages, pour que la capture ne dépende jamais de la vitesse d'un navigateur :
+
+   capture  --publish()-->  file bornée  --toutes les 100 ms-->  un lot JSON  -->  client 1
+   (copie de l'en-tête,      (écrase la     (au plus `budget`       (encodé une     client 2
+    rien d'autre)             plus vieille)  lignes, le reste        seule fois)     ...
+                                             résumé par type)
+
+ Chaque client a sa propre file de lots en attente (`backlog`). Un navigateur lent ne
+ bloque que son propre thread d'écriture : quand sa file est pleine, les lots suivants
+ ne lui sont plus envoyés ligne par ligne mais COMPTÉS, et il reçoit à la place un
+ résumé "coalesced" ({"packets": 5230, "kinds": {"TCP": 5100, ...}}) dès qu'il a rattrapé.
+
+ Les lignes ne sont décodées (adresses, ports, drapeaux) que dans le thread d'envoi, et
+ seulement pour les paquets qui seront effectivement transmis.
+------------------------------------------------------------------------------------------------
+"""
+
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bible_code', 'visualiseur_v2.html')
+
+# Octets gardés par paquet publié : Ethernet + IPv4 avec options + début de TCP
+HEAD = 96
+
+ETH_TYPE = struct.Struct('!12xH')
+IPV4_HEADER = struct.Struct('!BBHHHBBH4s4s')
+PORTS = struct.Struct('!HH')
+ARP_ADDRESSES = struct.Struct('!6xH6s4s6s4s')
+TCP_FLAGS = 'FSRPAUEC'
+
+
+def summarize(ts_ns, kind, length, head):
+    """[ts_ms, kind, longueur, src, dst, sport, dport, info] : une ligne du tableau web."""
+    src = dst = info = ''
+    sport = dport = None
+    try:
+        ethertype, = ETH_TYPE.unpack_from(head)
+        if ethertype == 0x0800:
+            vhl, _, _, _, frag, ttl, proto, _, s, d = IPV4_HEADER.unpack_from(head, 14)
+            src, dst = socket.inet_ntoa(s), socket.inet_ntoa(d)
+            l4 = 14 + (vhl & 0x0F) * 4
+            if frag & 0x1FFF:
+                info = 'fragment'
+            elif proto in (6, 17):
+                sport, dport = PORTS.unpack_from(head, l4)
+                if proto == 6:
+                    flags = head[l4 + 13]
+                    info = ''.join(c for i, c in enumerate(TCP_FLAGS) if flags >> i & 1)
+            elif proto == 1:
+                info = f"type {head[l4]} code {head[l4 + 1]}"
+        elif ethertype == 0x0806:
+            opcode, _, sip, _, tip = ARP_ADDRESSES.unpack_from(head, 14)
+            src, dst = socket.inet_ntoa(sip), socket.inet_ntoa(tip)
+            info = 'who-has' if opcode == 1 else 'is-at' if opcode == 2 else f"op {opcode}"
+    except (struct.error, IndexError):
+        pass   # en-tête tronqué (snaplen) : on envoie ce qu'on a
+    return [ts_ns // 1_000_000, kind, length, src, dst, sport, dport, info]
+
+
+def sse(event, data):
+    """Un événement Server-Sent Events, prêt à écrire sur la socket."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+class Client:
+    """
+    File de lots d'un navigateur. Le thread d'envoi du hub dépose (offer) ; le thread
+    HTTP du client retire (take) et écrit. Si le client est en retard de `backlog` lots,
+    les suivants sont seulement comptés.
+    """
+
+    def __init__(self, backlog):
+        self.backlog = backlog
+        self.batches = deque()
+        self.coalesced = 0
+        self.coalesced_kinds = Counter()
+        self.status = None           # dernier état connu : remplacé, jamais empilé
+        self.sent = 0
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+
+    def offer(self, payload, count, kinds):
+        with self.lock:
+            if len(self.batches) < self.backlog:
+                self.batches.append(payload)
+            else:
+                self.coalesced += count
+                self.coalesced_kinds.update(kinds)
+        self.ready.set()
+
+    def offer_status(self, payload):
+        with self.lock:
+            self.status = payload
+        self.ready.set()
+
+    def take(self):
+        """Tout ce qu'il reste à écrire, dans l'ordre : lots, résumé du retard, état."""
+        with self.lock:
+            self.ready.clear()
+            chunks = list(self.batches)
+            self.batches.clear()
+            if self.coalesced:
+                chunks.append(sse('coalesced', {'packets': self.coalesced, 'kinds': self.coalesced_kinds}))
+                self.coalesced = 0
+                self.coalesced_kinds = Counter()
+            if self.status is not None:
+                chunks.append(self.status)
+                self.status = None
+        return chunks
+
+
+class StreamHub:
+    """
+    Relie le thread de capture aux navigateurs connectés. publish() est le seul appel
+    fait par la capture : une copie de l'en-tête et un append dans une deque bornée.
+    """
+
+    def __init__(self, budget=200, interval=0.1, backlog=8, size=16384, status=None):
+        self.budget = budget
+        self.interval = interval
+        self.backlog = backlog
+        self.status = status         # fonction -> dict ajouté aux événements "stats"
+        self.pending = deque(maxlen=size)
+        self.published = 0
+        self.overflowed = 0          # écrasés dans la file avant le lot suivant
+        self.skipped = 0             # au-delà du budget d'un lot : seulement comptés
+        self.clients = set()
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+
+    def publish(self, ts_ns, kind, frame):
+        if len(self.pending) == self.pending.maxlen:
+            self.overflowed += 1
+        self.pending.append((ts_ns, kind, len(frame), bytes(frame[:HEAD])))
+        self.published += 1
+
+    def connect(self):
+        client = Client(self.backlog)
+        with self.lock:
+            self.clients.add(client)
+        return client
+
+    def disconnect(self, client):
+        with self.lock:
+            self.clients.discard(client)
+
+    def drain(self):
+        records = []
+        try:
+            for _ in range(len(self.pending)):
+                records.append(self.pending.popleft())
+        except IndexError:
+            pass   # la capture a écrasé un enregistrement entre-temps
+        return records
+
+    def flush(self):
+        """Un lot : les `budget` paquets les plus récents en lignes, le reste compté par type."""
+        records = self.drain()
+        if not records:
+            return
+        with self.lock:
+            clients = list(self.clients)
+        if not clients:
+            return
+        skipped, shown = records[:-self.budget], records[-self.budget:]
+        kinds = Counter(record[1] for record in records)
+        skipped_kinds = Counter(record[1] for record in skipped)
+        self.skipped += len(skipped)
+        payload = sse('packets', {'rows': [summarize(*record) for record in shown],
+                                  'skipped': skipped_kinds})
+        for client in clients:
+            client.offer(payload, len(records), kinds)
+
+    def send_status(self):
+        with self.lock:
+            clients = list(self.clients)
+        if not clients:
+            return
+        etat = {'published': self.published, 'overflowed': self.overflowed,
+                'skipped': self.skipped, 'clients': len(clients)}
+        if self.status is not None:
+            etat.update(self.status())
+        payload = sse('stats', etat)
+        for client in clients:
+            client.offer_status(payload)
+
+    def run(self):
+        next_status = time.monotonic() + 1.0
+        while not self.stop.wait(self.interval):
+            self.flush()
+            if time.monotonic() >= next_status:
+                self.send_status()
+                next_status += 1.0
+
+    def close(self):
+        self.stop.set()
+        with self.lock:
+            for client in self.clients:
+                client.ready.set()
+
+
+def start_server(hub, port, host='127.0.0.1', keepalive=15.0, max_clients=16, origin=None):
+    """
+    Sert la page sur / et le flux sur /events dans des threads de fond ; démarre aussi
+    le thread d'envoi du hub. Rend le serveur (serveur.shutdown() pour l'arrêter).
+    `origin` : seule autre origine autorisée à lire /events ('null' pour la page ouverte
+    depuis le disque). Par défaut, aucune : n'importe quel site visité pourrait sinon lire
+    la capture depuis 127.0.0.1.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            chemin = self.path.split('?', 1)[0]
+            if chemin in ('/', '/visualiseur_v2.html'):
+                self.send_page()
+            elif chemin == '/events':
+                self.send_events()
+            else:
+                self.send_error(404)
+
+        def send_page(self):
+            try:
+                with open(PAGE, 'rb') as f:
+                    corps = f.read()
+            except OSError:
+                self.send_error(404, "visualiseur_v2.html introuvable")
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(corps)))
+            self.end_headers()
+            self.wfile.write(corps)
+
+        def send_events(self):
+            if len(hub.clients) >= max_clients:
+                self.send_error(503, "trop de clients connectés")
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            if origin is not None:
+                self.send_header('Access-Control-Allow-Origin', origin)
+            self.end_headers()
+            self.close_connection = True
+            client = hub.connect()
+            try:
+                self.wfile.write(b"retry: 2000\n\n")
+                self.wfile.flush()
+                while not hub.stop.is_set():
+                    if not client.ready.wait(keepalive):
+                        self.wfile.write(b": ping\n\n")   # détecte les navigateurs partis
+                    for chunk in client.take():
+                        self.wfile.write(chunk)
+                        client.sent += 1
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError, TimeoutError):
+                pass
+            finally:
+                hub.disconnect(client)
+
+        def log_message(self, format, *args):
+            pass   # pas de journal d'accès au milieu de l'affichage des trames
+
+    serveur = ThreadingHTTPServer((host, port), Handler)
+    serveur.daemon_threads = True
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    threading.Thread(target=hub.run, daemon=True).start()
+    return serveur